@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: sklearn scaler + IsolationForest vs CompiledIsolationForest.
+Trains a model shaped like the per-machine ones (100 trees, 4 metrics -> 20
+features), checks the compiled outputs are identical, then times single-row
+and small-batch scoring.
+
+    poetry run python benchmarks/bench_compiled_forest.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from compiled_forest import CompiledIsolationForest  # noqa: E402
+
+
+def per_call_us(fn, repeats: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--train-rows', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=500)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    rng = np.random.default_rng(42)
+    X = rng.normal(loc=100.0, scale=15.0, size=(args.train_rows, args.features))
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(contamination=0.1, random_state=42, n_estimators=100).fit(scaler.transform(X))
+
+    start = time.perf_counter()
+    compiled = CompiledIsolationForest(model, scaler)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({compiled.n_trees} trees, {len(compiled.feature)} nodes, depth {compiled.max_depth})")
+
+    X_test = rng.normal(loc=100.0, scale=25.0, size=(5000, args.features))
+    is_anomaly, scores = compiled.score(X_test)
+    X_scaled = scaler.transform(X_test)
+    assert np.array_equal(scores, model.score_samples(X_scaled)), "score_samples mismatch"
+    assert np.array_equal(is_anomaly, model.predict(X_scaled) == -1), "predict mismatch"
+    print("outputs: identical to sklearn on 5000 rows")
+
+    print(f"\n{'rows':>6} {'sklearn us/row':>16} {'compiled us/row':>16} {'speedup':>8}")
+    for batch in (1, 8, 64):
+        rows = X_test[:batch]
+
+        def sklearn_score():
+            scaled = scaler.transform(rows)
+            model.predict(scaled)
+            model.score_samples(scaled)
+
+        baseline = per_call_us(sklearn_score, args.repeats) / batch
+        fused = per_call_us(lambda: compiled.score(rows), args.repeats) / batch
+        print(f"{batch:>6} {baseline:>16.1f} {fused:>16.1f} {baseline / fused:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-machine models vs one fleet model with per-machine profiles.
+Generates a synthetic fleet (4 metrics, each machine at its own operating
+point and noise level), trains both serving modes on the same training
+windows, and compares:
+  - memory: serialized size of the per-machine state and of the shared model
+  - cold start: time to onboard one machine (forest fit vs profile)
+  - latency: single-row scoring time
+  - detection: agreement between the modes, detection rate on injected faults
+    and false-positive rate on normal rows
+
+    poetry run python benchmarks/bench_fleet_model.py --machines 50
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from compiled_forest import CompiledIsolationForest  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from engine import PredictiveMaintenanceEngine  # noqa: E402
+from fleet_model import FleetModel  # noqa: E402
+from model_store import ModelStore  # noqa: E402
+
+METRICS = ['power', 'spindle_speed', 'temperature', 'vibration']
+
+
+def machine_series(rng, rows: int, center: np.ndarray, noise: np.ndarray, fault_rows: int = 0) -> pd.DataFrame:
+    """AR(1) readings around `center`; the last `fault_rows` drift to 4 sigma on temperature and vibration."""
+    values = np.empty((rows, len(METRICS)))
+    state = np.zeros(len(METRICS))
+    for i in range(rows):
+        state = 0.8 * state + rng.normal(scale=0.6, size=len(METRICS))
+        values[i] = center + state * noise
+    if fault_rows:
+        ramp = np.linspace(1.0, 4.0, fault_rows)[:, None]
+        values[-fault_rows:, 2:] += ramp * noise[2:]
+    times = pd.date_range('2025-11-20', periods=rows, freq='min')
+    return pd.DataFrame(values, index=pd.Index(times, name='time'), columns=METRICS)
+
+
+def nbytes(obj) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def per_call_us(fn, repeats: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', type=int, default=50)
+    parser.add_argument('--train-rows', type=int, default=2000)
+    parser.add_argument('--test-rows', type=int, default=600)
+    parser.add_argument('--fault-rows', type=int, default=60)
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    rng = np.random.default_rng(42)
+    engine = PredictiveMaintenanceEngine({}, pool=ConnectionPool({}, min_size=0),
+                                         model_store=ModelStore(tempfile.mkdtemp(prefix='bench_fleet_')))
+
+    train, test = {}, {}
+    for i in range(args.machines):
+        machine_id = f'M-{i:03d}'
+        center = np.array([rng.uniform(5, 20), rng.uniform(2000, 5000), rng.uniform(150, 200), rng.uniform(0.5, 1.5)])
+        noise = center * rng.uniform(0.01, 0.05, size=len(METRICS))
+        train[machine_id] = machine_series(rng, args.train_rows, center, noise)
+        test[machine_id] = machine_series(rng, args.test_rows, center, noise, fault_rows=args.fault_rows)
+
+    # Per-machine mode, trained like PredictiveMaintenanceEngine.train_model
+    machine_models, machine_fit_s = {}, []
+    for machine_id, df in train.items():
+        started = time.perf_counter()
+        features = engine._engineer_features(df)
+        scaler = StandardScaler()
+        model = IsolationForest(contamination=0.1, random_state=42, n_estimators=100).fit(scaler.fit_transform(features))
+        machine_fit_s.append(time.perf_counter() - started)
+        machine_models[machine_id] = (model, scaler, CompiledIsolationForest(model, scaler))
+
+    # Fleet mode, trained like PredictiveMaintenanceEngine.train_fleet_model
+    wide = pd.concat(train, names=['machine_id', 'time'])
+    started = time.perf_counter()
+    features = engine._engineer_fleet_features(wide)
+    fleet = FleetModel.fit(wide, features, engine._feature_columns(METRICS), contamination=0.1)
+    fleet_fit_s = time.perf_counter() - started
+
+    profile_s = []
+    for machine_id, df in list(train.items())[:10]:
+        started = time.perf_counter()
+        fleet.profile(df, engine._engineer_features(df))
+        profile_s.append(time.perf_counter() - started)
+
+    # Detection on held-out windows ending in a fault
+    agree = total = 0
+    hits = {'machine': 0, 'fleet': 0}
+    false_positives = {'machine': 0, 'fleet': 0}
+    normal_rows = fault_rows = 0
+    test_features = {machine_id: engine._engineer_features(df) for machine_id, df in test.items()}
+    for machine_id, features in test_features.items():
+        model, scaler, compiled = machine_models[machine_id]
+        machine_flags, _ = compiled.score(features.values)
+        fleet_flags, _ = fleet.score(fleet.profiles[machine_id], features[fleet.columns].values)
+        fault = np.zeros(len(features), dtype=bool)
+        fault[-args.fault_rows:] = True
+        agree += int(np.sum(machine_flags == fleet_flags))
+        total += len(features)
+        for mode, flags in (('machine', machine_flags), ('fleet', fleet_flags)):
+            hits[mode] += int(np.sum(flags & fault))
+            false_positives[mode] += int(np.sum(flags & ~fault))
+        fault_rows += int(fault.sum())
+        normal_rows += int((~fault).sum())
+
+    # Single-row scoring latency
+    ids = list(test_features)
+    rows = {machine_id: test_features[machine_id].values[-1:] for machine_id in ids}
+    fleet_rows = {machine_id: test_features[machine_id][fleet.columns].values[-1:] for machine_id in ids}
+    machine_us = per_call_us(lambda: [machine_models[m][2].score(rows[m]) for m in ids], args.repeats) / len(ids)
+    fleet_us = per_call_us(lambda: [fleet.score(fleet.profiles[m], fleet_rows[m]) for m in ids], args.repeats) / len(ids)
+
+    machine_bytes = np.mean([nbytes((model, scaler)) for model, scaler, _ in machine_models.values()])
+    shared_bytes = nbytes(FleetModel(fleet.model, fleet.metrics, fleet.columns, fleet.contamination))
+    profile_bytes = np.mean([profile.nbytes() for profile in fleet.profiles.values()])
+    profile_disk = np.mean([nbytes(profile.to_dict()) for profile in fleet.profiles.values()])
+
+    n = args.machines
+    print(f"{n} machines, {args.train_rows} training rows each\n")
+    print(f"{'':<34}{'per-machine':>14}{'fleet':>14}")
+    print(f"{'state per machine (bytes)':<34}{machine_bytes:>14,.0f}{profile_bytes:>14,.0f}")
+    print(f"{'  serialized profile (bytes)':<34}{'':>14}{profile_disk:>14,.0f}")
+    print(f"{'shared state (bytes)':<34}{0:>14,}{shared_bytes:>14,}")
+    print(f"{f'total for {n} machines (MB)':<34}{machine_bytes * n / 1e6:>14.2f}"
+          f"{(shared_bytes + profile_bytes * n) / 1e6:>14.2f}")
+    print(f"{'onboard one machine (ms)':<34}{np.mean(machine_fit_s) * 1000:>14.1f}{np.mean(profile_s) * 1000:>14.1f}")
+    print(f"{'train whole fleet (s)':<34}{sum(machine_fit_s):>14.2f}{fleet_fit_s:>14.2f}")
+    print(f"{'score one row (us)':<34}{machine_us:>14.1f}{fleet_us:>14.1f}")
+    print(f"{'fault detection rate':<34}{hits['machine'] / fault_rows:>14.3f}{hits['fleet'] / fault_rows:>14.3f}")
+    print(f"{'false-positive rate':<34}{false_positives['machine'] / normal_rows:>14.3f}"
+          f"{false_positives['fleet'] / normal_rows:>14.3f}")
+    print(f"\nagreement on {total} rows: {agree / total:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Load generator for /predict.
+Fires requests at a running ai-service with fixed concurrency and reports
+throughput and latency percentiles. Run it once against a service started
+with ASYNC_SERVING=1 and once with ASYNC_SERVING=0 to compare the two paths.
+
+    poetry run python benchmarks/bench_serving.py --machines CNC-01,CNC-02,MILL-01 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+async def run(base_url: str, machines, concurrency: int, total: int, timeout: float):
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            for i in counter:
+                machine_id = machines[i % len(machines)]
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"/predict/{machine_id}")
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000.0
+    print(f"requests:    {total} ({concurrency} concurrent, {len(machines)} machines)")
+    print(f"statuses:    {statuses}")
+    print(f"throughput:  {total / elapsed:.1f} req/s")
+    for p in (50, 95, 99):
+        print(f"p{p} latency: {np.percentile(latencies_ms, p):.1f} ms")
+    print(f"max latency: {latencies_ms.max():.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--machines', default='CNC-01', help='Comma-separated machine ids to cycle through')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.machines.split(','), args.concurrency, args.requests, args.timeout))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: multi-worker serving (server.py) with and without preloading.
+Publishes a synthetic model set (one IsolationForest per machine, as the
+ml-pipeline batch job does), starts server.py with SERVING_PRELOAD=1 (models
+loaded and compiled once in the parent, shared copy-on-write) and with
+SERVING_PRELOAD=0 (every worker loads and compiles its own copy), and reports
+for each:
+  - parent preload time and worker startup time (fork to accepting requests)
+  - per-worker RSS, PSS (shared pages split between workers) and USS (private pages)
+  - total PSS of the parent and all workers, i.e. the memory the service really uses
+
+Also reports how long importing main takes in a fresh interpreter. No
+database is needed: the workers' database pools connect lazily.
+
+    poetry run python benchmarks/bench_workers.py --machines 200 --workers 4
+"""
+
+import argparse
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+from server import memory_mb  # noqa: E402
+
+N_FEATURES = 16  # 4 metrics, as _engineer_features lays them out
+
+
+def publish_model_set(directory: str, machines: int, seed: int = 42):
+    """A model-set bundle and CURRENT pointer in the layout training/machine_models.py publishes."""
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    models = {}
+    for i in range(machines):
+        X = rng.normal(size=(500, N_FEATURES))
+        scaler = StandardScaler().fit(X)
+        model = IsolationForest(contamination=0.1, random_state=i, n_estimators=100).fit(scaler.transform(X))
+        models[f'CNC-{i:04d}'] = {'model': model, 'scaler': scaler, 'reference': None}
+    version = 'bench'
+    joblib.dump({'version': version, 'models': models}, os.path.join(directory, f'model-set-{version}.joblib'))
+    with open(os.path.join(directory, 'CURRENT'), 'w') as f:
+        f.write(f'{{"version": "{version}", "file": "model-set-{version}.joblib", "machines": {machines}}}')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_server(preload: bool, workers: int, model_set_dir: str, timeout: float = 120.0):
+    env = dict(
+        os.environ,
+        SERVING_WORKERS=str(workers),
+        SERVING_PRELOAD='1' if preload else '0',
+        SERVING_HOST='127.0.0.1',
+        SERVING_PORT=str(free_port()),
+        SERVING_LOG_LEVEL='warning',
+        MODEL_SET_DIR=model_set_dir,
+        MODEL_STORE_DIR=tempfile.mkdtemp(prefix='bench_workers_store_'),
+        POSTGRES_POOL_MIN='0',
+        PYTHONUNBUFFERED='1',
+    )
+    started = time.monotonic()
+    process = subprocess.Popen([sys.executable, 'server.py'], cwd=SRC, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines: 'queue.Queue[str]' = queue.Queue()
+    threading.Thread(target=lambda: [lines.put(line) for line in process.stdout], daemon=True).start()
+
+    preload_s, ready, output = None, {}, []
+    try:
+        while len(ready) < workers:
+            try:
+                line = lines.get(timeout=max(0.1, timeout - (time.monotonic() - started)))
+            except queue.Empty:
+                sys.exit(f"workers not ready after {timeout:.0f}s; server output:\n{''.join(output)}")
+            output.append(line)
+            if line.startswith('Preloaded'):
+                preload_s = float(line.split(' in ')[1].split('s,')[0])
+            elif line.startswith('Worker') and ' ready in ' in line:
+                pid = int(line.split('(pid ')[1].split(')')[0])
+                ready[pid] = float(line.split(' ready in ')[1].split('s,')[0])
+        all_ready_s = time.monotonic() - started
+        time.sleep(1.0)  # let startup background work (e.g. the sklearn import) settle
+        memory = {pid: memory_mb(pid) for pid in ready}
+        parent = memory_mb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return preload_s, ready, memory, parent, all_ready_s
+
+
+def import_seconds(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=SRC, capture_output=True, text=True,
+                            env=dict(os.environ, POSTGRES_POOL_MIN='0', MODEL_SET_DIR=''))
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    model_set_dir = tempfile.mkdtemp(prefix='bench_workers_set_')
+    publish_model_set(model_set_dir, args.machines)
+    bundle_mb = sum(os.path.getsize(os.path.join(model_set_dir, name)) for name in os.listdir(model_set_dir)) / 1e6
+
+    print(f"model set: {args.machines} machines, {bundle_mb:.1f} MB on disk; {args.workers} workers")
+    print(f"import main (fresh interpreter, no models): {import_seconds('main'):.2f}s\n")
+
+    print(f"{'':<12}{'preload s':>10}{'worker start s':>16}{'all ready s':>13}"
+          f"{'RSS/worker':>12}{'PSS/worker':>12}{'USS/worker':>12}{'total PSS':>11}")
+    for preload in (True, False):
+        preload_s, ready, memory, parent, all_ready_s = run_server(preload, args.workers, model_set_dir)
+        workers = list(memory.values())
+        total_pss = sum(m['pss'] for m in workers) + parent.get('pss', 0.0)
+        print(f"{'preload' if preload else 'per-worker':<12}"
+              f"{preload_s if preload_s is not None else 0.0:>10.2f}"
+              f"{np.mean(list(ready.values())):>16.2f}{all_ready_s:>13.2f}"
+              f"{np.mean([m['rss'] for m in workers]):>12.1f}{np.mean([m['pss'] for m in workers]):>12.1f}"
+              f"{np.mean([m['uss'] for m in workers]):>12.1f}{total_pss:>11.1f}")
+    print("\nMB unless noted; total PSS includes the parent process")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark: the engine's 'sql' feature backend (features
+computed in the database by SqlFeatureReader) vs the default 'pandas' backend.
+Needs a local Postgres, ideally with TimescaleDB (POSTGRES_* as for the service).
+
+Loads synthetic telemetry (gaps, duplicate readings, a metric only some
+machines report) into a scratch schema and compares, for both backends:
+  - /analyze: the fleet's latest raw row and feature row per machine
+  - training: one machine's week of raw metrics and features
+and reports the rows each backend reads from the server and wall time.
+The schema is dropped afterwards.
+
+    POSTGRES_PORT=5433 poetry run python benchmarks/parity_sql_features.py --machines 200
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from db_pool import ConnectionPool  # noqa: E402
+from engine import PredictiveMaintenanceEngine  # noqa: E402
+from model_store import ModelStore  # noqa: E402
+
+METRICS = {'power': (12.0, 1.5), 'spindle_speed': (3500, 150), 'temperature': (180, 6),
+           'vibration': (1.0, 0.2), 'coolant_flow': (12, 1)}
+
+
+def synthetic_telemetry(machines: int, minutes: int, seed: int = 42) -> pd.DataFrame:
+    """Long-format readings, one per minute per machine and metric, ending now, with a few duplicates."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    times = pd.date_range(end=end, periods=minutes, freq='min')
+    frames = []
+    for i in range(machines):
+        machine_times = times + pd.Timedelta(seconds=i % 60)
+        for metric, (mean, std) in METRICS.items():
+            if metric == 'coolant_flow' and i % 3:
+                continue  # never reported by most machines: NULL raw, 0 features
+            keep = rng.random(minutes) > 0.05
+            frames.append(pd.DataFrame({'time': machine_times[keep], 'machine_id': f'CNC-{i:04d}',
+                                        'metric_name': metric, 'value': rng.normal(mean, std, minutes)[keep]}))
+    long = pd.concat(frames, ignore_index=True)
+    # Repeated readings of a metric at one timestamp; every backend averages them
+    duplicates = long.sample(frac=0.005, random_state=seed).assign(value=lambda d: d['value'] * 1.01)
+    return pd.concat([long, duplicates], ignore_index=True)
+
+
+def load(db_config, schema: str, telemetry: pd.DataFrame) -> bool:
+    conn = psycopg2.connect(**db_config)
+    cursor = conn.cursor()
+    cursor.execute(sql.SQL("CREATE SCHEMA {}").format(sql.Identifier(schema)))
+    cursor.execute(sql.SQL("""
+        CREATE TABLE {}.machine_telemetry (
+            time TIMESTAMPTZ NOT NULL,
+            machine_id TEXT NOT NULL,
+            metric_name TEXT NOT NULL,
+            value DOUBLE PRECISION
+        )
+    """).format(sql.Identifier(schema)))
+    cursor.execute("SELECT count(*) FROM pg_extension WHERE extname = 'timescaledb'")
+    timescale = cursor.fetchone()[0] > 0
+    if timescale:
+        cursor.execute("SELECT create_hypertable(%s, 'time')", (f'{schema}.machine_telemetry',))
+    buffer = io.StringIO()
+    telemetry.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f%z')
+    buffer.seek(0)
+    cursor.copy_expert(sql.SQL("COPY {}.machine_telemetry FROM STDIN WITH CSV").format(sql.Identifier(schema)),
+                       buffer)
+    cursor.execute(sql.SQL("ANALYZE {}.machine_telemetry").format(sql.Identifier(schema)))
+    conn.commit()
+    conn.close()
+    return timescale
+
+
+def drop(db_config, schema: str):
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    conn.cursor().execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(schema)))
+    conn.close()
+
+
+def same(expected: pd.DataFrame, actual: pd.DataFrame) -> bool:
+    if list(expected.columns) != list(actual.columns) or len(expected) != len(actual):
+        print(f"    shape/columns differ: {expected.shape} vs {actual.shape}")
+        return False
+    if not (expected.index.get_level_values(0) == actual.index.get_level_values(0)).all():
+        print("    row order differs")
+        return False
+    return bool(np.allclose(expected.to_numpy(dtype=float), actual.to_numpy(dtype=float),
+                            rtol=1e-9, atol=1e-9, equal_nan=True))
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', type=int, default=100)
+    parser.add_argument('--minutes', type=int, default=120, help='History loaded per machine')
+    parser.add_argument('--train-machine-minutes', type=int, default=7 * 1440,
+                        help='History of the machine used for the training comparison')
+    args = parser.parse_args()
+
+    schema = f'sql_features_parity_{os.getpid()}'
+    db_config = {
+        'host': os.getenv('POSTGRES_HOST', 'localhost'),
+        'port': int(os.getenv('POSTGRES_PORT', '5433')),
+        'user': os.getenv('POSTGRES_USER', 'admin'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'password'),
+        'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry'),
+    }
+    scoped = {**db_config, 'options': f'-c search_path={schema},public'}
+
+    telemetry = pd.concat([
+        synthetic_telemetry(args.machines, args.minutes),
+        synthetic_telemetry(1, args.train_machine_minutes, seed=7).assign(machine_id='TRAIN-0001'),
+    ], ignore_index=True)
+    try:
+        timescale = load(db_config, schema, telemetry)
+        print(f"{len(telemetry)} telemetry rows, {args.machines + 1} machines"
+              f"{' (hypertable)' if timescale else ' (plain table, no TimescaleDB)'}\n")
+
+        store = ModelStore(tempfile.mkdtemp(prefix='parity_sql_'))
+        engines = {backend: PredictiveMaintenanceEngine(scoped, pool=ConnectionPool(scoped), model_store=store,
+                                                        feature_backend=backend)
+                   for backend in ('pandas', 'sql')}
+        window_rows = int((telemetry['time'] > pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=0.5)).sum())
+
+        ok = True
+        print(f"{'':<30}{'rows read':>12}{'pandas s':>10}{'sql s':>10}  parity")
+
+        (wide, features), pandas_s = timed(engines['pandas'].fleet_features, 0.5)
+        (sql_wide, sql_features), sql_s = timed(engines['sql'].fleet_features, 0.5, latest=True)
+        latest = [frame.groupby(level='machine_id', sort=False).tail(1).droplevel('time')
+                  for frame in (wide, features, sql_wide, sql_features)]
+        matched = same(latest[0], latest[2]) and same(latest[1], latest[3])
+        ok &= matched
+        print(f"{'/analyze, pandas (long rows)':<30}{window_rows:>12,}{pandas_s:>10.3f}{'':>10}")
+        print(f"{'/analyze, sql (latest rows)':<30}{len(sql_wide):>12,}{'':>10}{sql_s:>10.3f}  "
+              f"{'OK' if matched else 'FAILED'}")
+
+        (raw, features), pandas_s = timed(engines['pandas'].machine_features, 'TRAIN-0001', 168)
+        (sql_raw, sql_features), sql_s = timed(engines['sql'].machine_features, 'TRAIN-0001', 168)
+        matched = same(raw, sql_raw) and same(features, sql_features)
+        ok &= matched
+        machine_rows = int((telemetry['machine_id'] == 'TRAIN-0001').sum())
+        print(f"{'training, pandas (long rows)':<30}{machine_rows:>12,}{pandas_s:>10.3f}{'':>10}")
+        print(f"{'training, sql (feature rows)':<30}{len(sql_raw):>12,}{'':>10}{sql_s:>10.3f}  "
+              f"{'OK' if matched else 'FAILED'}")
+
+        print("\nparity: OK" if ok else "\nparity: FAILED")
+    finally:
+        drop(db_config, schema)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
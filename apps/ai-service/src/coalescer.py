@@ -0,0 +1,282 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class PredictionCoalescer:
+    """
+    Micro-batches /predict calls.
+
+    Identical requests share one Future while a prediction for that machine is
+    queued or running. Requests for different machines are collected for up to
+    `window_ms` (or until `max_batch` machines are waiting) and then handed to
+    `predict_many` as one batch, which runs one telemetry query and one scoring
+    pass. At most `max_concurrent_batches` batches run at once; while they are
+    busy, new requests keep accumulating into the next batch.
+    """
+
+    def __init__(
+        self,
+        predict_many: Callable[[List[str]], Dict[str, object]],
+        window_ms: float = 5.0,
+        max_batch: int = 64,
+        max_concurrent_batches: int = 4,
+    ):
+        self.predict_many = predict_many
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._cond = threading.Condition()
+        self._queued: Dict[str, Future] = {}  # machine_id -> future, insertion ordered
+        self._running: Dict[str, Future] = {}
+        self._enqueued_at: Dict[str, float] = {}
+        self._slots = threading.Semaphore(max_concurrent_batches)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix='predict-batch')
+        self._closed = False
+
+        # Metrics
+        self._requests = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._batched_machines = 0
+        self._max_batch_seen = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='predict-coalescer', daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, machine_id: str) -> Future:
+        """Future resolving to the prediction for machine_id (shared with identical requests)."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("coalescer is closed")
+            self._requests += 1
+            future = self._queued.get(machine_id) or self._running.get(machine_id)
+            if future is not None:
+                self._coalesced += 1
+                return future
+            future = Future()
+            self._queued[machine_id] = future
+            self._enqueued_at[machine_id] = time.monotonic()
+            self._cond.notify()
+            return future
+
+    def predict(self, machine_id: str, timeout: Optional[float] = None):
+        """Blocking predict_anomaly equivalent; raises whatever the batch raised for this machine."""
+        return self.submit(machine_id).result(timeout)
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                while not self._queued and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    self._slots.release()
+                    return
+
+                # Collect until the window after the oldest request closes, or the batch is full
+                deadline = min(self._enqueued_at.values()) + self.window
+                while len(self._queued) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = {}
+                for machine_id in list(self._queued)[:self.max_batch]:
+                    batch[machine_id] = self._queued.pop(machine_id)
+                    waited = time.monotonic() - self._enqueued_at.pop(machine_id)
+                    self._wait_time_total += waited
+                    self._wait_time_max = max(self._wait_time_max, waited)
+                self._running.update(batch)
+                self._batches += 1
+                self._batched_machines += len(batch)
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+            try:
+                self._executor.submit(self._run_batch, batch)
+            except RuntimeError:
+                # Executor shut down by close(); still answer the callers
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: Dict[str, Future]):
+        try:
+            try:
+                results = self.predict_many(list(batch))
+            except BaseException as exc:
+                results = {machine_id: exc for machine_id in batch}
+
+            with self._cond:
+                for machine_id in batch:
+                    self._running.pop(machine_id, None)
+
+            for machine_id, future in batch.items():
+                result = results.get(machine_id)
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                'window_ms': self.window * 1000.0,
+                'max_batch': self.max_batch,
+                'requests': self._requests,
+                'coalesced_requests': self._coalesced,
+                'batches': self._batches,
+                'avg_batch_size': round(self._batched_machines / self._batches, 3) if self._batches else 0.0,
+                'max_batch_size': self._max_batch_seen,
+                'avg_wait_ms': round(self._wait_time_total / self._batched_machines * 1000.0, 3) if self._batched_machines else 0.0,
+                'max_wait_ms': round(self._wait_time_max * 1000.0, 3),
+                'queued': len(self._queued),
+                'running': len(self._running),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False)
+
+
+class AsyncPredictionCoalescer:
+    """
+    asyncio counterpart of PredictionCoalescer.
+
+    Same batching rules, but requests wait on asyncio futures and batches are
+    coroutines, so the event loop keeps accepting and coalescing requests while
+    a batch is reading telemetry or scoring in an executor.
+    """
+
+    def __init__(
+        self,
+        predict_many: Callable[[List[str]], Awaitable[Dict[str, object]]],
+        window_ms: float = 5.0,
+        max_batch: int = 64,
+        max_concurrent_batches: int = 4,
+    ):
+        self.predict_many = predict_many
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queued: Dict[str, asyncio.Future] = {}
+        self._running: Dict[str, asyncio.Future] = {}
+        self._enqueued_at: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batch_tasks = set()
+
+        # Metrics
+        self._requests = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._batched_machines = 0
+        self._max_batch_seen = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def submit(self, machine_id: str) -> asyncio.Future:
+        """Future resolving to the prediction for machine_id (shared with identical requests)."""
+        if self._dispatcher is None:
+            # Created lazily so everything binds to the serving event loop
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+        self._requests += 1
+        future = self._queued.get(machine_id) or self._running.get(machine_id)
+        if future is not None:
+            self._coalesced += 1
+            return future
+        future = asyncio.get_running_loop().create_future()
+        self._queued[machine_id] = future
+        self._enqueued_at[machine_id] = time.monotonic()
+        self._wakeup.set()
+        return future
+
+    async def predict(self, machine_id: str):
+        """predict_anomaly equivalent; raises whatever the batch raised for this machine."""
+        # shield: one cancelled client must not cancel the result other callers share
+        return await asyncio.shield(self.submit(machine_id))
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._slots.acquire()
+            while not self._queued:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            deadline = min(self._enqueued_at.values()) + self.window
+            while len(self._queued) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = {}
+            for machine_id in list(self._queued)[:self.max_batch]:
+                batch[machine_id] = self._queued.pop(machine_id)
+                waited = time.monotonic() - self._enqueued_at.pop(machine_id)
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            self._running.update(batch)
+            self._batches += 1
+            self._batched_machines += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: Dict[str, asyncio.Future]):
+        try:
+            try:
+                results = await self.predict_many(list(batch))
+            except Exception as exc:
+                results = {machine_id: exc for machine_id in batch}
+
+            for machine_id, future in batch.items():
+                self._running.pop(machine_id, None)
+                if future.done():
+                    continue
+                result = results.get(machine_id)
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch': self.max_batch,
+            'requests': self._requests,
+            'coalesced_requests': self._coalesced,
+            'batches': self._batches,
+            'avg_batch_size': round(self._batched_machines / self._batches, 3) if self._batches else 0.0,
+            'max_batch_size': self._max_batch_seen,
+            'avg_wait_ms': round(self._wait_time_total / self._batched_machines * 1000.0, 3) if self._batched_machines else 0.0,
+            'max_wait_ms': round(self._wait_time_max * 1000.0, 3),
+            'queued': len(self._queued),
+            'running': len(self._running),
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
@@ -0,0 +1,233 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection frees up within the pool's wait timeout."""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled DB-API connection.
+    Calling close() hands the connection back to the pool instead of closing it,
+    so existing `conn = get_connection() ... finally: conn.close()` code keeps working.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, name)
+
+    def __del__(self):
+        # Never leak a pool slot if a caller forgets to close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe connection pool with health checks and wait metrics.
+
+    Connections are opened lazily up to `max_size`; once the pool is full,
+    callers block for up to `timeout` seconds. Up to `min_size` idle connections
+    are kept warm, extra idle ones are closed after `max_idle` seconds. A
+    connection that sat idle longer than `health_check_interval` is probed
+    with `SELECT 1` before being handed out.
+
+    `connect` overrides how raw connections are created (defaults to
+    psycopg2.connect(**db_config)), which lets a local stand-in be used.
+    """
+
+    def __init__(
+        self,
+        db_config: Optional[Dict[str, str]] = None,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        health_check_interval: float = 30.0,
+        max_idle: float = 300.0,
+        connect: Optional[Callable[[], object]] = None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+        if connect is None and db_config is None:
+            raise ValueError("Either db_config or connect must be provided")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle = max_idle
+        self._connect = connect or (lambda: psycopg2.connect(**db_config))
+
+        self._cond = threading.Condition()
+        self._idle: List[Tuple[object, float]] = []  # (connection, last_used), used LIFO
+        self._size = 0  # idle + checked out
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+
+    def getconn(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Check out a connection, blocking until one is available."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        conn, last_used = None, 0.0
+
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # reserve a slot, connect outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No connection available within {timeout:.1f}s (max_size={self.max_size})")
+                waited = True
+                self._cond.wait(remaining)
+
+            waited_for = time.monotonic() - start
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_time_total += waited_for
+                self._wait_time_max = max(self._wait_time_max, waited_for)
+
+        if conn is not None and self._is_healthy(conn, last_used):
+            return PooledConnection(self, conn)
+
+        if conn is not None:
+            self._close_quietly(conn)
+            with self._cond:
+                self._discarded += 1
+                self._health_check_failures += 1
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created += 1
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        """Return a raw connection to the pool (PooledConnection.close() calls this)."""
+        reusable = not self._closed and self._reset(conn)
+        to_close = [] if reusable else [conn]
+
+        with self._cond:
+            now = time.monotonic()
+            if reusable:
+                self._idle.append((conn, now))
+            else:
+                self._size -= 1
+                self._discarded += 1
+
+            # Trim idle connections above min_size that have not been used recently
+            while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+                stale, _ = self._idle.pop(0)
+                to_close.append(stale)
+                self._size -= 1
+                self._discarded += 1
+
+            self._cond.notify()
+
+        for c in to_close:
+            self._close_quietly(c)
+
+    def closeall(self):
+        """Close idle connections and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of pool size and wait metrics."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total_s': round(self._wait_time_total, 6),
+                'wait_time_max_s': round(self._wait_time_max, 6),
+                'wait_time_avg_s': round(self._wait_time_total / self._waits, 6) if self._waits else 0.0,
+                'timeouts': self._timeouts,
+                'connections_created': self._created,
+                'connections_discarded': self._discarded,
+                'health_check_failures': self._health_check_failures,
+            }
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if getattr(conn, 'closed', 0):
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, conn) -> bool:
+        """Roll back any open transaction so the next borrower starts clean."""
+        if getattr(conn, 'closed', 0):
+            return False
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,186 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Smoothing for empty bins, so PSI stays finite
+_EPS = 1e-4
+
+
+def drift_reference(X: np.ndarray, columns: Sequence[str], n_bins: int = 10) -> Dict[str, object]:
+    """
+    Training distribution of every feature as a `n_bins` quantile histogram:
+    {'columns', 'edges' (features x n_bins-1), 'expected' (features x n_bins)}.
+    Plain arrays and lists, so it is stored next to the model in any bundle.
+    Kept in sync with training/machine_models.py in the ml-pipeline, checked by
+    its benchmarks/parity_ai_service.py.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    edges = np.quantile(X, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+    expected = np.empty((X.shape[1], n_bins))
+    for i in range(X.shape[1]):
+        bins = np.searchsorted(edges[i], X[:, i], side='right')
+        expected[i] = np.bincount(bins, minlength=n_bins) / len(X)
+    return {'columns': list(columns), 'edges': edges, 'expected': expected}
+
+
+class DriftMonitor:
+    """
+    Streaming drift estimate for one machine's model.
+
+    Each scored feature row is binned against the training quantiles and added
+    to exponentially decayed per-feature counts (effective window `window`
+    rows), so an update costs the same however long the machine has run. PSI
+    against the training histogram is recomputed on every update.
+    """
+
+    def __init__(self, reference: Dict[str, object], window: int = 1000):
+        self.columns: List[str] = list(reference['columns'])
+        self.edges = np.asarray(reference['edges'], dtype=np.float64)
+        self.expected = np.asarray(reference['expected'], dtype=np.float64) + _EPS
+        self.decay = 1.0 - 1.0 / window
+        self.counts = np.zeros_like(self.expected)
+        self.samples = 0
+        self.psi = np.zeros(len(self.columns))
+        self._rows = np.arange(len(self.columns))
+
+    def update(self, row: np.ndarray) -> float:
+        """Add one feature row (model column order); returns the largest per-feature PSI."""
+        bins = (np.asarray(row, dtype=np.float64).reshape(-1, 1) >= self.edges).sum(axis=1)
+        self.counts *= self.decay
+        self.counts[self._rows, bins] += 1.0
+        self.samples += 1
+
+        actual = self.counts / self.counts.sum(axis=1, keepdims=True) + _EPS
+        self.psi = ((actual - self.expected) * np.log(actual / self.expected)).sum(axis=1)
+        return float(self.psi.max())
+
+    @property
+    def effective_samples(self) -> float:
+        return float(self.counts[0].sum()) if len(self.columns) else 0.0
+
+
+class DriftTracker:
+    """
+    Per-machine DriftMonitors, updated as predictions are scored.
+
+    A monitor is (re)started from the reference stored with the machine's
+    current model whenever `version(machine_id)` changes, e.g. after a retrain.
+    The version is the store's file mtime or model-set publish time rather than
+    the model object, so a model evicted from the cache and reloaded keeps its
+    monitor. A machine whose largest feature PSI exceeds `threshold` after
+    `min_samples` rows is reported as drifting and handed to `retrain` once,
+    until its model is replaced or `cooldown` seconds have passed. Machines
+    whose model has no stored reference are counted as unmonitored; that
+    includes every machine in fleet serving mode, whose profiles carry no
+    reference.
+    """
+
+    def __init__(
+        self,
+        reference: Callable[[str], Optional[Dict[str, object]]],
+        version: Callable[[str], object],
+        retrain: Optional[Callable[[str], None]] = None,
+        threshold: float = 0.25,
+        window: int = 1000,
+        min_samples: int = 1000,
+        cooldown: float = 6 * 3600,
+    ):
+        self.reference = reference
+        self.version = version
+        self.retrain = retrain
+        self.threshold = threshold
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        # machine_id -> (version of the monitored model, monitor or None when unmonitored)
+        self._monitors: Dict[str, tuple] = {}
+        self._triggered: Dict[str, float] = {}  # machine_id -> monotonic time of the last retrain request
+        self._observations = 0
+        self._retrains = 0
+        self._resets = 0
+
+    def observe(self, machine_id: str, row: np.ndarray):
+        """Record the machine's latest scored feature row (constant cost)."""
+        version = self.version(machine_id)
+        with self._lock:
+            entry = self._monitors.get(machine_id)
+            if entry is None or entry[0] != version:
+                reference = self.reference(machine_id)
+                monitor = DriftMonitor(reference, self.window) if reference is not None else None
+                self._monitors[machine_id] = (version, monitor)
+                self._triggered.pop(machine_id, None)
+                if entry is not None:
+                    self._resets += 1
+            else:
+                monitor = entry[1]
+            if monitor is None:
+                return
+            psi = monitor.update(row)
+            self._observations += 1
+
+            drifting = monitor.samples >= self.min_samples and psi > self.threshold
+            last = self._triggered.get(machine_id)
+            due = last is None or time.monotonic() - last >= self.cooldown
+            if not (drifting and due and self.retrain is not None):
+                return
+            self._triggered[machine_id] = time.monotonic()
+            self._retrains += 1
+
+        print(f"Drift on {machine_id} (PSI {psi:.3f}), retraining")
+        self.retrain(machine_id)
+
+    def _status(self, machine_id: str, monitor: Optional[DriftMonitor]) -> str:
+        if monitor is None:
+            return 'unmonitored'
+        if monitor.samples < self.min_samples:
+            return 'warming_up'
+        if machine_id in self._triggered:
+            return 'retraining'
+        return 'drifting' if monitor.psi.max() > self.threshold else 'stable'
+
+    def state(self, machine_id: str, top: Optional[int] = None) -> Optional[Dict[str, object]]:
+        """Drift state of one machine, features ordered by PSI (the `top` largest)."""
+        with self._lock:
+            entry = self._monitors.get(machine_id)
+            if entry is None:
+                return None
+            monitor = entry[1]
+            state = {'machine_id': machine_id, 'status': self._status(machine_id, monitor)}
+            if monitor is None:
+                return state
+            order = np.argsort(monitor.psi)[::-1][:top]
+            state.update({
+                'psi': round(float(monitor.psi.max()), 4),
+                'samples': monitor.samples,
+                'effective_samples': round(monitor.effective_samples, 1),
+                'features': {monitor.columns[i]: round(float(monitor.psi[i]), 4) for i in order},
+            })
+            if machine_id in self._triggered:
+                state['retrain_requested_s_ago'] = round(time.monotonic() - self._triggered[machine_id], 1)
+            return state
+
+    def states(self, top: int = 3) -> List[Dict[str, object]]:
+        """Every tracked machine, most drifted first."""
+        with self._lock:
+            machine_ids = list(self._monitors)
+        states = [state for state in (self.state(machine_id, top) for machine_id in machine_ids) if state]
+        return sorted(states, key=lambda state: state.get('psi', -1.0), reverse=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            statuses = {status: 0 for status in ('stable', 'drifting', 'retraining', 'warming_up', 'unmonitored')}
+            for machine_id, (_, monitor) in self._monitors.items():
+                statuses[self._status(machine_id, monitor)] += 1
+            return {
+                'machines': len(self._monitors),
+                **statuses,
+                'psi_threshold': self.threshold,
+                'window': self.window,
+                'observations': self._observations,
+                'retrains_triggered': self._retrains,
+                'model_resets': self._resets,
+            }
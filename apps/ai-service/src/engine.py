@@ -1,25 +1,81 @@
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import psycopg2
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import weakref
+from compiled_forest import CompiledIsolationForest
+from db_pool import ConnectionPool
+from drift import DriftTracker, drift_reference
+from feature_state import OnlineFeatureEngine
+from fleet_model import FLEET_MODEL_ID, FleetModel
+from metrics import MODEL_TRAININGS, ROWS_FETCHED, stage
+from model_store import ModelStore
+from result_cache import PredictionCache
+from sql_features import SqlFeatureReader
+from trainer import ModelPending, TrainingScheduler
+
+if TYPE_CHECKING:
+    # sklearn takes over a second to import; it is loaded on first training or model load
+    from sklearn.ensemble import IsolationForest
+    from sklearn.preprocessing import StandardScaler
 
 class PredictiveMaintenanceEngine:
     """
     Anomaly detection and predictive maintenance using Isolation Forest.
     Detects unusual machine behavior that may indicate impending failure.
+    
+    `serving_mode` 'machine' (default) scores every machine with its own forest
+    and scaler; 'fleet' scores every machine with one shared FleetModel and the
+    machine's normalization/calibration profile.
+    
+    `feature_backend` 'pandas' (default) pivots long-format telemetry and builds
+    features in this process; 'sql' computes the same features in TimescaleDB
+    (see SqlFeatureReader), and /analyze then reads only each machine's latest row.
     """
     
-    def __init__(self, db_config: Dict[str, str]):
+    def __init__(
+        self,
+        db_config: Dict[str, str],
+        pool: Optional[ConnectionPool] = None,
+        fleet_workers: int = 8,
+        model_store: Optional[ModelStore] = None,
+        trainer: Optional[TrainingScheduler] = None,
+        prediction_cache: Optional[PredictionCache] = None,
+        serving_mode: str = 'machine',
+        drift: Optional[DriftTracker] = None,
+        feature_backend: str = 'pandas',
+        compiled: Optional['weakref.WeakKeyDictionary'] = None,
+    ):
+        if serving_mode not in ('machine', 'fleet'):
+            raise ValueError(f"Unknown serving mode {serving_mode!r}")
+        if feature_backend not in ('pandas', 'sql'):
+            raise ValueError(f"Unknown feature backend {feature_backend!r}")
         self.db_config = db_config
-        self.models: Dict[str, IsolationForest] = {}
-        self.scalers: Dict[str, StandardScaler] = {}
+        self.serving_mode = serving_mode
+        self.feature_backend = feature_backend
+        self.sql_features = SqlFeatureReader() if feature_backend == 'sql' else None
+        self.pool = pool or ConnectionPool(db_config)
+        self.model_store = model_store or ModelStore('model_store')
+        # Without a trainer, missing models are trained inline (standalone usage)
+        self.trainer = trainer
+        self.fleet_workers = fleet_workers
+        self.window_hours = 0.5  # history considered by a prediction
+        # Readings are stamped with the writer's NOW() and committed after it, so the newest
+        # `commit_grace` seconds are re-read on every prediction until they can no longer change
+        self.commit_grace = 5.0
+        self.feature_state = OnlineFeatureEngine(window=5)
+        self.prediction_cache = prediction_cache or PredictionCache()
+        # Optional per-machine drift monitors, fed with every freshly scored feature row
+        self.drift = drift
+        # Keyed by model object, so entries go away when the store evicts the model. May be shared
+        # (preload.compiled), so forests compiled before a server fork are reused by every worker
+        self._compiled: 'weakref.WeakKeyDictionary[IsolationForest, CompiledIsolationForest]' = (
+            compiled if compiled is not None else weakref.WeakKeyDictionary())
         
     def get_connection(self):
-        return psycopg2.connect(**self.db_config)
+        """Borrow a pooled connection; close() returns it to the pool."""
+        return self.pool.getconn()
     
     def fetch_telemetry(self, machine_id: str, hours: int = 24) -> pd.DataFrame:
         """Fetch recent telemetry data for a machine."""
@@ -35,47 +91,212 @@ class PredictiveMaintenanceEngine:
                   AND time > NOW() - INTERVAL '%s hours'
                 ORDER BY time ASC
             """
-            df = pd.read_sql_query(query, conn, params=(machine_id, hours))
+            with stage('sql'):
+                df = pd.read_sql_query(query, conn, params=(machine_id, hours))
+            ROWS_FETCHED.labels('machine').inc(len(df))
             
             # Pivot to get metrics as columns
             if not df.empty:
-                df_pivot = df.pivot(index='time', columns='metric_name', values='value')
-                df_pivot = df_pivot.fillna(method='ffill').fillna(0)
+                with stage('pivot'):
+                    # Duplicate readings of a metric at one timestamp are averaged, as on every other path
+                    df_pivot = df.pivot_table(index='time', columns='metric_name', values='value',
+                                              aggfunc='mean', dropna=False)
+                    df_pivot = df_pivot.fillna(method='ffill').fillna(0)
                 return df_pivot
             return pd.DataFrame()
         finally:
             conn.close()
     
+    def fetch_telemetry_since(
+        self,
+        watermarks: Dict[str, Optional[datetime]],
+        hours: float = 0.5,
+        commit_grace: float = 0.0,
+    ) -> Tuple[Dict[str, List[Tuple]], Optional[datetime]]:
+        """
+        Fetch long-format (time, metric_name, value) rows for several machines in one
+        query, bounded to the last `hours` and starting after the oldest watermark.
+        Rows each machine has already seen are dropped by its feature state.
+        Also returns the database's NOW() minus `commit_grace` seconds: rows up to
+        then are taken as committed (None when there are no rows). Skips pandas entirely.
+        """
+        since = [watermark for watermark in watermarks.values() if watermark is not None]
+        oldest = min(since) if len(since) == len(watermarks) else None
+        
+        conn = self.get_connection()
+        try:
+            with stage('sql_incremental'):
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT machine_id, time, metric_name, value,
+                           NOW() - make_interval(secs => %s) AS settled_until
+                    FROM machine_telemetry
+                    WHERE machine_id = ANY(%s)
+                      AND (%s::timestamptz IS NULL OR time > %s)
+                      AND time > NOW() - INTERVAL '%s hours'
+                    ORDER BY machine_id, time ASC
+                """, (commit_grace, list(watermarks), oldest, oldest, hours))
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+        ROWS_FETCHED.labels('incremental').inc(len(rows))
+        
+        by_machine: Dict[str, List[Tuple]] = {machine_id: [] for machine_id in watermarks}
+        for machine_id, time, metric_name, value, _ in rows:
+            by_machine[machine_id].append((time, metric_name, value))
+        return by_machine, rows[0][4] if rows else None
+    
+    def fetch_fleet_telemetry(self, hours: float = 0.5) -> pd.DataFrame:
+        """
+        Fetch recent telemetry for every machine in a single query.
+        Returns a frame indexed by (machine_id, time) with metrics as columns,
+        forward-filled within each machine. Metrics a machine never reported stay NaN.
+        """
+        conn = self.get_connection()
+        try:
+            query = """
+                SELECT 
+                    time,
+                    machine_id,
+                    metric_name,
+                    value
+                FROM machine_telemetry
+                WHERE time > NOW() - INTERVAL '%s hours'
+                ORDER BY machine_id, time ASC
+            """
+            with stage('fleet_sql'):
+                df = pd.read_sql_query(query, conn, params=(hours,))
+        finally:
+            conn.close()
+        ROWS_FETCHED.labels('fleet').inc(len(df))
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        with stage('fleet_pivot'):
+            wide = df.pivot_table(index=['machine_id', 'time'], columns='metric_name', values='value', aggfunc='mean')
+            
+            # Same fill semantics as fetch_telemetry, without leaking values across machines
+            reported = wide.notna().groupby(level='machine_id').any()
+            wide = wide.groupby(level='machine_id').ffill().fillna(0)
+            return wide.where(reported.reindex(wide.index.get_level_values('machine_id')).values)
+    
     def train_model(self, machine_id: str, contamination: float = 0.1):
         """Train anomaly detection model for a specific machine."""
-        df = self.fetch_telemetry(machine_id, hours=168)  # 1 week of data
+        if self.serving_mode == 'fleet':
+            if machine_id == FLEET_MODEL_ID:
+                return self.train_fleet_model(contamination=contamination)
+            return self.profile_machine(machine_id)
+        
+        df, features = self.machine_features(machine_id, hours=168)  # 1 week of data
         
         if df.empty or len(df) < 100:
             print(f"Insufficient data for {machine_id}")
             return False
         
-        # Feature engineering
-        features = self._engineer_features(df)
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
         
         # Scale features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(features)
+        with stage('scaler_fit'):
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(features)
         
         # Train Isolation Forest
-        model = IsolationForest(
-            contamination=contamination,
-            random_state=42,
-            n_estimators=100
-        )
-        model.fit(X_scaled)
+        with stage('model_fit'):
+            model = IsolationForest(
+                contamination=contamination,
+                random_state=42,
+                n_estimators=100
+            )
+            model.fit(X_scaled)
         
-        # Store model and scaler
-        self.models[machine_id] = model
-        self.scalers[machine_id] = scaler
+        # Persist model and scaler, with the training distribution for drift monitoring
+        self.model_store.put(machine_id, model, scaler,
+                             reference=drift_reference(features.values, list(features.columns)))
         
         print(f"Model trained for {machine_id}")
         return True
     
+    def train_fleet_model(self, contamination: float = 0.1, hours: float = 168):
+        """Fit the shared fleet model and the profile of every machine with enough data."""
+        wide, features = self.fleet_features(hours=hours)
+        if wide.empty:
+            print("Insufficient data for the fleet model")
+            return False
+        
+        with stage('model_fit'):
+            try:
+                fleet = FleetModel.fit(wide, features, self._feature_columns(list(wide.columns)),
+                                       contamination=contamination)
+            except ValueError as e:
+                print(f"Insufficient data for the fleet model: {e}")
+                return False
+        
+        self.model_store.put_fleet_model(fleet)
+        print(f"Fleet model trained for {len(fleet.profiles)} machines")
+        return True
+    
+    def profile_machine(self, machine_id: str):
+        """Onboard a machine onto the current fleet model: only its profile is computed."""
+        fleet = self.model_store.get_fleet_model()
+        if fleet is None:
+            return self.train_fleet_model()
+        
+        df, features = self.machine_features(machine_id, hours=168)
+        if df.empty or len(df) < 100:
+            print(f"Insufficient data for {machine_id}")
+            return False
+        
+        with stage('scaler_fit'):
+            profile = fleet.profile(df, features)
+        self.model_store.put_profile(machine_id, fleet, profile)
+        
+        print(f"Profile computed for {machine_id}")
+        return True
+    
+    def machine_features(self, machine_id: str, hours: float = 168) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """(time-indexed raw metrics, features) of one machine, from the configured feature backend."""
+        if self.sql_features is None:
+            df = self.fetch_telemetry(machine_id, hours=hours)
+            if df.empty:
+                return df, df
+            with stage('engineer_features'):
+                return df, self._engineer_features(df)
+        
+        conn = self.get_connection()
+        try:
+            with stage('sql_features'):
+                raw, features = self.sql_features.read(conn, hours, machine_id=machine_id)
+        finally:
+            conn.close()
+        ROWS_FETCHED.labels('sql_features').inc(len(raw))
+        if raw.empty:
+            return raw, features
+        return raw.droplevel('machine_id'), features.droplevel('machine_id')
+    
+    def fleet_features(self, hours: float = 0.5, latest: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        (raw metrics, features) of every machine, indexed by (machine_id, time).
+        With `latest` and the sql backend only each machine's newest row is
+        transferred; the pandas backend always returns the full window.
+        """
+        if self.sql_features is None:
+            wide = self.fetch_fleet_telemetry(hours=hours)
+            if wide.empty:
+                return wide, wide
+            with stage('fleet_features'):
+                return wide, self._engineer_fleet_features(wide)
+        
+        conn = self.get_connection()
+        try:
+            with stage('fleet_sql_features'):
+                wide, features = self.sql_features.read(conn, hours, latest=latest)
+        finally:
+            conn.close()
+        ROWS_FETCHED.labels('sql_features').inc(len(wide))
+        return wide, features
+    
     def _engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Create features from raw telemetry."""
         features = df.copy()
@@ -92,36 +313,211 @@ class PredictiveMaintenanceEngine:
         
         return features.fillna(0)
     
-    def predict_anomaly(self, machine_id: str) -> Optional[Dict]:
-        """Detect if current machine state is anomalous."""
-        if machine_id not in self.models:
-            print(f"No model for {machine_id}, training...")
-            if not self.train_model(machine_id):
-                return None
+    def _engineer_fleet_features(self, wide: pd.DataFrame) -> pd.DataFrame:
+        """
+        Vectorized _engineer_features over a (machine_id, time)-indexed frame.
+        Rolling windows and diffs restart at every machine boundary, so each
+        machine's rows match what _engineer_features produces on its own window.
+        """
+        grouped = wide.groupby(level='machine_id', sort=False)
+        rolling = grouped.rolling(window=5, min_periods=1)
         
-        # Get recent data (last 30 minutes)
-        df = self.fetch_telemetry(machine_id, hours=0.5)
+        def align(frame: pd.DataFrame, suffix: str) -> pd.DataFrame:
+            # groupby().rolling() prepends the group key as an extra index level
+            if frame.index.nlevels > wide.index.nlevels:
+                frame = frame.droplevel(0)
+            return frame.reindex(wide.index).add_suffix(suffix)
         
-        if df.empty:
-            return None
+        mean = align(rolling.mean(), '_mean_5m')
+        std = align(rolling.std().fillna(0), '_std_5m')
+        maximum = align(rolling.max(), '_max_5m')
+        diff = align(grouped.diff().fillna(0), '_diff')
         
-        # Engineer features
-        features = self._engineer_features(df)
+        interleaved = [frame[f'{col}{suffix}'] for col in wide.columns
+                       for frame, suffix in ((mean, '_mean_5m'), (std, '_std_5m'), (maximum, '_max_5m'))]
+        return pd.concat([wide, *interleaved, diff], axis=1).fillna(0)
+    
+    @staticmethod
+    def _feature_columns(metrics: List[str]) -> List[str]:
+        """Column order produced by _engineer_features for the given metric columns."""
+        columns = list(metrics)
+        for col in metrics:
+            columns += [f'{col}_mean_5m', f'{col}_std_5m', f'{col}_max_5m']
+        columns += [f'{col}_diff' for col in metrics]
+        return columns
+    
+    def _lookup_model(self, machine_id: str):
+        if self.serving_mode == 'fleet':
+            return self.model_store.get_profile(machine_id)
+        return self.model_store.get(machine_id)
+    
+    def _load_model(self, machine_id: str) -> Optional[Tuple['IsolationForest', 'StandardScaler']]:
+        """
+        Get the machine's (model, scaler) from the store, training it if none exists yet.
+        With a trainer attached, training is queued and ModelPending is raised instead.
+        In fleet mode the pair is (FleetModel, MachineProfile), and only the profile
+        is computed unless there is no fleet model yet.
+        """
+        with stage('model_load'):
+            entry = self._lookup_model(machine_id)
+        if entry is not None:
+            return entry
         
-        # Get latest reading
-        latest = features.iloc[-1:].values
+        target = machine_id
+        if self.serving_mode == 'fleet' and self.model_store.get_fleet_model() is None:
+            # Every machine waits on the one fleet job instead of training it each
+            target = FLEET_MODEL_ID
         
-        # Scale
-        latest_scaled = self.scalers[machine_id].transform(latest)
+        if self.trainer is not None:
+            job = self.trainer.submit(target)
+            if job.status == 'failed':
+                return None
+            if job.status == 'completed':
+                # Finished between the store lookup and submit()
+                return self._lookup_model(machine_id)
+            raise ModelPending(job)
         
-        # Predict
-        prediction = self.models[machine_id].predict(latest_scaled)[0]
-        anomaly_score = self.models[machine_id].score_samples(latest_scaled)[0]
+        print(f"No model for {machine_id}, training...")
+        trained = self.train_model(target)
+        MODEL_TRAININGS.labels('completed' if trained else 'failed').inc()
+        if not trained:
+            return None
+        return self._lookup_model(machine_id)
+    
+    def _model_columns(self, model, scaler: 'StandardScaler', metrics: List[str]) -> List[str]:
+        """Feature columns the machine's model was fitted on."""
+        if isinstance(model, FleetModel):
+            return model.columns
+        columns = getattr(scaler, 'feature_names_in_', None)
+        return list(columns) if columns is not None else self._feature_columns(metrics)
+    
+    def predict_anomaly(self, machine_id: str) -> Optional[Dict]:
+        """
+        Detect if current machine state is anomalous.
+        Only telemetry newer than the machine's feature-state watermark is read;
+        the latest feature row is updated incrementally from the ring buffers.
+        """
+        result = self.predict_many([machine_id])[machine_id]
+        if isinstance(result, ModelPending):
+            raise result
+        return result
+    
+    def predict_many(self, machine_ids: List[str]) -> Dict[str, object]:
+        """
+        predict_anomaly for several machines with a single telemetry query.
+        Maps each machine to its prediction, None, or the ModelPending raised for it.
+        """
+        results, models, states = self._prepare_batch(machine_ids)
+        if not models:
+            return results
         
-        is_anomaly = prediction == -1
+        new_rows, settled_until = self.fetch_telemetry_since(
+            {machine_id: state.watermark for machine_id, state in states.items()},
+            hours=self.window_hours,
+            commit_grace=self.commit_grace,
+        )
+        return self._complete_batch(results, models, states, new_rows, settled_until)
+    
+    def _prepare_batch(self, machine_ids: List[str]) -> Tuple[Dict[str, object], Dict, Dict]:
+        """
+        First half of predict_many: resolve models and feature states.
+        Kept separate from the telemetry read so async callers can do that part themselves.
+        """
+        results: Dict[str, object] = {}
+        models = {}
+        for machine_id in dict.fromkeys(machine_ids):
+            try:
+                entry = self._load_model(machine_id)
+            except ModelPending as pending:
+                results[machine_id] = pending
+                continue
+            if entry is None:
+                results[machine_id] = None
+            else:
+                models[machine_id] = entry
+        
+        window_seconds = self.window_hours * 3600
+        states = {}
+        for machine_id in models:
+            state = self.feature_state.get(machine_id)
+            with state.lock:
+                if state.is_stale(window_seconds):
+                    # Nothing recent to build on, rebuild from the last 30 minutes
+                    state.clear()
+            states[machine_id] = state
+        return results, models, states
+    
+    def _complete_batch(
+        self,
+        results: Dict[str, object],
+        models: Dict,
+        states: Dict,
+        new_rows: Dict[str, List[Tuple]],
+        settled_until: Optional[datetime] = None,
+    ) -> Dict[str, object]:
+        """Second half of predict_many: apply fetched rows and score every machine."""
+        window_seconds = self.window_hours * 3600
+        for machine_id, state in states.items():
+            model, scaler = models[machine_id]
+            with state.lock, stage('feature_update'):
+                # Rows at or before the watermark are skipped, so overlapping reads are harmless
+                state.update(new_rows.get(machine_id, []), settled_until)
+                if state.is_stale(window_seconds):
+                    results[machine_id] = None
+                    continue
+                revision = state.revision
+                # An unchanged revision means nothing changed since the cached answer
+                cached = self.prediction_cache.get(machine_id, revision, model)
+                if cached is not None:
+                    results[machine_id] = cached
+                    continue
+                view = state.view()
+                latest_features = view.feature_vector(self._model_columns(model, scaler, view.metrics))
+                latest = pd.Series({metric: view.current[metric] for metric in view.metrics})
+            result = self._score(machine_id, model, scaler, latest_features, latest)
+            self.prediction_cache.put(machine_id, revision, model, result)
+            if self.drift is not None:
+                # Only new revisions get here, so a feature row counts once unless a late reading revises it
+                self.drift.observe(machine_id, latest_features)
+            results[machine_id] = result
+        
+        return results
+    
+    def _compiled_model(self, model: 'IsolationForest', scaler: 'StandardScaler') -> CompiledIsolationForest:
+        """Compiled form of a (model, scaler) pair, built once per loaded model."""
+        compiled = self._compiled.get(model)
+        if compiled is None:
+            compiled = CompiledIsolationForest(model, scaler)
+            self._compiled[model] = compiled
+        return compiled
+
+    def warm(self, pairs) -> None:
+        """
+        Compile and score each (model, scaler) pair once, so the first requests
+        after a model swap don't pay for it.
+        """
+        for model, scaler in pairs:
+            self._compiled_model(model, scaler).score(np.zeros(scaler.n_features_in_))
+
+    def _score(
+        self,
+        machine_id: str,
+        model: 'IsolationForest',
+        scaler: 'StandardScaler',
+        latest_features: np.ndarray,
+        latest: pd.Series,
+    ) -> Dict:
+        """Score the latest feature row of a machine and build the prediction payload."""
+        # Scale + predict + score in one pass over the flattened forest
+        with stage('score'):
+            if isinstance(model, FleetModel):
+                is_anomaly, anomaly_score = model.score(scaler, latest_features)
+            else:
+                is_anomaly, anomaly_score = self._compiled_model(model, scaler).score(latest_features)
+        is_anomaly, anomaly_score = is_anomaly[0], anomaly_score[0]
         
         # Calculate risk level
-        risk_level = self._calculate_risk(df, is_anomaly, anomaly_score)
+        risk_level = self._calculate_risk(latest, is_anomaly, anomaly_score)
         
         return {
             'machine_id': machine_id,
@@ -129,17 +525,16 @@ class PredictiveMaintenanceEngine:
             'is_anomaly': bool(is_anomaly),
             'anomaly_score': float(anomaly_score),
             'risk_level': risk_level,
-            'current_metrics': df.iloc[-1].to_dict() if not df.empty else {},
-            'recommendation': self._get_recommendation(risk_level)
+            'current_metrics': latest.to_dict(),
+            'recommendation': self._get_recommendation(risk_level),
+            'cached': False,
         }
     
-    def _calculate_risk(self, df: pd.DataFrame, is_anomaly: bool, score: float) -> str:
+    def _calculate_risk(self, latest: pd.Series, is_anomaly: bool, score: float) -> str:
         """Calculate risk level based on anomaly detection and thresholds."""
-        if df.empty:
+        if latest.empty:
             return 'UNKNOWN'
         
-        latest = df.iloc[-1]
-        
         # Check critical thresholds
         critical_temp = latest.get('temperature', 0) > 210
         critical_vibration = latest.get('vibration', 0) > 2.5
@@ -166,24 +561,51 @@ class PredictiveMaintenanceEngine:
         }
         return recommendations.get(risk_level, 'No recommendation')
     
-    def analyze_all_machines(self) -> List[Dict]:
-        """Analyze all machines in the system."""
+    def fleet_watermark(self, hours: float = 0.5) -> Optional[datetime]:
+        """Newest telemetry timestamp across the fleet; cheap check for whether /analyze is stale."""
         conn = self.get_connection()
         try:
-            # Get unique machine IDs
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT machine_id FROM machine_telemetry")
-            machine_ids = [row[0] for row in cursor.fetchall()]
-            
-            results = []
-            for machine_id in machine_ids:
-                result = self.predict_anomaly(machine_id)
-                if result:
-                    results.append(result)
-            
-            return results
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT MAX(time) FROM machine_telemetry WHERE time > NOW() - INTERVAL '%s hours'",
+                    (hours,),
+                )
+                return cur.fetchone()[0]
         finally:
             conn.close()
+    
+    def analyze_all_machines(self) -> List[Dict]:
+        """
+        Analyze all machines with recent telemetry.
+        One query fetches the fleet's last 30 minutes, features are built for all
+        machines at once (in the database with the sql backend, which returns only
+        the latest row per machine) and the per-machine models are scored over a thread pool.
+        """
+        wide, features = self.fleet_features(hours=0.5, latest=True)
+        
+        if wide.empty:
+            return []
+        
+        latest_rows = wide.groupby(level='machine_id', sort=False).tail(1).droplevel('time')
+        latest_features = features.groupby(level='machine_id', sort=False).tail(1).droplevel('time')
+        
+        def analyze(machine_id: str) -> Optional[Dict]:
+            latest = latest_rows.loc[machine_id].dropna()
+            try:
+                entry = self._load_model(machine_id)
+            except ModelPending:
+                return None
+            if entry is None:
+                return None
+            model, scaler = entry
+            columns = self._model_columns(model, scaler, list(latest.index))
+            row = latest_features.loc[machine_id].reindex(columns, fill_value=0).values.reshape(1, -1)
+            return self._score(machine_id, model, scaler, row, latest)
+        
+        with ThreadPoolExecutor(max_workers=self.fleet_workers) as executor:
+            results = list(executor.map(analyze, latest_rows.index))
+        
+        return [result for result in results if result]
 
 
 if __name__ == '__main__':
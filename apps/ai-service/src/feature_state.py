@@ -0,0 +1,144 @@
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class MachineFeatureState:
+    """
+    Incremental equivalent of pivot + ffill + _engineer_features for one machine.
+
+    Keeps the last `window` pivoted rows per metric in fixed-size ring buffers,
+    the forward-fill value of every metric and the watermark (timestamp of the
+    newest row applied). Each new row costs O(metrics * window).
+
+    Telemetry is stamped with the writer's NOW() and committed afterwards, so a
+    reading can become visible after newer ones. Rows are therefore applied for
+    good only up to `settled_until` (the reader's NOW() minus a commit grace).
+    Newer rows are kept as `pending`, replayed on top by view(), and read again
+    by the next query, which starts at the watermark, so a late reading among
+    them is still picked up.
+    """
+
+    def __init__(self, window: int = 5):
+        self.window = window
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget all history; the next update starts from a cold window."""
+        self.watermark: Optional[datetime] = None
+        self.metrics: List[str] = []
+        self.current: Dict[str, float] = {}
+        self.buffers: Dict[str, Deque[float]] = {}
+        self.rows_seen = 0
+        self.pending: List[Tuple[datetime, str, float]] = []
+
+    def update(self, rows: Iterable[Tuple[datetime, str, float]], settled_until: Optional[datetime] = None) -> int:
+        """
+        Apply long-format (time, metric_name, value) rows sorted by time, up to
+        `settled_until` (all of them when None); later rows replace `pending`.
+        Readings sharing a timestamp form one pivoted row; duplicate readings of
+        a metric are averaged. Returns rows applied.
+        """
+        applied = 0
+        pending_time, pending = None, {}
+        self.pending = []
+        for time, metric, value in rows:
+            if self.watermark is not None and time <= self.watermark:
+                continue
+            if settled_until is not None and time > settled_until:
+                self.pending.append((time, metric, value))
+                continue
+            if pending and time != pending_time:
+                self._push(pending_time, pending)
+                applied += 1
+                pending = {}
+            pending_time = time
+            pending.setdefault(metric, []).append(float(value))
+        if pending:
+            self._push(pending_time, pending)
+            applied += 1
+        return applied
+
+    def _push(self, time: datetime, pending: Dict[str, List[float]]):
+        readings = {metric: sum(values) / len(values) for metric, values in pending.items()}
+        for metric in readings:
+            if metric not in self.buffers:
+                # A metric first seen now was 0 in every earlier pivoted row
+                self.buffers[metric] = deque([0.0] * min(self.rows_seen, self.window), maxlen=self.window)
+                self.current[metric] = 0.0
+                self.metrics = sorted(self.buffers)
+        self.current.update(readings)
+        for metric, buffer in self.buffers.items():
+            buffer.append(self.current[metric])
+        self.rows_seen += 1
+        self.watermark = time
+
+    @property
+    def latest(self) -> Optional[datetime]:
+        """Timestamp of the newest row seen, pending or applied."""
+        return self.pending[-1][0] if self.pending else self.watermark
+
+    @property
+    def revision(self) -> Optional[Tuple]:
+        """Changes whenever view() would: a new row, or a late reading among the pending ones."""
+        return (self.watermark, self.latest, len(self.pending)) if self.latest is not None else None
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        """True when no rows were seen or the newest row is older than max_age_seconds."""
+        latest = self.latest
+        if latest is None:
+            return True
+        now = datetime.now(timezone.utc) if latest.tzinfo else datetime.now()
+        return (now - latest).total_seconds() > max_age_seconds
+
+    def view(self) -> 'MachineFeatureState':
+        """This state with the pending rows applied (a copy when there are any)."""
+        if not self.pending:
+            return self
+        view = MachineFeatureState(self.window)
+        view.watermark = self.watermark
+        view.metrics = list(self.metrics)
+        view.current = dict(self.current)
+        view.buffers = {metric: deque(buffer, maxlen=self.window) for metric, buffer in self.buffers.items()}
+        view.rows_seen = self.rows_seen
+        view.update(self.pending)
+        return view
+
+    def features(self) -> Dict[str, float]:
+        """Latest feature row, keyed like the columns of _engineer_features."""
+        features = dict(self.current)
+        for metric in self.metrics:
+            values = np.fromiter(self.buffers[metric], dtype=np.float64)
+            features[f'{metric}_mean_5m'] = values.mean()
+            features[f'{metric}_std_5m'] = values.std(ddof=1) if len(values) > 1 else 0.0
+            features[f'{metric}_max_5m'] = values.max()
+            features[f'{metric}_diff'] = values[-1] - values[-2] if len(values) > 1 else 0.0
+        return features
+
+    def feature_vector(self, columns: Sequence[str]) -> np.ndarray:
+        """Latest feature row as a (1, n) array in the given column order."""
+        features = self.features()
+        return np.array([[features.get(column, 0.0) for column in columns]], dtype=np.float64)
+
+
+class OnlineFeatureEngine:
+    """Per-machine MachineFeatureState registry."""
+
+    def __init__(self, window: int = 5):
+        self.window = window
+        self._states: Dict[str, MachineFeatureState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, machine_id: str) -> MachineFeatureState:
+        state = self._states.get(machine_id)
+        if state is None:
+            with self._lock:
+                state = self._states.setdefault(machine_id, MachineFeatureState(self.window))
+        return state
+
+    def __len__(self) -> int:
+        return len(self._states)
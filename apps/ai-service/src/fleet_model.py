@@ -0,0 +1,194 @@
+import warnings
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from compiled_forest import CompiledIsolationForest
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import IsolationForest
+
+# Training job / store key of the shared fleet model (as opposed to a machine's profile)
+FLEET_MODEL_ID = '__fleet__'
+
+# Feature suffixes in the metric's own units, shifted by its mean when normalizing.
+# The others (rolling std, diff) are spreads and are only rescaled.
+_CENTRED_SUFFIXES = ('', '_mean_5m', '_max_5m')
+_SPREAD_SUFFIXES = ('_std_5m', '_diff')
+
+
+class MachineProfile:
+    """
+    What the fleet model needs to know about one machine: the mean and standard
+    deviation of each metric (fleet metric order) and the score below which the
+    machine's readings are anomalous. A few hundred bytes per machine.
+    """
+
+    __slots__ = ('mean', 'scale', 'threshold')
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, threshold: float):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.threshold = float(threshold)
+
+    def nbytes(self) -> int:
+        return self.mean.nbytes + self.scale.nbytes + 8
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'mean': self.mean.tolist(), 'scale': self.scale.tolist(), 'threshold': self.threshold}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'MachineProfile':
+        return cls(data['mean'], data['scale'], data['threshold'])
+
+
+class FleetModel:
+    """
+    One IsolationForest shared by the whole fleet, scored on per-machine
+    normalized features.
+
+    Each machine's metrics are standardized with its own profile (mean, scale)
+    before feature engineering, which for the rolling mean/max/std and diff
+    features works out to a per-feature shift and scale. The forest is fitted
+    on a sample of every machine's normalized rows. Its score distribution still
+    differs per machine, so each profile also holds a calibrated threshold: the
+    `contamination` quantile of the machine's own training scores.
+
+    Reported scores are shifted so that the machine's threshold lands on the
+    forest's offset_, which keeps their scale comparable with per-machine models.
+    """
+
+    def __init__(
+        self,
+        model: 'IsolationForest',
+        metrics: List[str],
+        columns: List[str],
+        contamination: float,
+        profiles: Optional[Dict[str, MachineProfile]] = None,
+        version: Optional[str] = None,
+    ):
+        self.model = model
+        self.metrics = list(metrics)
+        self.columns = list(columns)
+        self.contamination = contamination
+        self.profiles = profiles if profiles is not None else {}
+        self.version = version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+
+        metric_index, centred = [], []
+        for column in self.columns:
+            for i, metric in enumerate(self.metrics):
+                suffix = column[len(metric):] if column.startswith(metric) else None
+                if suffix in _CENTRED_SUFFIXES or suffix in _SPREAD_SUFFIXES:
+                    metric_index.append(i)
+                    centred.append(suffix in _CENTRED_SUFFIXES)
+                    break
+            else:
+                raise ValueError(f"Feature column {column!r} does not derive from a fleet metric")
+        self._metric_index = np.array(metric_index, dtype=np.intp)
+        self._centred = np.array(centred, dtype=bool)
+        self._compiled: Optional[CompiledIsolationForest] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled'] = None  # rebuilt from the forest on first use
+        return state
+
+    @property
+    def compiled(self) -> CompiledIsolationForest:
+        if self._compiled is None:
+            from sklearn.preprocessing import StandardScaler
+
+            # Inputs are normalized per machine beforehand, so the compiled forest does no scaling
+            self._compiled = CompiledIsolationForest(self.model, StandardScaler(with_mean=False, with_std=False))
+        return self._compiled
+
+    def normalization(self, profile: MachineProfile) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-feature (shift, scale) equivalent to standardizing the metrics with `profile`."""
+        shift = np.where(self._centred, profile.mean[self._metric_index], 0.0)
+        return shift, profile.scale[self._metric_index]
+
+    def raw_scores(self, profile: MachineProfile, X: np.ndarray) -> np.ndarray:
+        shift, scale = self.normalization(profile)
+        _, scores = self.compiled.score((np.asarray(X, dtype=np.float64) - shift) / scale)
+        return scores
+
+    def score(self, profile: MachineProfile, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(is_anomaly, calibrated score) for raw feature rows of the machine `profile` belongs to."""
+        scores = self.raw_scores(profile, X)
+        return scores < profile.threshold, scores - profile.threshold + self.model.offset_
+
+    def profile(self, raw: pd.DataFrame, features: pd.DataFrame) -> MachineProfile:
+        """
+        Profile a machine from its training window: `raw` metric rows (any column
+        order) and their engineered features. Only the threshold needs the
+        forest, so a new machine is onboarded without fitting any trees.
+        """
+        mean, scale = self._metric_moments(raw)
+        profile = MachineProfile(mean, scale, 0.0)
+        scores = self.raw_scores(profile, features.reindex(columns=self.columns, fill_value=0).values)
+        profile.threshold = float(np.quantile(scores, self.contamination))
+        return profile
+
+    def _metric_moments(self, raw: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        values = raw.reindex(columns=self.metrics).to_numpy(dtype=np.float64)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns: metric never reported
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+        # Metrics a machine never reports stay at 0, like the per-machine features;
+        # constant metrics keep their raw units, like StandardScaler
+        mean = np.where(np.isfinite(mean), mean, 0.0)
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+        return mean, std
+
+    @classmethod
+    def fit(
+        cls,
+        raw: pd.DataFrame,
+        features: pd.DataFrame,
+        columns: List[str],
+        contamination: float = 0.1,
+        n_estimators: int = 100,
+        max_rows_per_machine: int = 2000,
+        min_rows: int = 100,
+        random_state: int = 42,
+    ) -> 'FleetModel':
+        """
+        Fit the shared forest and every machine's profile. `raw` and `features`
+        are (machine_id, time)-indexed, as from the engine's fleet fetch and
+        _engineer_fleet_features. Each machine contributes at most
+        `max_rows_per_machine` rows to the forest, so large machines do not
+        dominate; machines with fewer than `min_rows` rows are left out.
+        """
+        from sklearn.ensemble import IsolationForest
+
+        metrics = list(raw.columns)
+        rng = np.random.default_rng(random_state)
+        placeholder = cls(IsolationForest(), metrics, columns, contamination)
+
+        normalized, samples = {}, []
+        for machine_id, machine_raw in raw.groupby(level='machine_id', sort=False):
+            if len(machine_raw) < min_rows:
+                continue
+            mean, scale = placeholder._metric_moments(machine_raw)
+            profile = MachineProfile(mean, scale, 0.0)
+            shift, feature_scale = placeholder.normalization(profile)
+            X = features.loc[machine_id].reindex(columns=columns, fill_value=0).to_numpy(dtype=np.float64)
+            Z = (X - shift) / feature_scale
+            normalized[machine_id] = (profile, Z)
+            take = rng.choice(len(Z), size=min(len(Z), max_rows_per_machine), replace=False)
+            samples.append(Z[np.sort(take)])
+        if not samples:
+            raise ValueError("No machine has enough telemetry to fit a fleet model")
+
+        model = IsolationForest(contamination=contamination, random_state=random_state, n_estimators=n_estimators)
+        model.fit(np.concatenate(samples))
+
+        fleet = cls(model, metrics, columns, contamination)
+        for machine_id, (profile, Z) in normalized.items():
+            _, scores = fleet.compiled.score(Z)
+            profile.threshold = float(np.quantile(scores, contamination))
+            fleet.profiles[machine_id] = profile
+        return fleet
@@ -1,9 +1,24 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
 from engine import PredictiveMaintenanceEngine
+from db_pool import ConnectionPool
+from trainer import ModelPending, TrainingScheduler
+from coalescer import PredictionCoalescer
+from drift import DriftTracker
+from streaming import AnomalyStream
+from result_cache import FleetSnapshot, PredictionCache
+from metrics import RequestMetricsMiddleware, components
+from profiler import ProfilerBusy, SamplingProfiler
+from registry import NoPreviousVersion
+import preload
+import asyncio
+import json
 import os
 
 app = FastAPI(title="Operation Obsidian AI Service")
@@ -16,6 +31,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+# Under server.py, worker 0 runs the fleet-wide background work (anomaly stream, snapshot
+# refreshes, registry polls, drift retrains) so it is done once, not once per worker
+primary = os.getenv('SERVING_WORKER', '0') == '0'
+serving_workers = int(os.getenv('SERVING_WORKERS', '1')) if 'SERVING_WORKER' in os.environ else 1
 
 # Initialize engine
 db_config = {
@@ -26,7 +47,139 @@ db_config = {
     'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry')
 }
 
-engine = PredictiveMaintenanceEngine(db_config)
+pool = ConnectionPool(
+    db_config,
+    min_size=int(os.getenv('POSTGRES_POOL_MIN', '1')),
+    max_size=int(os.getenv('POSTGRES_POOL_MAX', '10')),
+    timeout=float(os.getenv('POSTGRES_POOL_TIMEOUT', '30')),
+    health_check_interval=float(os.getenv('POSTGRES_POOL_HEALTH_CHECK_INTERVAL', '30')),
+)
+
+# Per-machine models plus the published model set; under server.py this is the store the
+# parent preloaded before forking, shared copy-on-write with every worker
+model_store = preload.model_store()
+
+# 'machine': a forest and scaler per machine; 'fleet': one shared forest plus a small profile per machine
+serving_mode = os.getenv('MODEL_SERVING_MODE', 'machine')
+
+# 'pandas': features built in-process from long-format rows; 'sql': built in TimescaleDB
+feature_backend = os.getenv('FEATURE_BACKEND', 'pandas')
+
+trainer = TrainingScheduler(
+    db_config,
+    model_store,
+    # TRAINING_WORKERS is the budget of the whole server, split between its workers
+    max_workers=max(1, int(os.getenv('TRAINING_WORKERS', '2')) // serving_workers),
+    serving_mode=serving_mode,
+    feature_backend=feature_backend,
+)
+
+# Streaming per-machine drift against each model's training distribution; a drifting
+# machine is queued for retraining on its own (DRIFT_RETRAIN=0 only reports it). Only the
+# primary worker, whose anomaly stream scores every reading, requests retrains.
+drift = DriftTracker(
+    model_store.reference,
+    model_store.version,
+    retrain=(lambda machine_id: trainer.submit(machine_id, force=True))
+    if os.getenv('DRIFT_RETRAIN', '1') == '1' and primary else None,
+    threshold=float(os.getenv('DRIFT_PSI_THRESHOLD', '0.25')),
+    window=int(os.getenv('DRIFT_WINDOW', '1000')),
+    min_samples=int(os.getenv('DRIFT_MIN_SAMPLES', '1000')),
+    cooldown=float(os.getenv('DRIFT_RETRAIN_COOLDOWN', str(6 * 3600))),
+)
+
+engine = PredictiveMaintenanceEngine(
+    db_config,
+    pool=pool,
+    fleet_workers=int(os.getenv('ANALYZE_WORKERS', '8')),
+    model_store=model_store,
+    trainer=trainer,
+    serving_mode=serving_mode,
+    feature_backend=feature_backend,
+    drift=drift,
+    compiled=preload.compiled,
+    prediction_cache=PredictionCache(
+        ttl=float(os.getenv('PREDICT_CACHE_TTL', '60')),
+        max_entries=int(os.getenv('PREDICT_CACHE_MAX_ENTRIES', '10000')),
+    ),
+)
+
+# Registry-backed model sets: the newest registered version is loaded now (under server.py
+# the parent already did, before forking), newer ones are fetched, warmed and swapped in by a
+# background poller. Needs mlflow and MLFLOW_TRACKING_URI.
+registry = preload.registry_watcher()
+if registry is not None:
+    registry.warm = engine.warm
+    # Other workers load the version the primary serves instead of querying the registry
+    registry.follow = not primary
+    preload.sync_registry()
+
+# /analyze serves one shared fleet report, refreshed in the background when telemetry advances
+fleet_snapshot = FleetSnapshot(
+    engine.analyze_all_machines,
+    engine.fleet_watermark,
+    max_age=float(os.getenv('ANALYZE_SNAPSHOT_MAX_AGE', '60')),
+    refresh_interval=float(os.getenv('ANALYZE_REFRESH_INTERVAL', '5')),
+    idle_after=float(os.getenv('ANALYZE_IDLE_AFTER', '300')),
+)
+
+# ASYNC_SERVING=1: asyncpg telemetry reads on the event loop, scoring in a bounded
+# executor. Off by default (blocking calls in Starlette's threadpool) until it shows a
+# gain against a local database; see benchmarks/bench_serving.py.
+if os.getenv('ASYNC_SERVING', '0') == '1':
+    from async_engine import AsyncPredictionService, AsyncTelemetryReader
+
+    service = AsyncPredictionService(
+        engine,
+        AsyncTelemetryReader(db_config, max_size=int(os.getenv('POSTGRES_POOL_MAX', '10'))),
+        scoring_workers=int(os.getenv('SCORING_WORKERS', '4')),
+        window_ms=float(os.getenv('PREDICT_BATCH_WINDOW_MS', '5')),
+        max_batch=int(os.getenv('PREDICT_MAX_BATCH', '64')),
+    )
+    coalescer = service.coalescer
+else:
+    service = None
+    coalescer = PredictionCoalescer(
+        engine.predict_many,
+        window_ms=float(os.getenv('PREDICT_BATCH_WINDOW_MS', '5')),
+        max_batch=int(os.getenv('PREDICT_MAX_BATCH', '64')),
+    )
+
+async def _predict_many_in_threadpool(machine_ids):
+    return await run_in_threadpool(engine.predict_many, machine_ids)
+
+# Incremental scoring loop behind /ws/anomalies and /stream/anomalies, driven by
+# NOTIFY from the telemetry-service (or watermark polling when LISTEN is unavailable).
+# Other workers only run it while one of their clients is subscribed.
+stream = AnomalyStream(
+    db_config,
+    service.predict_many if service is not None else _predict_many_in_threadpool,
+    debounce_ms=float(os.getenv('STREAM_DEBOUNCE_MS', '250')),
+    min_score_delta=float(os.getenv('STREAM_MIN_SCORE_DELTA', '0.02')),
+    poll_interval=float(os.getenv('STREAM_POLL_INTERVAL', '5')),
+    on_demand=not primary,
+)
+
+# Component stats exported on /metrics alongside the stage histograms
+components.register('db_pool', pool.stats, counters=(
+    'checkouts', 'waits', 'timeouts', 'connections_created', 'connections_discarded', 'health_check_failures'))
+components.register('model_store', model_store.stats, counters=(
+    'hits', 'misses', 'disk_loads', 'reloads', 'evictions', 'model_set_hits'))
+components.register('prediction_cache', engine.prediction_cache.stats, counters=(
+    'hits', 'misses', 'expired', 'evictions'))
+components.register('fleet_snapshot', fleet_snapshot.stats, counters=(
+    'hits', 'misses', 'refreshes', 'skipped_refreshes', 'idle_skips', 'refresh_failures'))
+components.register('predict_batching', coalescer.stats, counters=('requests', 'coalesced_requests', 'batches'))
+components.register('anomaly_stream', stream.stats, counters=(
+    'notifications', 'scoring_rounds', 'machines_scored', 'events_published', 'events_dropped',
+    'listen_reconnects'))
+components.register('training', trainer.stats, counters=('deduplicated',))
+components.register('drift', drift.stats, counters=('observations', 'retrains_triggered', 'model_resets'))
+if registry is not None:
+    components.register('model_registry', registry.stats, counters=('polls', 'poll_failures', 'swaps', 'rollbacks'))
+
+# Opt-in: PROFILING_ENABLED=1 exposes /debug/profile
+profiler = SamplingProfiler() if os.getenv('PROFILING_ENABLED', '0') == '1' else None
 
 class PredictionResponse(BaseModel):
     machine_id: str
@@ -36,32 +189,201 @@ class PredictionResponse(BaseModel):
     risk_level: str
     current_metrics: dict
     recommendation: str
+    cached: bool = False
+
+@app.on_event("startup")
+async def startup():
+    if service is not None:
+        await service.start()
+    if primary:
+        await stream.start()
+        # Other workers compute /analyze on demand once their snapshot is older than max_age
+        fleet_snapshot.start()
+    if registry is not None:
+        registry.start()
+    # sklearn is only needed once a model is loaded or trained; import it now, off the startup path
+    asyncio.get_running_loop().run_in_executor(None, preload.import_scoring_stack)
 
 @app.get("/")
-def root():
+async def root():
     return {"service": "Operation Obsidian AI", "status": "operational"}
 
+def pending_response(job) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "machine_id": job.machine_id,
+        "status": "model_pending",
+        "job": job.to_dict(),
+        "message": f"Model for {job.machine_id} is being trained, retry shortly",
+    })
+
 @app.post("/train/{machine_id}")
-def train_model(machine_id: str, background_tasks: BackgroundTasks):
+async def train_model(machine_id: str):
     """Train anomaly detection model for a specific machine."""
-    background_tasks.add_task(engine.train_model, machine_id)
-    return {"message": f"Training initiated for {machine_id}"}
+    job = trainer.submit(machine_id, force=True)
+    return {"message": f"Training initiated for {machine_id}", "job": job.to_dict()}
+
+@app.get("/train/jobs")
+async def list_training_jobs():
+    """List recent training jobs."""
+    return {"stats": trainer.stats(), "jobs": [job.to_dict() for job in trainer.jobs()]}
+
+@app.get("/train/jobs/{job_id}")
+async def training_job_status(job_id: str):
+    """Get the status of a training job."""
+    job = trainer.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown training job {job_id}")
+    return job.to_dict()
+
+def require_registry():
+    if registry is None:
+        raise HTTPException(status_code=404, detail="Model registry is disabled (set MLFLOW_TRACKING_URI)")
+    return registry
+
+@app.get("/models/registry")
+async def registry_status():
+    """Registered model set versions being served."""
+    return require_registry().stats()
+
+@app.post("/models/registry/sync")
+async def registry_sync():
+    """Check the registry now instead of waiting for the next poll."""
+    watcher = require_registry()
+    version = await run_in_threadpool(watcher.sync)
+    return {"version": version, "registry": watcher.stats()}
+
+@app.post("/models/rollback")
+async def registry_rollback():
+    """Serve the previous model set version again."""
+    watcher = require_registry()
+    try:
+        version = await run_in_threadpool(watcher.rollback)
+    except NoPreviousVersion as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"version": version, "registry": watcher.stats()}
+
+@app.get("/drift")
+async def drift_overview(top: int = Query(3, ge=1, le=100)):
+    """Drift state of every scored machine, most drifted first, with its `top` drifting features."""
+    return {"stats": drift.stats(), "machines": drift.states(top=top)}
+
+@app.get("/drift/{machine_id}")
+async def drift_status(machine_id: str):
+    """Per-feature PSI of one machine against its model's training distribution."""
+    state = drift.state(machine_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No scored predictions for {machine_id} yet")
+    return state
 
 @app.get("/predict/{machine_id}", response_model=Optional[PredictionResponse])
-def predict(machine_id: str):
+async def predict(machine_id: str, response: Response):
     """Get predictive maintenance analysis for a machine."""
-    result = engine.predict_anomaly(machine_id)
+    try:
+        if service is not None:
+            result = await service.predict(machine_id)
+        else:
+            result = await run_in_threadpool(coalescer.predict, machine_id)
+    except ModelPending as pending:
+        return pending_response(pending.job)
+    if result is not None:
+        response.headers["X-Cache"] = "HIT" if result['cached'] else "MISS"
     return result
 
 @app.get("/analyze", response_model=List[PredictionResponse])
-def analyze_all():
+async def analyze_all(response: Response):
     """Analyze all machines in the system."""
-    results = engine.analyze_all_machines()
+    results, age, hit = await run_in_threadpool(fleet_snapshot.get)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    response.headers["X-Snapshot-Age"] = f"{age:.3f}"
     return results
 
+@app.websocket("/ws/anomalies")
+async def anomaly_feed(websocket: WebSocket):
+    """Push risk-level changes and score updates as new telemetry is scored."""
+    await websocket.accept()
+    queue = stream.subscribe()
+    try:
+        for event in stream.snapshot():
+            await websocket.send_json(event)
+        while True:
+            await websocket.send_json(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.unsubscribe(queue)
+
+@app.get("/stream/anomalies")
+async def anomaly_event_stream():
+    """Server-Sent Events variant of /ws/anomalies."""
+    queue = stream.subscribe()
+
+    async def events():
+        try:
+            for event in stream.snapshot():
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep idle connections open through proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            stream.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
 @app.get("/health")
-def health():
-    return {"status": "healthy"}
+async def health():
+    return {
+        "status": "healthy",
+        "worker": {"index": int(os.getenv('SERVING_WORKER', '0')), "pid": os.getpid(), "primary": primary},
+        "db_pool": pool.stats(),
+        "model_store": model_store.stats(),
+        "predict_batching": coalescer.stats(),
+        "prediction_cache": engine.prediction_cache.stats(),
+        "fleet_snapshot": fleet_snapshot.stats(),
+        "anomaly_stream": stream.stats(),
+        "drift": drift.stats(),
+        "model_registry": registry.stats() if registry is not None else None,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, request latencies, counters and component stats."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/debug/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+):
+    """Sample all thread stacks for a short period (collapsed-stack output for flame graphs)."""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_ENABLED=1)")
+    try:
+        result = await run_in_threadpool(profiler.profile, seconds, interval_ms / 1000.0)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return result
+    return PlainTextResponse(SamplingProfiler.collapsed(result))
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stream.stop()
+    fleet_snapshot.stop()
+    if registry is not None:
+        registry.stop()
+    if service is not None:
+        await service.stop()
+    else:
+        coalescer.close()
+    trainer.shutdown()
+    pool.closeall()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,114 @@
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import Match
+
+# Prometheus metrics served on /metrics. Stage names follow the prediction pipeline:
+# sql / pivot / engineer_features for the pandas paths, sql_incremental /
+# feature_update for predict_many, model_load, and score (scaler + forest, fused).
+STAGE_SECONDS = Histogram(
+    'ai_stage_duration_seconds',
+    'Time spent in each prediction pipeline stage',
+    ['stage'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+             0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+REQUEST_SECONDS = Histogram(
+    'ai_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route', 'status'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'ai_http_requests_in_flight',
+    'HTTP requests currently being served',
+    ['route'],
+)
+ROWS_FETCHED = Counter(
+    'ai_telemetry_rows_fetched',
+    'Telemetry rows read from TimescaleDB',
+    ['query'],
+)
+MODEL_TRAININGS = Counter(
+    'ai_model_trainings',
+    'Finished model trainings by outcome',
+    ['outcome'],
+)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage: `with stage('sql'): ...`."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+class ComponentStatsCollector:
+    """
+    Exposes the stats() dicts of long-lived components (pool, model store,
+    caches, coalescer, ...) at scrape time, so they keep a single source of truth.
+    Keys listed as counters become `ai_<component>_<key>_total`, every other
+    numeric key becomes the gauge `ai_<component>_<key>`.
+    """
+
+    def __init__(self):
+        self._components: List[Tuple[str, Callable[[], Dict], frozenset]] = []
+
+    def register(self, name: str, stats: Callable[[], Dict], counters: Iterable[str] = ()):
+        self._components.append((name, stats, frozenset(counters)))
+
+    def collect(self):
+        for name, stats, counters in self._components:
+            try:
+                values = stats()
+            except Exception:
+                continue  # a failing component must not break the whole scrape
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f'ai_{name}_{key}'
+                if key in counters:
+                    yield CounterMetricFamily(metric, f'{name} {key}', value=value)
+                else:
+                    yield GaugeMetricFamily(metric, f'{name} {key}', value=value)
+
+
+components = ComponentStatsCollector()
+REGISTRY.register(components)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_SECONDS.labels(scope['method'], route, str(status[0])).observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _route(scope) -> str:
+        # Label by path template (/predict/{machine_id}), not raw path, to bound cardinality
+        for route in scope['app'].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return 'unmatched'
@@ -0,0 +1,394 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+
+from fleet_model import FLEET_MODEL_ID, FleetModel, MachineProfile
+
+
+class ModelStore:
+    """
+    Disk-backed store for per-machine (model, scaler) pairs.
+
+    Every trained pair is written to `directory` as an uncompressed joblib file,
+    so restarts and new workers load instead of retraining. Loads are lazy;
+    loaded pairs live in an LRU bounded by `max_bytes`, estimated from the
+    on-disk size of each file.
+
+    A model set published by the ml-pipeline batch job (one bundle holding the
+    whole fleet) can be loaded up front with load_model_set(), or read and
+    swapped in while serving with read_model_set() and install_model_set().
+    Its pairs are served when a machine has no newer per-machine file.
+
+    In fleet serving mode the store instead holds one shared FleetModel
+    (`fleet-model.joblib`, with the profiles of the machines it was fitted on)
+    and a small JSON profile per machine onboarded after that.
+
+    With `revalidate_interval` > 0, a served model is checked against its file
+    at most that often and reloaded when the file is newer, so a model
+    retrained by another process sharing the directory (e.g. another server
+    worker) is picked up.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, revalidate_interval: float = 0.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_interval = revalidate_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[str, Tuple[object, object, int]]' = OrderedDict()
+        self._bytes = 0
+        self._installed_set: Optional[Dict[str, object]] = None
+        self._model_set: Dict[str, Tuple[object, object]] = {}
+        self._model_set_version: Optional[str] = None
+        self._fleet: Optional[FleetModel] = None
+        self._profiles: Dict[str, MachineProfile] = {}
+        # Training-distribution histograms for drift monitoring, by machine (see drift.py)
+        self._references: Dict[str, Dict[str, object]] = {}
+        # machine_id (or FLEET_MODEL_ID) -> [mtime of the file version served, monotonic time of the last check]
+        self._served: Dict[str, List[float]] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._evictions = 0
+        self._model_set_hits = 0
+        self._reloads = 0
+
+    def path(self, machine_id: str) -> str:
+        # Machine ids come from telemetry; keep the name readable but filesystem-safe and unique
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', machine_id)
+        digest = hashlib.sha1(machine_id.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.directory, f'{safe}-{digest}.joblib')
+
+    @property
+    def fleet_path(self) -> str:
+        return os.path.join(self.directory, 'fleet-model.joblib')
+
+    def profile_path(self, machine_id: str) -> str:
+        return self.path(machine_id)[:-len('.joblib')] + '.profile.json'
+
+    def _write_atomic(self, path: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)  # atomic, readers never see a partial file
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, machine_id: str, model, scaler, reference: Optional[Dict[str, object]] = None):
+        """Persist a freshly trained pair (and its drift reference) and make it the cached version."""
+        path = self.path(machine_id)
+        self._write_atomic(path, lambda tmp_path: joblib.dump({
+            'machine_id': machine_id,
+            'model': model,
+            'scaler': scaler,
+            'reference': reference,
+            'trained_at': datetime.now().isoformat(),
+        }, tmp_path))
+
+        with self._lock:
+            self._model_set.pop(machine_id, None)
+            self._set_reference(machine_id, reference)
+            self._served[machine_id] = [os.path.getmtime(path), time.monotonic()]
+        self._insert(machine_id, model, scaler, os.path.getsize(path))
+
+    def get(self, machine_id: str) -> Optional[Tuple[object, object]]:
+        """Return (model, scaler), loading from disk on a cache miss. None if never trained."""
+        with self._lock:
+            entry = self._cache.get(machine_id)
+            if entry is not None:
+                self._cache.move_to_end(machine_id)
+                self._hits += 1
+                pair = entry[0], entry[1]
+            else:
+                pair = self._model_set.get(machine_id)
+                if pair is not None:
+                    self._hits += 1
+                    self._model_set_hits += 1
+                else:
+                    self._misses += 1
+            if pair is not None and not self._revalidation_due(machine_id):
+                return pair
+
+        path = self.path(machine_id)
+        if pair is not None and not self._changed_on_disk(machine_id, path):
+            return pair
+        if not os.path.exists(path):
+            return None
+        return self._load(machine_id, path, reload=pair is not None)
+
+    def _load(self, machine_id: str, path: str, reload: bool = False) -> Tuple[object, object]:
+        return self._serve(machine_id, path, *self._read(path), reload=reload)
+
+    @staticmethod
+    def _read(path: str) -> Tuple[float, Dict[str, object]]:
+        mtime = os.path.getmtime(path)  # before reading, so a concurrent rewrite is seen as newer
+        return mtime, joblib.load(path)
+
+    def _serve(self, machine_id: str, path: str, mtime: float, payload: Dict[str, object],
+               reload: bool = False) -> Tuple[object, object]:
+        with self._lock:
+            self._loads += 1
+            if reload:
+                self._reloads += 1
+                self._model_set.pop(machine_id, None)
+            self._set_reference(machine_id, payload.get('reference'))
+            self._served[machine_id] = [mtime, time.monotonic()]
+        self._insert(machine_id, payload['model'], payload['scaler'], os.path.getsize(path))
+        return payload['model'], payload['scaler']
+
+    def _revalidation_due(self, key: str) -> bool:
+        # Called with the lock held; restarts the interval when due
+        if self.revalidate_interval <= 0:
+            return False
+        served = self._served.setdefault(key, [0.0, 0.0])
+        now = time.monotonic()
+        if now - served[1] < self.revalidate_interval:
+            return False
+        served[1] = now
+        return True
+
+    def _changed_on_disk(self, key: str, path: str) -> bool:
+        """Whether `path` was rewritten after the version served for `key` was read."""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        with self._lock:
+            return mtime > self._served.get(key, [0.0])[0]
+
+    def preload(self) -> int:
+        """
+        Load per-machine files into the cache, newest first, until `max_bytes` is
+        reached (machines served by the model set are skipped). Returns how many
+        were loaded, e.g. before forking server workers that then share them.
+        """
+        paths = [path for path in glob.glob(os.path.join(self.directory, '*.joblib')) if path != self.fleet_path]
+        loaded = 0
+        for path in sorted(paths, key=os.path.getmtime, reverse=True):
+            with self._lock:
+                if self._bytes + os.path.getsize(path) > self.max_bytes:
+                    break
+            mtime, payload = self._read(path)
+            machine_id = payload['machine_id']
+            with self._lock:
+                if machine_id in self._model_set or machine_id in self._cache:
+                    continue
+            self._serve(machine_id, path, mtime, payload)
+            loaded += 1
+        return loaded
+
+    def pairs(self) -> List[Tuple[object, object]]:
+        """Every (model, scaler) pair currently in memory: the model set and the cache."""
+        with self._lock:
+            return list(self._model_set.values()) + [(model, scaler) for model, scaler, _ in self._cache.values()]
+
+    def put_fleet_model(self, fleet: FleetModel):
+        """Persist a freshly fitted fleet model; profiles of the previous one no longer apply."""
+        self._write_atomic(self.fleet_path, lambda tmp_path: joblib.dump(fleet, tmp_path))
+        with self._lock:
+            self._fleet = fleet
+            self._profiles.clear()
+            self._served[FLEET_MODEL_ID] = [os.path.getmtime(self.fleet_path), time.monotonic()]
+
+    def get_fleet_model(self) -> Optional[FleetModel]:
+        with self._lock:
+            fleet = self._fleet
+            if fleet is not None and not self._revalidation_due(FLEET_MODEL_ID):
+                return fleet
+        if fleet is not None and not self._changed_on_disk(FLEET_MODEL_ID, self.fleet_path):
+            return fleet
+        if not os.path.exists(self.fleet_path):
+            return None
+        mtime = os.path.getmtime(self.fleet_path)
+        fleet = joblib.load(self.fleet_path)
+        with self._lock:
+            self._loads += 1
+            if self._fleet is not None:
+                # Refitted elsewhere: profiles onboarded onto the old model no longer apply
+                self._reloads += 1
+                self._profiles.clear()
+            self._fleet = fleet
+            self._served[FLEET_MODEL_ID] = [mtime, time.monotonic()]
+        return fleet
+
+    def put_profile(self, machine_id: str, fleet: FleetModel, profile: MachineProfile):
+        """Persist the profile of a machine onboarded onto `fleet` after it was fitted."""
+        payload = dict(profile.to_dict(), machine_id=machine_id, fleet_version=fleet.version)
+        self._write_atomic(self.profile_path(machine_id), lambda tmp_path: self._dump_json(payload, tmp_path))
+        with self._lock:
+            self._profiles[machine_id] = profile
+
+    @staticmethod
+    def _dump_json(payload: Dict, path: str):
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+
+    def get_profile(self, machine_id: str) -> Optional[Tuple[FleetModel, MachineProfile]]:
+        """Return (fleet model, machine profile), or None if either is missing."""
+        fleet = self.get_fleet_model()
+        if fleet is None:
+            return None
+        with self._lock:
+            profile = fleet.profiles.get(machine_id) or self._profiles.get(machine_id)
+            if profile is not None:
+                self._hits += 1
+                return fleet, profile
+            self._misses += 1
+
+        try:
+            with open(self.profile_path(machine_id)) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get('fleet_version') != fleet.version:
+            return None  # calibrated against an older fleet model
+        profile = MachineProfile.from_dict(payload)
+        with self._lock:
+            self._loads += 1
+            self._profiles[machine_id] = profile
+        return fleet, profile
+
+    def load_model_set(self, directory: str) -> Optional[str]:
+        """
+        Load the model set `directory`/CURRENT points at, replacing any loaded
+        before. Returns the set's version, or None when nothing has been published.
+        """
+        try:
+            with open(os.path.join(directory, 'CURRENT')) as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        model_set = self.read_model_set(os.path.join(directory, current['file']))
+        self.install_model_set(model_set)
+        return model_set['version']
+
+    def read_model_set(self, path: str) -> Dict[str, object]:
+        """Load a model-set bundle without serving it: {'version', 'published', 'models'}."""
+        bundle = joblib.load(path)
+        return {
+            'version': bundle['version'],
+            'published': os.path.getmtime(path),
+            'models': {machine_id: (pair['model'], pair['scaler']) for machine_id, pair in bundle['models'].items()},
+            'references': {machine_id: pair['reference'] for machine_id, pair in bundle['models'].items()
+                           if pair.get('reference') is not None},
+        }
+
+    def install_model_set(self, model_set: Optional[Dict[str, object]]) -> Optional[Dict[str, object]]:
+        """
+        Serve `model_set` (from read_model_set) in place of the current one and
+        return the one it replaced. The swap is a single assignment under the
+        lock, so requests never wait on loading and see either set whole.
+        Machines whose per-machine file is newer than the set (retrained since it
+        was published) keep using that file.
+        """
+        models: Dict[str, Tuple[object, object]] = {}
+        if model_set is not None:
+            models = {
+                machine_id: pair for machine_id, pair in model_set['models'].items()
+                if not (os.path.exists(self.path(machine_id))
+                        and os.path.getmtime(self.path(machine_id)) > model_set['published'])
+            }
+        with self._lock:
+            previous = self._installed_set
+            self._installed_set = model_set
+            self._model_set = models
+            self._model_set_version = model_set['version'] if model_set is not None else None
+            # Older per-machine files cached before the swap are superseded by the set
+            for machine_id in models:
+                self._set_reference(machine_id, model_set.get('references', {}).get(machine_id))
+                self._served[machine_id] = [model_set['published'], time.monotonic()]
+                entry = self._cache.pop(machine_id, None)
+                if entry is not None:
+                    self._bytes -= entry[2]
+        return previous
+
+    def _set_reference(self, machine_id: str, reference: Optional[Dict[str, object]]):
+        # Called with the lock held
+        if reference is None:
+            self._references.pop(machine_id, None)
+        else:
+            self._references[machine_id] = reference
+
+    def reference(self, machine_id: str) -> Optional[Dict[str, object]]:
+        """Drift reference of the machine's current model, if it was stored with one."""
+        with self._lock:
+            return self._references.get(machine_id)
+
+    def version(self, machine_id: str) -> Optional[float]:
+        """
+        File mtime (or model-set publish time) of the machine's current model.
+        Unlike the model object, it survives eviction from the cache and only
+        changes when the machine is retrained or a newer set is installed.
+        """
+        with self._lock:
+            served = self._served.get(machine_id)
+            return served[0] if served is not None else None
+
+    def invalidate(self, machine_id: str):
+        """Drop the cached copy so the next get() reloads from disk."""
+        with self._lock:
+            if machine_id == FLEET_MODEL_ID:
+                self._fleet = None
+                self._profiles.clear()
+                return
+            self._profiles.pop(machine_id, None)
+            # A retrained machine's per-machine file supersedes the model set
+            self._model_set.pop(machine_id, None)
+            entry = self._cache.pop(machine_id, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def __contains__(self, machine_id: str) -> bool:
+        with self._lock:
+            if machine_id in self._cache or machine_id in self._model_set:
+                return True
+        return os.path.exists(self.path(machine_id))
+
+    def _insert(self, machine_id: str, model, scaler, size: int):
+        with self._lock:
+            previous = self._cache.pop(machine_id, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._cache[machine_id] = (model, scaler, size)
+            self._bytes += size
+
+            # Always keep the entry just inserted, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._cache) > 1:
+                _, (_, _, evicted_size) = self._cache.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._cache),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'disk_loads': self._loads,
+                'reloads': self._reloads,
+                'evictions': self._evictions,
+                'model_set_version': self._model_set_version,
+                'model_set_machines': len(self._model_set),
+                'model_set_hits': self._model_set_hits,
+                'fleet_model_version': self._fleet.version if self._fleet is not None else None,
+                'fleet_profiles': (len(self._fleet.profiles) if self._fleet is not None else 0) + len(self._profiles),
+            }
@@ -0,0 +1,120 @@
+import os
+import time
+import weakref
+from typing import Dict, Optional
+
+import numpy as np
+
+from model_store import ModelStore
+
+# Compiled forests by model object, shared by every engine in the process (see
+# PredictiveMaintenanceEngine(compiled=...)). Filled by preload_models() before
+# server.py forks, so workers inherit them instead of compiling their own.
+compiled: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+_model_store: Optional[ModelStore] = None
+_registry = None
+_registry_configured = False
+_registry_synced = False
+
+
+def import_scoring_stack():
+    """Import what unpickling, compiling and training models needs (sklearn alone takes over a second)."""
+    import sklearn.ensemble  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+
+def model_store() -> ModelStore:
+    """
+    The process's ModelStore, configured from the environment, with the
+    published model set loaded. A forked server worker gets the parent's.
+    """
+    global _model_store
+    if _model_store is None:
+        store = ModelStore(
+            os.getenv('MODEL_STORE_DIR', 'model_store'),
+            max_bytes=int(os.getenv('MODEL_CACHE_MAX_MB', '256')) * 1024 * 1024,
+            # Server workers share the directory; pick up models retrained by the others
+            revalidate_interval=float(os.getenv('MODEL_REVALIDATE_INTERVAL', '5')),
+        )
+        # Fleet model set published by the ml-pipeline batch job, loaded in bulk at startup
+        # (superseded by the registered version when the model registry is configured)
+        model_set_dir = os.getenv('MODEL_SET_DIR', 'model_sets')
+        if model_set_dir:
+            store.load_model_set(model_set_dir)
+        _model_store = store
+    return _model_store
+
+
+def registry_watcher():
+    """
+    The process's ModelRegistryWatcher for the registered model set, or None
+    unless MLFLOW_TRACKING_URI and MODEL_REGISTRY_NAME are set. A forked server
+    worker gets the parent's, with the version the parent installed.
+    """
+    global _registry, _registry_configured
+    if not _registry_configured:
+        model_name = os.getenv('MODEL_REGISTRY_NAME', 'machine_anomaly_models')
+        if os.getenv('MLFLOW_TRACKING_URI') and model_name:
+            from registry import ModelRegistryWatcher
+
+            _registry = ModelRegistryWatcher(
+                model_store(),
+                model_name,
+                cache_dir=os.getenv('MODEL_REGISTRY_CACHE_DIR', 'registry_cache'),
+                poll_interval=float(os.getenv('MODEL_REGISTRY_POLL_INTERVAL', '60')),
+            )
+        _registry_configured = True
+    return _registry
+
+
+def sync_registry() -> Optional[int]:
+    """
+    Install the newest registered model set, once per process tree: server.py's
+    parent does it in preload_models(), so workers inherit that set instead of
+    each downloading and unpickling their own. Returns the installed version.
+    """
+    global _registry_synced
+    watcher = registry_watcher()
+    if watcher is None or _registry_synced:
+        return None
+    _registry_synced = True
+    try:
+        return watcher.sync()
+    except Exception as e:
+        print(f"Model registry unavailable at startup, serving local models: {e}")
+        return None
+
+
+def preload_models(serving_mode: str = 'machine') -> Dict[str, float]:
+    """
+    Load every model the store can hold (registered or published model set,
+    per-machine files up to the cache budget, fleet model) and compile and score
+    each once, so serving starts with nothing left to unpickle, compile or fault in.
+    """
+    started = time.perf_counter()
+    import_scoring_stack()
+    store = model_store()
+    registry_version = sync_registry()
+    loaded = store.preload()
+
+    pairs = store.pairs()
+    for model, scaler in pairs:
+        forest = compiled.get(model)
+        if forest is None:
+            from compiled_forest import CompiledIsolationForest
+
+            forest = compiled[model] = CompiledIsolationForest(model, scaler)
+        forest.score(np.zeros(scaler.n_features_in_))
+
+    fleet = store.get_fleet_model() if serving_mode == 'fleet' else None
+    if fleet is not None:
+        fleet.compiled.score(np.zeros(len(fleet.columns)))
+
+    return {
+        'models': len(pairs),
+        'files_loaded': loaded,
+        'fleet_model': fleet is not None,
+        'registry_version': registry_version,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
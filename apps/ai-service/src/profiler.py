@@ -0,0 +1,69 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock sampling profiler for a running service.
+
+    While active, a background thread snapshots every other thread's stack
+    (sys._current_frames) every `interval` seconds and counts identical stacks.
+    Output is in collapsed-stack format ("frame;frame;frame count"), which
+    flamegraph.pl and speedscope read directly. Nothing runs between profiles.
+    """
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Dict[str, object]:
+        """Sample for `seconds` (capped at max_seconds) and return the aggregated stacks."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            seconds = min(max(seconds, 0.0), self.max_seconds)
+            interval = max(interval, 0.001)
+            me = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter = Counter()
+            samples = 0
+
+            started = time.perf_counter()
+            deadline = started + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+                samples += 1
+                time.sleep(interval)
+
+            return {
+                'duration_s': round(time.perf_counter() - started, 3),
+                'interval_s': interval,
+                'samples': samples,
+                'stacks': stacks.most_common(),
+            }
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ';'.join(reversed(frames))
+
+    @staticmethod
+    def collapsed(result: Dict[str, object]) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in result['stacks'])
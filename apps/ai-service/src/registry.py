@@ -0,0 +1,248 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from model_store import ModelStore
+
+
+class NoPreviousVersion(Exception):
+    """Raised when a rollback is requested but no previous model set is loaded."""
+
+
+class ModelRegistryWatcher:
+    """
+    Serves the per-machine model set registered in MLflow as `model_name`.
+
+    sync() swaps in the newest registered version; start() repeats it every
+    `poll_interval` seconds on a background thread. A new version is downloaded
+    to `cache_dir`, loaded and warmed (`warm` gets its (model, scaler) pairs)
+    before ModelStore.install_model_set() swaps it in, so requests keep being
+    served by the old set until the new one is ready.
+
+    The replaced set stays loaded: rollback() swaps it back without touching the
+    registry, and the rolled-back version is skipped from then on. A newer
+    registered version is picked up as usual. Skipped versions are kept in
+    `cache_dir`/rejected.json, so they stay skipped across restarts and by every
+    server worker sharing the directory (each rolls back on its next poll).
+
+    Only one server worker queries the registry. It records the version it
+    serves in `cache_dir`/serving.json; watchers with `follow` set poll that
+    file instead and load the version from the shared download.
+    """
+
+    def __init__(
+        self,
+        model_store: ModelStore,
+        model_name: str,
+        cache_dir: str = 'registry_cache',
+        warm: Optional[Callable[[Iterable[Tuple[object, object]]], None]] = None,
+        poll_interval: float = 60.0,
+        tracking_uri: Optional[str] = None,
+        follow: bool = False,
+    ):
+        self.model_store = model_store
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.warm = warm
+        self.poll_interval = poll_interval
+        self.tracking_uri = tracking_uri
+        self.follow = follow
+        # mlflow is optional (the `registry` extra) and slow to import: loaded only once a watcher exists
+        from mlflow.tracking import MlflowClient
+
+        self.client = MlflowClient(tracking_uri)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # one download/warm at a time
+        self._version: Optional[int] = None
+        self._previous: Optional[Tuple[Optional[int], Optional[Dict[str, object]]]] = None
+        self._rejected: Set[int] = self._read_rejected()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._polls = 0
+        self._failures = 0
+        self._swaps = 0
+        self._rollbacks = 0
+        self._last_swap_s = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                with self._lock:
+                    self._failures += 1
+                print(f"Model registry poll failed: {e}")
+
+    @property
+    def _rejected_path(self) -> str:
+        return os.path.join(self.cache_dir, 'rejected.json')
+
+    def _read_rejected(self) -> Set[int]:
+        try:
+            with open(self._rejected_path) as f:
+                return {int(version) for version in json.load(f)}
+        except (OSError, ValueError):
+            return set()
+
+    def _write_rejected(self):
+        # Called with the lock held
+        tmp_path = f'{self._rejected_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(sorted(self._rejected | self._read_rejected()), f)
+        os.replace(tmp_path, self._rejected_path)
+
+    @property
+    def _serving_path(self) -> str:
+        return os.path.join(self.cache_dir, 'serving.json')
+
+    def _write_serving(self, version: Optional[int]):
+        tmp_path = f'{self._serving_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': version}, f)
+        os.replace(tmp_path, self._serving_path)
+
+    def _leader_version(self) -> Optional[int]:
+        """Version the registry-polling worker serves, unless it has been rolled back since."""
+        try:
+            with open(self._serving_path) as f:
+                version = json.load(f)['version']
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._rejected |= self._read_rejected()
+            return version if version is not None and version not in self._rejected else None
+
+    def latest_version(self) -> Optional[int]:
+        """Newest registered version that has not been rolled back (here or by another process)."""
+        if self.follow:
+            return self._leader_version()
+        versions = self.client.search_model_versions(f"name='{self.model_name}'")
+        with self._lock:
+            self._rejected |= self._read_rejected()
+            rejected = set(self._rejected)
+        return max((int(v.version) for v in versions if int(v.version) not in rejected), default=None)
+
+    def sync(self) -> Optional[int]:
+        """Swap in the newest registered version unless it is already served. Returns the served version."""
+        with self._sync_lock:
+            with self._lock:
+                self._polls += 1
+            latest = self.latest_version()
+            with self._lock:
+                # Rolled back by another worker, with no other version to move to
+                revert = latest is None and self._version in self._rejected and self._previous is not None
+                if not revert and (latest is None or latest == self._version):
+                    return self._version
+            if revert:
+                return self.rollback()
+
+            started = time.perf_counter()
+            model_set = self._fetch(latest)
+            if self.warm is not None:
+                self.warm(model_set['models'].values())
+
+            with self._lock:
+                if latest in self._rejected:
+                    return self._version  # rolled back while it was being fetched
+                replaced = self.model_store.install_model_set(model_set)
+                # A version rolled back by another worker is not a rollback target here
+                keep = replaced is not None and self._version not in self._rejected
+                self._previous = (self._version, replaced) if keep else None
+                self._version = latest
+                self._swaps += 1
+                self._last_swap_s = time.perf_counter() - started
+            self._published(latest)
+            print(f"Model set {self.model_name} version {latest} serving {len(model_set['models'])} machines")
+            return latest
+
+    def rollback(self) -> Optional[int]:
+        """Serve the previous model set again and skip the current version. Returns the version now served."""
+        with self._lock:
+            if self._previous is None:
+                raise NoPreviousVersion(f"No model set loaded before version {self._version}")
+            version, model_set = self._previous
+            self.model_store.install_model_set(model_set)
+            if self._version is not None:
+                self._rejected.add(self._version)
+                self._write_rejected()
+            self._version, self._previous = version, None
+            self._rollbacks += 1
+        self._published(version)
+        print(f"Model set {self.model_name} rolled back to version {version}")
+        return version
+
+    def _fetch(self, version: int) -> Dict[str, object]:
+        """Download (once) and load the model set of a registered version."""
+        import mlflow.artifacts
+
+        target = os.path.join(self.cache_dir, f'v{version}')
+        if not os.path.isdir(target):
+            staging = tempfile.mkdtemp(dir=self.cache_dir, prefix='download-')
+            try:
+                mlflow.artifacts.download_artifacts(
+                    artifact_uri=f'models:/{self.model_name}/{version}',
+                    dst_path=staging,
+                    tracking_uri=self.tracking_uri,
+                )
+                os.replace(staging, target)  # same filesystem: a version directory is complete or absent
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(target):
+                    raise
+                # Another worker sharing cache_dir finished the same download first
+        paths = sorted(glob.glob(os.path.join(target, '**', 'model-set-*.joblib'), recursive=True))
+        if not paths:
+            raise ValueError(f"{self.model_name} version {version} holds no model set")
+        return self.model_store.read_model_set(paths[-1])
+
+    def _published(self, version: Optional[int]):
+        if self.follow:
+            return  # the registry-polling worker publishes and prunes
+        self._write_serving(version)
+        self._prune()
+
+    def _prune(self):
+        """Delete downloads other than the served and previous versions."""
+        with self._lock:
+            keep = {f'v{self._version}'}
+            if self._previous is not None:
+                keep.add(f'v{self._previous[0]}')
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('v') and name not in keep:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'model_name': self.model_name,
+                'version': self._version,
+                'previous_version': self._previous[0] if self._previous is not None else None,
+                'rollback_available': self._previous is not None,
+                'rejected_versions': sorted(self._rejected),
+                'poll_interval_s': self.poll_interval,
+                'polls': self._polls,
+                'poll_failures': self._failures,
+                'swaps': self._swaps,
+                'rollbacks': self._rollbacks,
+                'last_swap_s': round(self._last_swap_s, 4),
+            }
@@ -0,0 +1,211 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    TTL + LRU cache of prediction payloads keyed by (machine_id, telemetry revision).
+
+    An entry is reused only while the machine's feature-state revision (see
+    MachineFeatureState.revision) and its loaded model are unchanged and the entry is younger than `ttl` seconds.
+    Cached payloads are returned with `cached: True`.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        # machine_id -> (revision, weakref to model, stored_at, result)
+        self._entries: 'OrderedDict[str, Tuple[Tuple, weakref.ref, float, Dict]]' = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+    def get(self, machine_id: str, revision: Optional[Tuple], model) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(machine_id)
+            if entry is None or revision is None:
+                self._misses += 1
+                return None
+            cached_revision, model_ref, stored_at, result = entry
+            if cached_revision != revision or model_ref() is not model:
+                self._misses += 1
+                return None
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[machine_id]
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(machine_id)
+            self._hits += 1
+        return dict(result, cached=True)
+
+    def put(self, machine_id: str, revision: Optional[Tuple], model, result: Dict):
+        if revision is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[machine_id] = (revision, weakref.ref(model), time.monotonic(), result)
+            self._entries.move_to_end(machine_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, machine_id: str):
+        with self._lock:
+            self._entries.pop(machine_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+            }
+
+
+class FleetSnapshot:
+    """
+    Shared, background-refreshed result of a fleet-wide analysis.
+
+    Every `refresh_interval` seconds a cheap watermark query (newest telemetry
+    timestamp) decides whether to recompute; the snapshot is also recomputed once
+    it is `max_age` seconds old. Background refreshes only run while someone has
+    read the snapshot in the last `idle_after` seconds, so an unused /analyze
+    costs nothing. Readers get the current snapshot immediately and only compute
+    inline when there is none or it is older than `max_age`. Concurrent inline
+    computes collapse into one.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[], List[Dict]],
+        watermark: Callable[[], Optional[datetime]],
+        max_age: float = 60.0,
+        refresh_interval: float = 5.0,
+        idle_after: float = 300.0,
+    ):
+        self.compute = compute
+        self.watermark = watermark
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.idle_after = idle_after
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # one compute at a time
+        self._results: Optional[List[Dict]] = None
+        self._watermark: Optional[datetime] = None
+        self._computed_at: Optional[float] = None
+        self._read_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._skipped = 0
+        self._idle_skips = 0
+        self._failures = 0
+        self._last_refresh_s = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='fleet-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_interval + 1)
+            self._thread = None
+
+    def age(self) -> Optional[float]:
+        with self._lock:
+            return None if self._computed_at is None else time.monotonic() - self._computed_at
+
+    def get(self) -> Tuple[List[Dict], float, bool]:
+        """Return (results, age in seconds, served from snapshot)."""
+        with self._lock:
+            self._read_at = time.monotonic()
+            results, computed_at = self._results, self._computed_at
+            if results is not None and time.monotonic() - computed_at <= self.max_age:
+                self._hits += 1
+                return results, time.monotonic() - computed_at, True
+            self._misses += 1
+
+        self._refresh(check_watermark=False)
+        with self._lock:
+            return self._results, time.monotonic() - self._computed_at, False
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            with self._lock:
+                idle = self._read_at is None or time.monotonic() - self._read_at > self.idle_after
+                if idle:
+                    self._idle_skips += 1
+            if idle:
+                continue  # the next read computes inline if the snapshot has gone stale
+            try:
+                self._refresh(check_watermark=True)
+            except Exception as e:
+                with self._lock:
+                    self._failures += 1
+                print(f"Fleet snapshot refresh failed: {e}")
+
+    def _refresh(self, check_watermark: bool):
+        requested_at = time.monotonic()
+        with self._refresh_lock:
+            with self._lock:
+                computed_at = self._computed_at
+            if computed_at is not None and computed_at >= requested_at:
+                return  # another caller refreshed while we waited
+
+            watermark = self.watermark()
+            if check_watermark and computed_at is not None:
+                with self._lock:
+                    unchanged = watermark == self._watermark
+                if unchanged and requested_at - computed_at < self.max_age:
+                    with self._lock:
+                        self._skipped += 1
+                    return
+
+            started = time.perf_counter()
+            results = self.compute()
+            with self._lock:
+                self._results = results
+                self._watermark = watermark
+                self._computed_at = time.monotonic()
+                self._refreshes += 1
+                self._last_refresh_s = time.perf_counter() - started
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'machines': len(self._results) if self._results is not None else 0,
+                'age_s': round(time.monotonic() - self._computed_at, 3) if self._computed_at is not None else None,
+                'watermark': self._watermark.isoformat() if self._watermark is not None else None,
+                'max_age_s': self.max_age,
+                'refresh_interval_s': self.refresh_interval,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'refreshes': self._refreshes,
+                'skipped_refreshes': self._skipped,
+                'idle_skips': self._idle_skips,
+                'refresh_failures': self._failures,
+                'last_refresh_s': round(self._last_refresh_s, 4),
+            }
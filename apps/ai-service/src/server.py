@@ -0,0 +1,161 @@
+"""
+Multi-worker entry point: serves main:app from SERVING_WORKERS processes on one port.
+
+    SERVING_WORKERS=4 python server.py
+
+The parent never serves requests. It imports the serving stack, loads every
+model the store can hold, including the registered model set when the model
+registry is configured, and compiles them (preload.preload_models), freezes
+the garbage collector so later collections do not write to those objects,
+binds the listening socket and forks the workers. Workers inherit the models
+copy-on-write: nothing is unpickled or compiled again, and the pages stay
+shared because scoring only reads them. That is the only sharing: models
+are plain unpickled objects, not mappings of the store's files.
+
+Each worker then imports main, which creates its own database pools, trainer
+and threads (none of which may cross a fork), and runs uvicorn on the
+inherited socket. The fleet-wide background work runs in worker 0 only
+(SERVING_WORKER=0): the anomaly stream, fleet snapshot refreshes, registry
+polls and drift-triggered retrains. The other workers run their stream only
+while a client is subscribed, and load the registry version worker 0 serves.
+TRAINING_WORKERS is split between the workers, and a lock file per machine
+keeps two of them from training the same machine. Workers that exit are
+restarted; SIGTERM/SIGINT stop them all. SERVING_PRELOAD=0 forks before
+loading anything, so every worker loads its own private copy (as uvicorn
+--workers would) and nothing is shared, for comparison.
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, Union
+
+import preload
+
+
+def memory_mb(pid: Union[int, str] = 'self') -> Dict[str, float]:
+    """RSS, PSS (shared pages split between their users) and USS (private pages) of a process, in MB."""
+    fields = {'Rss': 0, 'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in fields:
+                    fields[name] = int(rest.split()[0])  # kB
+    except OSError:
+        return {}
+    return {
+        'rss': round(fields['Rss'] / 1024, 1),
+        'pss': round(fields['Pss'] / 1024, 1),
+        'uss': round((fields['Private_Clean'] + fields['Private_Dirty']) / 1024, 1),
+    }
+
+
+def _run_worker(index: int, sock: socket.socket, preloaded: bool, forked_at: float):
+    os.environ['SERVING_WORKER'] = str(index)
+    # uvicorn installs its own handlers for a graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if not preloaded:
+        preload.preload_models(serving_mode=os.getenv('MODEL_SERVING_MODE', 'machine'))
+
+    import uvicorn
+    from main import app
+
+    def ready():
+        memory = memory_mb()
+        # One write, newline included, so lines of workers starting together don't interleave
+        print(f"Worker {index} (pid {os.getpid()}) ready in {time.monotonic() - forked_at:.2f}s, "
+              f"RSS {memory.get('rss')} MB, PSS {memory.get('pss')} MB, USS {memory.get('uss')} MB\n",
+              end='', flush=True)
+
+    app.router.on_startup.append(ready)
+    uvicorn.Server(uvicorn.Config(app, log_level=os.getenv('SERVING_LOG_LEVEL', 'info'))).run(sockets=[sock])
+
+
+def main():
+    workers = int(os.getenv('SERVING_WORKERS', '2'))
+    host = os.getenv('SERVING_HOST', '0.0.0.0')
+    port = int(os.getenv('SERVING_PORT', '8000'))
+    preloaded = os.getenv('SERVING_PRELOAD', '1') == '1'
+
+    started = time.monotonic()
+    if preloaded:
+        # Everything a worker imports except main itself, which opens pools and starts threads
+        import async_engine  # noqa: F401
+        import engine  # noqa: F401
+        import fastapi  # noqa: F401
+        import uvicorn  # noqa: F401
+
+        stats = preload.preload_models(serving_mode=os.getenv('MODEL_SERVING_MODE', 'machine'))
+        memory = memory_mb()
+        loaded = f"{stats['files_loaded']} files"
+        if stats['fleet_model']:
+            loaded += ', fleet model'
+        if stats['registry_version'] is not None:
+            loaded += f", registry version {stats['registry_version']}"
+        print(f"Preloaded {stats['models']} models ({loaded}) in {time.monotonic() - started:.2f}s, "
+              f"RSS {memory.get('rss')} MB", flush=True)
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    # Objects allocated so far are never scanned again, so collections in the workers leave their pages shared
+    gc.freeze()
+
+    children: Dict[int, int] = {}  # pid -> worker index
+    forked: Dict[int, float] = {}  # worker index -> monotonic fork time
+
+    def spawn(index: int):
+        forked[index] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(index, sock, preloaded, forked[index])
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children[pid] = index
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on {host}:{port} with {workers} workers (preload {'on' if preloaded else 'off'})", flush=True)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        print(f"Worker {index} (pid {pid}) exited with {os.waitstatus_to_exitcode(status)}, restarting", flush=True)
+        if time.monotonic() - forked[index] < 1.0:
+            time.sleep(1.0)  # crashing at startup; don't spin
+        spawn(index)
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from psycopg2 import sql
+
+# Per-metric window features, in the column order of PredictiveMaintenanceEngine._feature_columns
+_WINDOW_FEATURES = (
+    ('_mean_5m', 'AVG({m}) OVER w5'),
+    ('_std_5m', 'STDDEV_SAMP({m}) OVER w5'),
+    ('_max_5m', 'MAX({m}) OVER w5'),
+)
+_DIFF_FEATURE = ('_diff', '{m} - LAG({m}) OVER m')
+
+
+class SqlFeatureReader:
+    """
+    Builds the engine's features inside TimescaleDB with window functions, so
+    only the feature matrix crosses the wire instead of long-format telemetry.
+
+    Produces what fetch_fleet_telemetry + _engineer_fleet_features produce:
+    metrics pivoted per (machine_id, time), forward-filled within each machine,
+    then 0; metrics a machine never reported stay NULL in the raw frame and 0
+    in the features. Windows and diffs restart at each machine. Duplicate
+    readings of one metric at one timestamp are averaged, as on the pandas paths.
+
+    `relation` is any table or view with time, machine_id, metric_name and
+    value columns, e.g. a time_bucket continuous aggregate.
+    """
+
+    def __init__(self, relation: str = 'machine_telemetry'):
+        self.relation = relation
+
+    def metrics(self, conn, hours: float, machine_id: Optional[str] = None) -> List[str]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql.SQL("""
+                SELECT DISTINCT metric_name
+                FROM {relation}
+                WHERE time > NOW() - INTERVAL '%s hours'
+                  AND (%s::text IS NULL OR machine_id = %s)
+            """).format(relation=sql.Identifier(self.relation)), (hours, machine_id, machine_id))
+            return sorted(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def read(
+        self,
+        conn,
+        hours: float,
+        machine_id: Optional[str] = None,
+        latest: bool = False,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        (raw metrics, features) of the last `hours`, both indexed by (machine_id, time),
+        for one machine or the whole fleet. With `latest` only each machine's newest
+        row is returned; the windows are still computed over the full history.
+        """
+        metrics = self.metrics(conn, hours, machine_id)
+        if not metrics:
+            return pd.DataFrame(), pd.DataFrame()
+
+        query, params = self._query(metrics, hours, machine_id, latest)
+        cursor = conn.cursor()  # as_string needs a real psycopg2 object, not the pool's proxy
+        try:
+            text = query.as_string(cursor)
+        finally:
+            cursor.close()
+        frame = pd.read_sql_query(text, conn, params=params)
+        if frame.empty:
+            return pd.DataFrame(), pd.DataFrame()
+        frame = frame.set_index(['machine_id', 'time'])
+
+        raw = frame[metrics].astype(float)
+        features = pd.concat([raw.fillna(0), frame.drop(columns=metrics).astype(float)], axis=1)
+        return raw, features
+
+    def _query(self, metrics: List[str], hours: float, machine_id: Optional[str], latest: bool):
+        ident = [sql.Identifier(metric) for metric in metrics]
+        groups = [sql.Identifier(f'{metric}__grp') for metric in metrics]
+
+        pivot = sql.SQL(', ').join(
+            sql.SQL('AVG(value) FILTER (WHERE metric_name = %s) AS {}').format(m) for m in ident)
+        counts = sql.SQL(', ').join(
+            sql.SQL('COUNT({}) OVER m AS {}').format(m, g) for m, g in zip(ident, groups))
+        # Gaps take the machine's last reading (FIRST_VALUE of the run started by it), leading gaps 0;
+        # a metric the machine never reported stays NULL
+        fill = sql.SQL(', ').join(
+            sql.SQL('CASE WHEN BOOL_OR({m} IS NOT NULL) OVER (PARTITION BY machine_id) '
+                    'THEN COALESCE(FIRST_VALUE({m}) OVER (PARTITION BY machine_id, {g} ORDER BY time), 0) '
+                    'END AS {m}').format(m=m, g=g)
+            for m, g in zip(ident, groups))
+
+        features = []
+        for metric, m in zip(metrics, ident):
+            for suffix, expression in _WINDOW_FEATURES:
+                features.append(sql.SQL('COALESCE(' + expression + ', 0) AS {alias}').format(
+                    m=m, alias=sql.Identifier(metric + suffix)))
+        suffix, expression = _DIFF_FEATURE
+        for metric, m in zip(metrics, ident):
+            features.append(sql.SQL('COALESCE(' + expression + ', 0) AS {alias}').format(
+                m=m, alias=sql.Identifier(metric + suffix)))
+
+        query = sql.SQL("""
+            WITH pivoted AS (
+                SELECT machine_id, time, {pivot}
+                FROM {relation}
+                WHERE time > NOW() - INTERVAL '%s hours'
+                  AND (%s::text IS NULL OR machine_id = %s)
+                GROUP BY machine_id, time
+            ),
+            grouped AS (
+                SELECT *, {counts}
+                FROM pivoted
+                WINDOW m AS (PARTITION BY machine_id ORDER BY time)
+            ),
+            filled AS (
+                SELECT machine_id, time, {fill}
+                FROM grouped
+            ),
+            features AS (
+                SELECT machine_id, time, {raw}, {features}
+                FROM filled
+                WINDOW m AS (PARTITION BY machine_id ORDER BY time),
+                       w5 AS (m ROWS BETWEEN 4 PRECEDING AND CURRENT ROW)
+            )
+            SELECT {distinct} *
+            FROM features
+            ORDER BY machine_id COLLATE "C", time {direction}
+        """).format(
+            pivot=pivot,
+            relation=sql.Identifier(self.relation),
+            counts=counts,
+            fill=fill,
+            raw=sql.SQL(', ').join(ident),
+            features=sql.SQL(', ').join(features),
+            distinct=sql.SQL('DISTINCT ON (machine_id COLLATE "C")' if latest else ''),
+            direction=sql.SQL('DESC' if latest else 'ASC'),
+        )
+        return query, (*metrics, hours, machine_id, machine_id)
@@ -0,0 +1,263 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import asyncpg
+
+
+class AnomalyStream:
+    """
+    Incremental scoring loop behind the streaming anomaly feed.
+
+    The telemetry-service sends `NOTIFY machine_telemetry, '<machine_id>'`
+    after storing a reading. Notified machines are collected for `debounce_ms`,
+    re-scored in one predict_many batch (which only reads rows past each
+    machine's watermark) and compared with the last pushed result. Subscribers
+    receive an event only when the risk level or anomaly flag changes, or when
+    the score moves by at least `min_score_delta`.
+
+    If LISTEN is unavailable, per-machine watermarks are polled every
+    `poll_interval` seconds instead. The LISTEN connection is checked every
+    `poll_interval` seconds as well; when it drops, the stream polls until a
+    new one is up, then re-scores every machine it has pushed, since
+    notifications sent in between are lost.
+
+    With `on_demand` the stream only runs while it has subscribers: it starts
+    with the first and stops after the last leaves. Server workers other than
+    the first use this, so only one process scores every notification.
+    """
+
+    def __init__(
+        self,
+        db_config: Dict[str, str],
+        predict_many: Callable[[List[str]], Awaitable[Dict[str, object]]],
+        channel: str = 'machine_telemetry',
+        debounce_ms: float = 250.0,
+        min_score_delta: float = 0.02,
+        poll_interval: float = 5.0,
+        queue_size: int = 256,
+        on_demand: bool = False,
+    ):
+        self.db_config = db_config
+        self.predict_many = predict_many
+        self.channel = channel
+        self.debounce = debounce_ms / 1000.0
+        self.min_score_delta = min_score_delta
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.on_demand = on_demand
+
+        self.latest: Dict[str, Dict] = {}  # last pushed prediction per machine
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._dirty: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._listener: Optional[asyncpg.Connection] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+
+        # Metrics
+        self._notifications = 0
+        self._scoring_rounds = 0
+        self._machines_scored = 0
+        self._events_published = 0
+        self._events_dropped = 0
+        self._reconnects = 0
+
+    async def start(self):
+        self._launch()
+
+    async def stop(self):
+        self._halt()
+
+    def _launch(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks.append(loop.create_task(self._listen_loop()))
+        self._tasks.append(loop.create_task(self._scoring_loop()))
+        # Pushed results may have gone stale while the stream was stopped
+        self.mark_dirty(list(self.latest))
+
+    def _halt(self):
+        for task in self._tasks + ([self._poller] if self._poller is not None else []):
+            task.cancel()
+        self._tasks, self._poller = [], None
+        if self._listener is not None:
+            self._listener.terminate()
+            self._listener = None
+
+    async def _connect(self) -> asyncpg.Connection:
+        return await asyncpg.connect(
+            host=self.db_config['host'],
+            port=self.db_config['port'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            database=self.db_config['database'],
+        )
+
+    async def _listen_loop(self):
+        """Keep a LISTEN connection up, polling watermarks whenever there is none."""
+        loop = asyncio.get_running_loop()
+        while True:
+            listener = None
+            try:
+                listener = await self._connect()
+                lost = asyncio.Event()
+                listener.add_termination_listener(lambda connection: lost.set())
+                await listener.add_listener(self.channel, self._on_notify)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                if listener is not None:
+                    listener.terminate()
+                if self._poller is None:
+                    print(f"LISTEN {self.channel} unavailable ({e}), polling telemetry watermarks instead")
+                    self._poller = loop.create_task(self._poll_loop())
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            self._listener = listener
+            if self._poller is not None:
+                self._poller.cancel()
+                self._poller = None
+                print(f"LISTEN {self.channel} restored")
+                self.mark_dirty(list(self.latest))
+            try:
+                await self._watch(listener, lost)
+            finally:
+                self._listener = None
+                listener.terminate()
+            self._reconnects += 1
+            print(f"LISTEN {self.channel} connection lost, polling telemetry watermarks until it is back")
+            self._poller = loop.create_task(self._poll_loop())
+
+    async def _watch(self, listener: asyncpg.Connection, lost: asyncio.Event):
+        """
+        Return once the LISTEN connection is gone: closed (termination listener)
+        or no longer answering, e.g. after a silent network failure.
+        """
+        while not lost.is_set():
+            try:
+                await asyncio.wait_for(lost.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                try:
+                    await asyncio.wait_for(listener.fetchval('SELECT 1'), self.poll_interval)
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    return
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self._notifications += 1
+        self.mark_dirty([payload])
+
+    def mark_dirty(self, machine_ids: List[str]):
+        """Queue machines for re-scoring (also usable as an in-process ingestion hook)."""
+        self._dirty.update(machine_id for machine_id in machine_ids if machine_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _poll_loop(self):
+        watermarks: Dict[str, object] = {}
+        while True:
+            try:
+                connection = await self._connect()
+                try:
+                    while True:
+                        rows = await connection.fetch("""
+                            SELECT machine_id, MAX(time) AS latest
+                            FROM machine_telemetry
+                            WHERE time > NOW() - make_interval(secs => $1)
+                            GROUP BY machine_id
+                        """, self.poll_interval * 2)
+                        changed = [row['machine_id'] for row in rows
+                                   if watermarks.get(row['machine_id']) != row['latest']]
+                        watermarks.update((row['machine_id'], row['latest']) for row in rows)
+                        self.mark_dirty(changed)
+                        await asyncio.sleep(self.poll_interval)
+                finally:
+                    await connection.close()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                print(f"Telemetry watermark poll failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _scoring_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # Let bursts of notifications for the same readings settle into one round
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            machine_ids, self._dirty = list(self._dirty), set()
+            if not machine_ids:
+                continue
+
+            try:
+                results = await self.predict_many(machine_ids)
+            except Exception as e:
+                print(f"Streaming scoring round failed: {e}")
+                continue
+
+            self._scoring_rounds += 1
+            self._machines_scored += len(machine_ids)
+            for machine_id, result in results.items():
+                if isinstance(result, dict):
+                    event = self._diff(machine_id, result)
+                    if event is not None:
+                        self._publish(event)
+
+    def _diff(self, machine_id: str, result: Dict) -> Optional[Dict]:
+        previous = self.latest.get(machine_id)
+        if previous is None:
+            kind = 'risk_change'
+        elif (previous['risk_level'] != result['risk_level']
+              or previous['is_anomaly'] != result['is_anomaly']):
+            kind = 'risk_change'
+        elif abs(previous['anomaly_score'] - result['anomaly_score']) >= self.min_score_delta:
+            kind = 'score_update'
+        else:
+            return None
+
+        self.latest[machine_id] = result
+        return {
+            'type': kind,
+            'machine_id': machine_id,
+            'previous_risk_level': previous['risk_level'] if previous else None,
+            'prediction': result,
+        }
+
+    def _publish(self, event: Dict):
+        self._events_published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the loop
+                queue.get_nowait()
+                self._events_dropped += 1
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self.on_demand:
+            self._launch()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        if self.on_demand and not self._subscribers:
+            self._halt()
+
+    def snapshot(self) -> List[Dict]:
+        """Latest pushed prediction for every machine, sent to new subscribers first."""
+        return [
+            {'type': 'snapshot', 'machine_id': machine_id, 'previous_risk_level': None, 'prediction': result}
+            for machine_id, result in self.latest.items()
+        ]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'mode': 'listen' if self._listener is not None else 'poll' if self._tasks else 'stopped',
+            'subscribers': len(self._subscribers),
+            'notifications': self._notifications,
+            'scoring_rounds': self._scoring_rounds,
+            'machines_scored': self._machines_scored,
+            'events_published': self._events_published,
+            'events_dropped': self._events_dropped,
+            'listen_reconnects': self._reconnects,
+            'pending': len(self._dirty),
+        }
@@ -0,0 +1,223 @@
+import fcntl
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fleet_model import FLEET_MODEL_ID
+from metrics import MODEL_TRAININGS, STAGE_SECONDS
+from model_store import ModelStore
+
+
+class ModelPending(Exception):
+    """Raised instead of training inline when a machine's model is still being trained."""
+
+    def __init__(self, job: 'TrainingJob'):
+        super().__init__(f"Model for {job.machine_id} is pending (job {job.job_id})")
+        self.job = job
+
+
+# Per-process engine used by the worker pool, created once by _init_worker
+_worker_engine = None
+
+
+def _init_worker(db_config: Dict[str, str], store_dir: str, serving_mode: str, feature_backend: str):
+    global _worker_engine
+    from db_pool import ConnectionPool
+    from engine import PredictiveMaintenanceEngine
+
+    _worker_engine = PredictiveMaintenanceEngine(
+        db_config,
+        pool=ConnectionPool(db_config, min_size=0, max_size=1),
+        model_store=ModelStore(store_dir, max_bytes=0),
+        serving_mode=serving_mode,
+        feature_backend=feature_backend,
+    )
+
+
+def _model_path(store: ModelStore, machine_id: str, serving_mode: str) -> str:
+    """File a training job for `machine_id` writes."""
+    if serving_mode != 'fleet':
+        return store.path(machine_id)
+    return store.fleet_path if machine_id == FLEET_MODEL_ID else store.profile_path(machine_id)
+
+
+def _train_in_worker(machine_id: str, contamination: float, submitted: float) -> bool:
+    """
+    Train one machine while holding its lock file in the store directory.
+    Server workers share the directory, so only one of them trains a machine
+    at a time; a job that had to wait for another's lock uses that model if
+    it was written after this job was submitted.
+    """
+    store = _worker_engine.model_store
+    lock_dir = os.path.join(store.directory, 'training-locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, os.path.basename(store.path(machine_id)) + '.lock')
+    with open(lock_path, 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = _model_path(store, machine_id, _worker_engine.serving_mode)
+            if os.path.exists(path) and os.path.getmtime(path) >= submitted:
+                return True
+        return _worker_engine.train_model(machine_id, contamination=contamination)
+
+
+class TrainingJob:
+    """One training run for one machine, backed by a process-pool future."""
+
+    def __init__(self, job_id: str, machine_id: str, contamination: float, future: Future):
+        self.job_id = job_id
+        self.machine_id = machine_id
+        self.contamination = contamination
+        self.future = future
+        self.submitted_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.duration_s: Optional[float] = None
+        self._started = time.monotonic()
+
+    @property
+    def status(self) -> str:
+        if not self.future.done():
+            return 'running' if self.future.running() else 'queued'
+        if self.future.cancelled() or self.future.exception() is not None or not self.future.result():
+            return 'failed'
+        return 'completed'
+
+    @property
+    def error(self) -> Optional[str]:
+        if not self.future.done():
+            return None
+        if self.future.cancelled():
+            return 'Cancelled'
+        if self.future.exception() is not None:
+            return repr(self.future.exception())
+        return None if self.future.result() else 'Insufficient data'
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'machine_id': self.machine_id,
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': self.submitted_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_s': self.duration_s,
+        }
+
+
+class TrainingScheduler:
+    """
+    Trains per-machine models out of the serving process.
+
+    Jobs run in a process pool capped at `max_workers`, so training never
+    competes with inference for the GIL. Concurrent requests for the same
+    machine collapse onto the in-flight job, and a machine whose last job
+    failed is not retried automatically for `retry_after` seconds. Schedulers
+    in other processes sharing the store directory (server workers) do not
+    train the same machine at once: a lock file per machine serializes them. Finished
+    models land in the shared ModelStore directory; the serving process
+    picks them up on its next lookup. In fleet serving mode a job profiles one
+    machine, or refits the shared fleet model when its id is FLEET_MODEL_ID.
+    """
+
+    def __init__(
+        self,
+        db_config: Dict[str, str],
+        model_store: ModelStore,
+        max_workers: int = 2,
+        retry_after: float = 300.0,
+        history: int = 1000,
+        serving_mode: str = 'machine',
+        feature_backend: str = 'pandas',
+    ):
+        self.model_store = model_store
+        self.serving_mode = serving_mode
+        self.feature_backend = feature_backend
+        self.max_workers = max_workers
+        self.retry_after = retry_after
+        self.history = history
+        self._db_config = db_config
+        self._executor = self._new_executor()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._latest: Dict[str, TrainingJob] = {}  # machine_id -> most recent job
+        self._jobs: 'OrderedDict[str, TrainingJob]' = OrderedDict()
+        self._deduplicated = 0
+
+    def submit(self, machine_id: str, contamination: float = 0.1, force: bool = False) -> TrainingJob:
+        """
+        Queue training for a machine, or return the job already covering it.
+        Without `force`, a recent failure is returned instead of retrying.
+        """
+        with self._lock:
+            job = self._latest.get(machine_id)
+            if job is not None and not job.future.done():
+                self._deduplicated += 1
+                return job
+            if (not force and job is not None and job.finished_at is not None and job.status == 'failed'
+                    and (datetime.now() - job.finished_at).total_seconds() < self.retry_after):
+                return job
+
+            job_id = f"train-{next(self._ids)}"
+            submitted = time.time()
+            try:
+                future = self._executor.submit(_train_in_worker, machine_id, contamination, submitted)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM during a fit); start a fresh pool
+                self._executor = self._new_executor()
+                future = self._executor.submit(_train_in_worker, machine_id, contamination, submitted)
+            job = TrainingJob(job_id, machine_id, contamination, future)
+            self._latest[machine_id] = job
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+
+        future.add_done_callback(lambda _: self._finish(job))
+        return job
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self._db_config, self.model_store.directory, self.serving_mode, self.feature_backend),
+        )
+
+    def _finish(self, job: TrainingJob):
+        job.finished_at = datetime.now()
+        job.duration_s = round(time.monotonic() - job._started, 3)
+        MODEL_TRAININGS.labels(job.status).inc()
+        STAGE_SECONDS.labels('training').observe(job.duration_s)
+        if job.status == 'completed':
+            # Drop any stale in-memory copy so the next lookup loads the new model
+            self.model_store.invalidate(job.machine_id)
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, machine_id: str) -> Optional[TrainingJob]:
+        with self._lock:
+            return self._latest.get(machine_id)
+
+    def jobs(self) -> List[TrainingJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, int]:
+        jobs = self.jobs()
+        counts = {status: 0 for status in ('queued', 'running', 'completed', 'failed')}
+        for job in jobs:
+            counts[job.status] += 1
+        return {'max_workers': self.max_workers, 'deduplicated': self._deduplicated, **counts}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ModelEvaluator run queries and model loading against a local
+file-based MLflow store. Logs synthetic runs shaped like the pipeline's
+(IsolationForest and RandomForest, metrics, model and scaler artifacts), then
+compares the former search-everything-and-sort-in-Python query with the
+server-side top-K query, and uncached with cached model loads.
+
+    poetry run python benchmarks/bench_evaluator.py --runs 2000 --loads 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import mlflow
+import mlflow.sklearn
+import numpy as np
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from evaluation.evaluator import ModelEvaluator  # noqa: E402
+
+
+def log_runs(n_runs: int, n_with_models: int, seed: int = 42):
+    """Log `n_runs` runs; the newest `n_with_models` RandomForest runs also get model artifacts."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(500, 10))
+    y = (X[:, 0] > 1).astype(int)
+    scaler = StandardScaler().fit(X)
+    forest = RandomForestClassifier(n_estimators=20, random_state=42).fit(scaler.transform(X), y)
+    iso = IsolationForest(n_estimators=20, random_state=42).fit(scaler.transform(X))
+
+    for i in range(n_runs):
+        supervised = i % 2 == 0
+        with mlflow.start_run(run_name="random_forest" if supervised else "isolation_forest"):
+            mlflow.log_param("algorithm", "RandomForest" if supervised else "IsolationForest")
+            mlflow.log_param("training_mode", "full" if i % 7 == 0 else "incremental")
+            mlflow.log_metric("training_seconds", float(rng.uniform(5, 120)))
+            if supervised:
+                mlflow.log_metric("f1_score", float(rng.uniform(0.5, 1.0)))
+                mlflow.log_metric("precision", float(rng.uniform(0.5, 1.0)))
+                mlflow.log_metric("recall", float(rng.uniform(0.5, 1.0)))
+            else:
+                mlflow.log_metric("anomaly_rate", float(rng.uniform(0.05, 0.15)))
+            if i >= n_runs - n_with_models:
+                mlflow.sklearn.log_model(forest if supervised else iso, "model")
+                mlflow.sklearn.log_model(scaler, "scaler")
+
+
+def best_model_legacy(experiment_name: str = "predictive_maintenance"):
+    """The former compare_models query: every run into pandas, best F1 picked in Python."""
+    experiment = mlflow.get_experiment_by_name(experiment_name)
+    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    return runs.loc[runs['metrics.f1_score'].fillna(0).idxmax(), 'run_id']
+
+
+def timed(fn, repeat: int = 3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--loads', type=int, default=20, help='model loads per pass')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_evaluator_')
+    mlflow.set_tracking_uri(f"file:{os.path.join(work_dir, 'mlruns')}")
+    mlflow.set_experiment("predictive_maintenance")
+
+    started = time.perf_counter()
+    n_models = min(args.loads, args.runs)
+    log_runs(args.runs, n_models)
+    print(f"Logged {args.runs} runs ({n_models} with models) in {time.perf_counter() - started:.1f}s")
+
+    evaluator = ModelEvaluator(
+        mlflow_uri=f"file:{os.path.join(work_dir, 'mlruns')}",
+        cache_dir=os.path.join(work_dir, 'artifact_cache'),
+    )
+    legacy_best, legacy_s = timed(best_model_legacy)
+    top, top_s = timed(lambda: evaluator.top_models(k=10, since_days=None))
+    assert top[0]['run_id'] == legacy_best, "top-K query disagrees with the full scan"
+
+    run_ids = [model['run_id'] for model in evaluator.get_latest_models(max_results=n_models)
+               if model['algorithm'] == 'RandomForest']
+    uncached = ModelEvaluator(mlflow_uri=f"file:{os.path.join(work_dir, 'mlruns')}", cache_dir=None)
+    _, uncached_s = timed(lambda: [uncached.load_model(run_id) for run_id in run_ids], repeat=1)
+    _, cold_s = timed(lambda: [evaluator.load_model(run_id) for run_id in run_ids], repeat=1)
+    _, warm_s = timed(lambda: [evaluator.load_model(run_id) for run_id in run_ids])
+
+    print(f"\n{'query':<36}{'seconds':>10}")
+    print(f"{'search_runs + Python max (legacy)':<36}{legacy_s:>10.3f}")
+    print(f"{'top_models(k=10), server-side':<36}{top_s:>10.3f}")
+    print(f"\n{f'{len(run_ids)} model loads':<36}{'seconds':>10}")
+    print(f"{'runs:/ URI (no cache)':<36}{uncached_s:>10.3f}")
+    print(f"{'artifact cache, cold':<36}{cold_s:>10.3f}")
+    print(f"{'artifact cache, warm':<36}{warm_s:>10.3f}")
+    print(f"\ncache: {evaluator.artifacts.stats()}")
+
+
+if __name__ == '__main__':
+    main()
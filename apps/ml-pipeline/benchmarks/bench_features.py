@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: groupby-based engineer_features vs the former per-machine loop.
+Builds synthetic fleets shaped like fetch_training_data output (one row per
+(time, machine_id), sorted by time), checks both produce identical frames,
+then times them as the fleet grows.
+
+    poetry run python benchmarks/bench_features.py --machines 10,50,200 --rows 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from training.features import engineer_features  # noqa: E402
+
+
+def engineer_features_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous MLPipeline.engineer_features, kept as the reference implementation."""
+    features = df.copy()
+
+    for machine_id in df['machine_id'].unique():
+        mask = df['machine_id'] == machine_id
+        machine_df = df[mask].copy()
+
+        for col in ['temperature', 'vibration', 'spindle_speed', 'power_consumption']:
+            if col in machine_df.columns:
+                features.loc[mask, f'{col}_mean_5m'] = machine_df[col].rolling(window=5, min_periods=1).mean()
+                features.loc[mask, f'{col}_std_5m'] = machine_df[col].rolling(window=5, min_periods=1).std().fillna(0)
+                features.loc[mask, f'{col}_max_5m'] = machine_df[col].rolling(window=5, min_periods=1).max()
+                features.loc[mask, f'{col}_min_5m'] = machine_df[col].rolling(window=5, min_periods=1).min()
+                features.loc[mask, f'{col}_mean_30m'] = machine_df[col].rolling(window=30, min_periods=1).mean()
+                features.loc[mask, f'{col}_std_30m'] = machine_df[col].rolling(window=30, min_periods=1).std().fillna(0)
+                features.loc[mask, f'{col}_diff'] = machine_df[col].diff().fillna(0)
+                features.loc[mask, f'{col}_pct_change'] = machine_df[col].pct_change().fillna(0)
+
+    if 'temperature' in features.columns and 'vibration' in features.columns:
+        features['temp_vibration_interaction'] = features['temperature'] * features['vibration']
+
+    if 'spindle_speed' in features.columns and 'power_consumption' in features.columns:
+        features['efficiency'] = features['power_consumption'] / (features['spindle_speed'] + 1)
+
+    return features.fillna(0)
+
+
+def synthetic_fleet(machines: int, rows_per_machine: int, seed: int = 42) -> pd.DataFrame:
+    """Pivoted telemetry like fetch_training_data: time-sorted, machines interleaved."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2025-01-01', periods=rows_per_machine, freq='min')
+    frame = pd.DataFrame({
+        'time': np.repeat(times, machines),
+        'machine_id': np.tile([f'CNC-{i:04d}' for i in range(machines)], rows_per_machine),
+    })
+    n = len(frame)
+    frame['power_consumption'] = rng.normal(18.5, 2.0, n)
+    frame['spindle_speed'] = rng.normal(3500, 150, n).round()
+    frame['temperature'] = rng.normal(195, 8, n)
+    frame['vibration'] = rng.gamma(4.0, 0.3, n)
+    # Stopped spindles exercise pct_change's 0 -> inf / 0 / 0 -> NaN paths
+    frame.loc[rng.random(n) < 0.01, 'spindle_speed'] = 0.0
+    return frame
+
+
+def timed(fn, df: pd.DataFrame):
+    start = time.perf_counter()
+    result = fn(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', default='5,20,50,100', help='Comma-separated fleet sizes')
+    parser.add_argument('--rows', type=int, default=1440, help='Rows per machine (1440 = one day at 1/min)')
+    args = parser.parse_args()
+
+    print(f"{'machines':>8} {'rows':>10} {'loop s':>9} {'groupby s':>10} {'speedup':>8}")
+    for machines in (int(m) for m in args.machines.split(',')):
+        df = synthetic_fleet(machines, args.rows)
+        expected, loop_s = timed(engineer_features_loop, df)
+        actual, vectorized_s = timed(engineer_features, df)
+        pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+        print(f"{machines:>8} {len(df):>10} {loop_s:>9.3f} {vectorized_s:>10.3f} {loop_s / vectorized_s:>7.1f}x")
+    print("outputs: identical to the per-machine loop at every size")
+
+
+if __name__ == '__main__':
+    main()
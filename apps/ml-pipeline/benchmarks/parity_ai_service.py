@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Parity check: the code training/machine_models.py keeps in step with the
+ai-service, compared against the ai-service's own implementation on the same
+synthetic telemetry:
+  - machine_features vs PredictiveMaintenanceEngine._engineer_features
+    (values and column order, also against _feature_columns)
+  - drift_reference vs drift.drift_reference
+
+Fails (exit status 1) as soon as either copy changes without the other. Needs
+the ai-service's dependencies importable next to the pipeline's; no database.
+
+    PYTHONPATH=../ai-service/src poetry run python benchmarks/parity_ai_service.py
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'ai-service', 'src'))
+from training.machine_models import drift_reference, machine_features  # noqa: E402
+
+import drift  # noqa: E402
+from engine import PredictiveMaintenanceEngine  # noqa: E402
+
+
+def synthetic_machine(rows: int, seed: int) -> pd.DataFrame:
+    """One machine's pivoted, forward-filled metrics, as both sides train on them."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(end=pd.Timestamp.now(tz='UTC').floor('min'), periods=rows, freq='min')
+    return pd.DataFrame({
+        'power_consumption': rng.normal(18.5, 2.0, rows),
+        'spindle_speed': np.where(rng.random(rows) < 0.05, 0.0, rng.normal(3500, 150, rows)),
+        'temperature': rng.normal(195, 8, rows),
+        'vibration': rng.gamma(2.0, 0.6, rows),
+        'coolant_flow': np.full(rows, 12.0),  # constant: zero std, one quantile bin
+    }, index=times)
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{name:<40}{'OK' if ok else 'FAILED'}{f'  ({detail})' if detail and not ok else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--seeds', type=int, default=5)
+    args = parser.parse_args()
+
+    matched = True
+    for seed in range(args.seeds):
+        df = synthetic_machine(args.rows, seed)
+
+        pipeline = machine_features(df)
+        service = PredictiveMaintenanceEngine._engineer_features(None, df)
+        columns = PredictiveMaintenanceEngine._feature_columns(list(df.columns))
+        matched &= check(f"seed {seed}: feature columns", list(pipeline.columns) == list(service.columns) == columns,
+                         f"{list(pipeline.columns)} vs {list(service.columns)}")
+        matched &= check(f"seed {seed}: feature values", pipeline.shape == service.shape
+                         and np.array_equal(pipeline.values, service.values))
+
+        X = service.values
+        expected, actual = drift.drift_reference(X, columns), drift_reference(X, columns)
+        same = (expected.keys() == actual.keys() and expected['columns'] == actual['columns']
+                and all(np.array_equal(expected[key], actual[key]) for key in ('edges', 'expected')))
+        matched &= check(f"seed {seed}: drift reference", same)
+
+    print("parity: OK" if matched else "parity: FAILED")
+    sys.exit(0 if matched else 1)
+
+
+if __name__ == '__main__':
+    main()
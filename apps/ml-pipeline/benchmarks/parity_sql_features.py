@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark: training features computed in the database
+(training.sql_features) vs the pandas path (chunked fetch_training_data +
+engineer_features). Needs a local Postgres, ideally with TimescaleDB
+(POSTGRES_* as for the pipeline).
+
+Loads synthetic telemetry (gaps, duplicate readings, stopped spindles) into a
+scratch schema, runs both paths against it, checks they produce the same
+frame, and reports rows and payload bytes sent by the server and wall time.
+With --bucket and TimescaleDB, also reads a time_bucket continuous aggregate
+(bucket averages, so not part of the parity check). The schema is dropped
+afterwards.
+
+    POSTGRES_PORT=5433 poetry run python benchmarks/parity_sql_features.py --machines 50 --rows 1440
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from training.features import engineer_features  # noqa: E402
+from training.ingestion import ChunkedTelemetryReader  # noqa: E402
+from training.sql_features import (  # noqa: E402
+    SqlFeatureReader, create_continuous_aggregate, refresh_continuous_aggregate,
+)
+
+
+def synthetic_telemetry(machines: int, rows: int, seed: int = 42) -> pd.DataFrame:
+    """Long-format readings, one per minute per machine and metric, ending now."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    times = pd.date_range(end=end, periods=rows, freq='min')
+    centers = {'power_consumption': (18.5, 2.0), 'spindle_speed': (3500, 150),
+               'temperature': (195, 8), 'vibration': (1.2, 0.3), 'coolant_flow': (12, 1)}
+    frames = []
+    for i in range(machines):
+        # Machines report at slightly different seconds, so (time, machine_id) order interleaves
+        machine_times = times + pd.Timedelta(seconds=i % 60)
+        for metric, (mean, std) in centers.items():
+            if metric == 'coolant_flow' and i % 3:
+                continue  # only some machines report it
+            values = rng.normal(mean, std, rows)
+            if metric == 'spindle_speed':
+                values[rng.random(rows) < 0.01] = 0.0  # 0 -> inf and 0/0 paths of pct_change
+            keep = rng.random(rows) > 0.05  # gaps, filled forward
+            frames.append(pd.DataFrame({'time': machine_times[keep], 'machine_id': f'CNC-{i:04d}',
+                                        'metric_name': metric, 'value': values[keep]}))
+    long = pd.concat(frames, ignore_index=True)
+    duplicates = long.sample(frac=0.005, random_state=seed).assign(value=lambda d: d['value'] * 1.01)
+    return pd.concat([long, duplicates], ignore_index=True)
+
+
+def load(conn, schema: str, telemetry: pd.DataFrame) -> bool:
+    """Create the scratch schema and table; returns whether it is a hypertable."""
+    cursor = conn.cursor()
+    cursor.execute(sql.SQL("CREATE SCHEMA {}").format(sql.Identifier(schema)))
+    cursor.execute(sql.SQL("""
+        CREATE TABLE {}.machine_telemetry (
+            time TIMESTAMPTZ NOT NULL,
+            machine_id TEXT NOT NULL,
+            metric_name TEXT NOT NULL,
+            value DOUBLE PRECISION
+        )
+    """).format(sql.Identifier(schema)))
+    cursor.execute("SELECT count(*) FROM pg_extension WHERE extname = 'timescaledb'")
+    timescale = cursor.fetchone()[0] > 0
+    if timescale:
+        cursor.execute("SELECT create_hypertable(%s, 'time')", (f'{schema}.machine_telemetry',))
+    buffer = io.StringIO()
+    telemetry.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f%z')
+    buffer.seek(0)
+    cursor.copy_expert(sql.SQL("COPY {}.machine_telemetry FROM STDIN WITH CSV").format(sql.Identifier(schema)),
+                       buffer)
+    cursor.execute(sql.SQL("ANALYZE {}.machine_telemetry").format(sql.Identifier(schema)))
+    conn.commit()
+    cursor.close()
+    return timescale
+
+
+def payload_bytes(conn, query, params) -> int:
+    """Server-side size of a result set (sum of pg_column_size over its rows)."""
+    cursor = conn.cursor()
+    cursor.execute(sql.SQL("SELECT sum(pg_column_size(result.*)) FROM ({}) AS result").format(query), params)
+    size = cursor.fetchone()[0]
+    cursor.close()
+    return int(size or 0)
+
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame) -> bool:
+    ok = list(expected.columns) == list(actual.columns) and len(expected) == len(actual)
+    if not ok:
+        print(f"column/row mismatch: {expected.shape} vs {actual.shape}")
+        print(f"  only pandas: {sorted(set(expected.columns) - set(actual.columns))}")
+        print(f"  only sql:    {sorted(set(actual.columns) - set(expected.columns))}")
+        return False
+    ok &= bool((expected['time'].to_numpy() == actual['time'].to_numpy()).all())
+    ok &= bool((expected['machine_id'].astype(str).to_numpy() == actual['machine_id'].astype(str).to_numpy()).all())
+    a = expected.drop(columns=['time', 'machine_id']).to_numpy(dtype=np.float64)
+    b = actual.drop(columns=['time', 'machine_id']).to_numpy(dtype=np.float64)
+    # Both sides are float32; the window sums run in float64 on both. A diff of two readings is
+    # exact only to the float32 resolution of the readings themselves (~2e-4 for spindle speeds)
+    columns = list(expected.columns[2:])
+    atol = np.full(len(columns), 1e-4)
+    for i, column in enumerate(columns):
+        if column.endswith('_diff') and column[:-len('_diff')] in columns:
+            source = np.abs(a[:, columns.index(column[:-len('_diff')])])
+            scale = source[np.isfinite(source)].max(initial=0.0)
+            atol[i] = max(atol[i], 4 * np.finfo(np.float32).eps * scale)
+    close = np.isclose(a, b, rtol=1e-5, atol=atol)
+    finite = np.isfinite(a) & np.isfinite(b)
+    print(f"max abs difference {np.abs(a - b)[finite].max() if finite.any() else 0:.3g}, "
+          f"infinities {int(np.isinf(a).sum())} / {int(np.isinf(b).sum())}")
+    for column in expected.columns[2:][~close.all(axis=0)][:10]:
+        print(f"  mismatch in {column}")
+    return ok and bool(close.all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--machines', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=1440, help='Minutes of telemetry per machine')
+    parser.add_argument('--days', type=int, default=30, help='Training window read by both paths')
+    parser.add_argument('--bucket', default='5 minutes', help="Continuous aggregate bucket ('' to skip)")
+    args = parser.parse_args()
+
+    schema = f'sql_features_parity_{os.getpid()}'
+    db_config = {
+        'host': os.getenv('POSTGRES_HOST', 'localhost'),
+        'port': int(os.getenv('POSTGRES_PORT', '5433')),
+        'user': os.getenv('POSTGRES_USER', 'admin'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'password'),
+        'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry'),
+        # Unqualified machine_telemetry resolves to the scratch table
+        'options': f'-c search_path={schema},public',
+    }
+
+    telemetry = synthetic_telemetry(args.machines, args.rows)
+    conn = psycopg2.connect(**db_config)
+    try:
+        timescale = load(conn, schema, telemetry)
+        print(f"{len(telemetry)} telemetry rows, {args.machines} machines"
+              f"{' (hypertable)' if timescale else ' (plain table, no TimescaleDB)'}\n")
+
+        started = time.perf_counter()
+        chunked = ChunkedTelemetryReader()
+        expected = engineer_features(chunked.read(conn, days=args.days))
+        pandas_s = time.perf_counter() - started
+
+        reader = SqlFeatureReader()
+        started = time.perf_counter()
+        actual = reader.read(conn, days=args.days)
+        sql_s = time.perf_counter() - started
+
+        raw_query = sql.SQL("SELECT time, machine_id, metric_name, value FROM machine_telemetry "
+                            "WHERE time > NOW() - INTERVAL '%s days'")
+        metrics = reader.metrics(conn, args.days)
+        raw_bytes = payload_bytes(conn, raw_query, (args.days,))
+        feature_bytes = payload_bytes(conn, reader._query(metrics), (*metrics, args.days))
+        conn.rollback()
+
+        print(f"{'':<24}{'rows sent':>12}{'payload MB':>12}{'seconds':>10}")
+        print(f"{'pandas (long rows)':<24}{chunked.stats['rows']:>12,}{raw_bytes / 1e6:>12.2f}{pandas_s:>10.2f}")
+        print(f"{'sql (feature rows)':<24}{len(actual):>12,}{feature_bytes / 1e6:>12.2f}{sql_s:>10.2f}")
+
+        if args.bucket and timescale:
+            view = 'machine_telemetry_' + args.bucket.replace(' ', '_')
+            create_continuous_aggregate(conn, view, args.bucket, refresh_days=args.days)
+            refresh_continuous_aggregate(conn, view, days=args.days)
+            bucketed = SqlFeatureReader(relation=view)
+            started = time.perf_counter()
+            rolled_up = bucketed.read(conn, days=args.days)
+            bucket_s = time.perf_counter() - started
+            rolled_bytes = payload_bytes(conn, bucketed._query(metrics), (*metrics, args.days))
+            conn.rollback()
+            print(f"{f'sql ({args.bucket} buckets)':<24}{len(rolled_up):>12,}{rolled_bytes / 1e6:>12.2f}"
+                  f"{bucket_s:>10.2f}")
+
+        print()
+        matched = compare(expected, actual)
+        print("parity: OK" if matched else "parity: FAILED")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        conn.cursor().execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(schema)))
+        conn.close()
+    sys.exit(0 if matched else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,40 +4,79 @@ Automated training scheduler.
 Runs ML pipeline on a schedule (e.g., daily, weekly).
 """
 
+import psycopg2
 import schedule
 import time
-from training.pipeline import MLPipeline
+from training.pipeline import MLPipeline, TRAINING_WINDOW_DAYS
+from training.ingestion import telemetry_fingerprint
+from training.scheduling import RunLog, TrainingJobRunner, feature_config_hash
 from evaluation.evaluator import ModelEvaluator
 import os
 from datetime import datetime
 
-def run_training_job():
-    """Execute training pipeline."""
+db_config = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': int(os.getenv('POSTGRES_PORT', '5433')),
+    'user': os.getenv('POSTGRES_USER', 'admin'),
+    'password': os.getenv('POSTGRES_PASSWORD', 'password'),
+    'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry')
+}
+snapshot_dir = os.getenv('TELEMETRY_SNAPSHOT_DIR', 'telemetry_snapshot') or None
+checkpoint_dir = os.getenv('PIPELINE_CHECKPOINT_DIR', 'pipeline_checkpoints') or None
+model_set_dir = os.getenv('MODEL_SET_DIR', 'model_sets')
+tuning_trials = 20
+full_retrain_days = 7.0
+
+def new_pipeline(incremental: bool = True) -> MLPipeline:
+    return MLPipeline(db_config, snapshot_dir=snapshot_dir, incremental=incremental, checkpoint_dir=checkpoint_dir,
+                      tuning_trials=tuning_trials, full_retrain_days=full_retrain_days)
+
+def fingerprint_inputs():
+    """Telemetry watermark and counts, plus a hash of the feature/label config."""
+    # A plain connection: building an MLPipeline here would also set up MLflow on every check
+    conn = psycopg2.connect(**db_config)
+    try:
+        fingerprint = telemetry_fingerprint(conn, days=TRAINING_WINDOW_DAYS)
+    finally:
+        conn.close()
+    fingerprint['config_hash'] = feature_config_hash({
+        'window_days': TRAINING_WINDOW_DAYS,
+        'tuning_trials': tuning_trials,
+        'full_retrain_days': full_retrain_days,
+        'model_set_dir': model_set_dir,
+    })
+    return fingerprint
+
+def training_job(mode: str):
+    """Execute training pipeline; mode is 'full' or 'incremental'."""
     print(f"\n{'='*80}")
-    print(f"SCHEDULED TRAINING JOB - {datetime.now().isoformat()}")
+    print(f"SCHEDULED TRAINING JOB ({mode}) - {datetime.now().isoformat()}")
     print(f"{'='*80}\n")
     
-    db_config = {
-        'host': os.getenv('POSTGRES_HOST', 'localhost'),
-        'port': int(os.getenv('POSTGRES_PORT', '5433')),
-        'user': os.getenv('POSTGRES_USER', 'admin'),
-        'password': os.getenv('POSTGRES_PASSWORD', 'password'),
-        'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry')
-    }
+    # Run training pipeline
+    pipeline = new_pipeline(incremental=(mode == 'incremental'))
+    pipeline.run_pipeline()
     
-    try:
-        # Run training pipeline
-        pipeline = MLPipeline(db_config)
-        pipeline.run_pipeline()
-        
-        # Evaluate and register best model
-        evaluator = ModelEvaluator()
-        evaluator.register_best_model()
-        
-        print(f"\n✅ Training job completed successfully")
-        
-    except Exception as e:
-        print(f"\n❌ Training job failed: {e}")
+    # Per-machine models for the ai-service, published as one model set
+    if model_set_dir:
+        pipeline.train_machine_models(model_set_dir)
+    
+    # Evaluate and register best model
+    evaluator = ModelEvaluator()
+    evaluator.register_best_model()
+    
+    print(f"\n✅ Training job completed successfully")
+
+runner = TrainingJobRunner(
+    fingerprint_inputs,
+    training_job,
+    RunLog(os.getenv('TRAINING_RUN_LOG', 'training_runs.jsonl')),
+    lock_path=os.getenv('TRAINING_LOCK_FILE', 'training.lock'),
+)
+
+def run_training_job(trigger: str = 'schedule'):
+    """Start the training job in the background; the schedule loop never blocks on it."""
+    runner.trigger(trigger)
 
 def main():
     """Main scheduler loop."""
@@ -52,7 +91,7 @@ def main():
     
     # Run immediately on start
     print("Running initial training...")
-    run_training_job()
+    run_training_job('startup')
     
     print(f"\n📅 Next scheduled run: {schedule.next_run()}")
     print("Press Ctrl+C to stop\n")
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from mlflow.tracking import MlflowClient
+
+
+def _tree_hash(path: str) -> str:
+    """sha256 over the relative paths and contents of every file under `path`."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def _tree_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+class ArtifactCache:
+    """
+    Local, content-addressed cache of MLflow run artifacts.
+
+    Downloaded artifacts are stored under `directory/objects/<sha256>/`, keyed
+    by a hash of their content, so identical content is stored once.
+    `index.json` maps `<run_id>/<artifact_path>` to its hash. Run artifacts are
+    immutable, so a cached entry never needs revalidation. When the objects
+    exceed `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024, client: Optional[MlflowClient] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.client = client or MlflowClient()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, object]] = self._read_index()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, 'index.json')
+
+    def _read_index(self) -> Dict[str, Dict[str, object]]:
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose object was removed behind our back
+        return {key: entry for key, entry in index.items() if os.path.isdir(self._object_path(entry['sha256']))}
+
+    def _write_index(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, 'objects', sha256)
+
+    def path(self, run_id: str, artifact_path: str) -> str:
+        """Local directory holding the run's artifact, downloading it on a miss."""
+        key = f'{run_id}/{artifact_path}'
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None and os.path.isdir(self._object_path(entry['sha256'])):
+                entry['last_used'] = time.time()
+                self._hits += 1
+                self._write_index()
+                return self._object_path(entry['sha256'])
+            self._misses += 1
+
+        staging = tempfile.mkdtemp(dir=self.directory, prefix='download-')
+        try:
+            local = self.client.download_artifacts(run_id, artifact_path, staging)
+            sha256 = _tree_hash(local)
+            size = _tree_size(local)
+            target = self._object_path(sha256)
+            with self._lock:
+                if not os.path.isdir(target):
+                    os.replace(local, target)  # same filesystem: atomic
+                self._index[key] = {'sha256': sha256, 'bytes': size, 'last_used': time.time()}
+                self._evict()
+                self._write_index()
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return target
+
+    def _evict(self):
+        # Called with the lock held; sizes count each object once however many runs share it
+        objects: Dict[str, int] = {}
+        for entry in self._index.values():
+            objects[entry['sha256']] = entry['bytes']
+        total = sum(objects.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes or len(self._index) <= 1:
+                break
+            del self._index[key]
+            self._evictions += 1
+            if not any(other['sha256'] == entry['sha256'] for other in self._index.values()):
+                shutil.rmtree(self._object_path(entry['sha256']), ignore_errors=True)
+                total -= entry['bytes']
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            objects = {entry['sha256']: entry['bytes'] for entry in self._index.values()}
+            return {
+                'entries': len(self._index),
+                'objects': len(objects),
+                'bytes': sum(objects.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+            }
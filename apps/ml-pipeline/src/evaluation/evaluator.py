@@ -2,45 +2,132 @@ import mlflow
 import mlflow.sklearn
 import pandas as pd
 import numpy as np
+from mlflow.entities import Run, ViewType
+from mlflow.tracking import MlflowClient
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, roc_curve
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Dict, List
-import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+from evaluation.artifact_cache import ArtifactCache
+
+# Names interpolated into MLflow search filters and orderings, which have no parameter binding
+_SEARCH_NAME = re.compile(r'^[\w.\- ]+$')
 
 class ModelEvaluator:
     """
     Evaluate and compare ML models from MLflow registry.
+    Run queries are filtered, ordered and paginated by the tracking server;
+    model artifacts are served from a local ArtifactCache after the first download.
     """
     
-    def __init__(self, mlflow_uri: str = "http://localhost:5000"):
+    def __init__(
+        self,
+        mlflow_uri: str = "http://localhost:5000",
+        cache_dir: Optional[str] = "artifact_cache",
+        cache_max_mb: int = 1024,
+        page_size: int = 500,
+    ):
         mlflow.set_tracking_uri(mlflow_uri)
-        
-    def get_latest_models(self, experiment_name: str = "predictive_maintenance") -> List[Dict]:
-        """Get latest models from experiment."""
+        self.client = MlflowClient()
+        self.artifacts = ArtifactCache(cache_dir, cache_max_mb * 1024 * 1024, self.client) if cache_dir else None
+        self.page_size = page_size
+    
+    def search_runs(
+        self,
+        experiment_name: str = "predictive_maintenance",
+        filters: Optional[List[str]] = None,
+        order_by: Optional[List[str]] = None,
+        since_days: Optional[float] = None,
+        max_results: Optional[int] = None,
+    ) -> Iterator[Run]:
+        """
+        Runs matching `filters` (MLflow search syntax, ANDed) in `order_by` order,
+        fetched page by page until `max_results` runs (all when None).
+        """
         experiment = mlflow.get_experiment_by_name(experiment_name)
         if not experiment:
             print(f"Experiment '{experiment_name}' not found")
-            return []
-        
-        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
-        
-        models = []
-        for _, run in runs.iterrows():
-            models.append({
-                'run_id': run['run_id'],
-                'algorithm': run.get('params.algorithm', 'Unknown'),
-                'f1_score': run.get('metrics.f1_score', 0),
-                'precision': run.get('metrics.precision', 0),
-                'recall': run.get('metrics.recall', 0),
-                'start_time': run['start_time'],
-            })
-        
-        return sorted(models, key=lambda x: x['start_time'], reverse=True)
+            return
+        
+        filters = list(filters or [])
+        if since_days is not None:
+            since = datetime.now(timezone.utc) - timedelta(days=since_days)
+            filters.append(f"attributes.start_time >= {int(since.timestamp() * 1000)}")
+        
+        page_token = None
+        returned = 0
+        while max_results is None or returned < max_results:
+            page_size = self.page_size if max_results is None else min(self.page_size, max_results - returned)
+            page = self.client.search_runs(
+                [experiment.experiment_id],
+                filter_string=" and ".join(filters),
+                run_view_type=ViewType.ACTIVE_ONLY,
+                max_results=page_size,
+                order_by=order_by or ["attributes.start_time DESC"],
+                page_token=page_token,
+            )
+            for run in page:
+                yield run
+            returned += len(page)
+            page_token = page.token
+            if not page_token:
+                break
     
-    def compare_models(self):
-        """Compare all models in the experiment."""
-        models = self.get_latest_models()
+    @staticmethod
+    def _summary(run: Run) -> Dict:
+        params, metrics = run.data.params, run.data.metrics
+        return {
+            'run_id': run.info.run_id,
+            'algorithm': params.get('algorithm', 'Unknown'),
+            'training_mode': params.get('training_mode') or 'full',
+            'f1_score': metrics.get('f1_score', 0),
+            'precision': metrics.get('precision', 0),
+            'recall': metrics.get('recall', 0),
+            'anomaly_rate': metrics.get('anomaly_rate'),
+            'training_seconds': metrics.get('training_seconds'),
+            'start_time': pd.Timestamp(run.info.start_time, unit='ms', tz='UTC'),
+        }
+    
+    def get_latest_models(
+        self,
+        experiment_name: str = "predictive_maintenance",
+        since_days: Optional[float] = None,
+        max_results: Optional[int] = 100,
+    ) -> List[Dict]:
+        """Get latest models from experiment, newest first."""
+        return [self._summary(run) for run in self.search_runs(
+            experiment_name, since_days=since_days, max_results=max_results)]
+    
+    def top_models(
+        self,
+        k: int = 10,
+        metric: str = "f1_score",
+        since_days: Optional[float] = 30,
+        algorithm: Optional[str] = None,
+        experiment_name: str = "predictive_maintenance",
+    ) -> List[Dict]:
+        """Best `k` finished runs by `metric` within the last `since_days` (all when None), best first."""
+        for name in (metric, algorithm):
+            if name is not None and not _SEARCH_NAME.match(name):
+                raise ValueError(f"Unsupported name in a run search: {name!r}")
+        filters = ["attributes.status = 'FINISHED'"]
+        if algorithm:
+            filters.append(f"params.algorithm = '{algorithm}'")
+        runs = self.search_runs(
+            experiment_name,
+            filters=filters,
+            order_by=[f"metrics.{metric} DESC", "attributes.start_time DESC"],
+            since_days=since_days,
+            max_results=k,
+        )
+        # Runs without the metric sort last; they are not candidates
+        return [self._summary(run) for run in runs if metric in run.data.metrics]
+    
+    def compare_models(self, since_days: Optional[float] = None):
+        """Compare the best finished models of the last `since_days` (all when None)."""
+        models = self.top_models(since_days=since_days)
         
         if not models:
             print("No models found")
@@ -53,14 +140,42 @@ class ModelEvaluator:
         df = pd.DataFrame(models)
         print(df[['algorithm', 'f1_score', 'precision', 'recall']].to_string(index=False))
         
-        # Find best model
-        best_model = max(models, key=lambda x: x.get('f1_score', 0))
+        # Best model first (ordered by the tracking server)
+        best_model = models[0]
         print(f"\n🏆 Best Model: {best_model['algorithm']} (F1={best_model['f1_score']:.3f})")
         
         return best_model
     
+    def compare_training_modes(self):
+        """Compare full retrains with incremental updates of the last 30 days, per algorithm."""
+        models = self.get_latest_models(since_days=30, max_results=None)
+        
+        if not models:
+            print("No models found")
+            return
+        
+        print("\n" + "="*80)
+        print("FULL vs INCREMENTAL TRAINING")
+        print("="*80)
+        
+        df = pd.DataFrame(models)
+        summary = df.groupby(['algorithm', 'training_mode']).agg(
+            runs=('run_id', 'count'),
+            f1_score=('f1_score', 'mean'),
+            anomaly_rate=('anomaly_rate', 'mean'),
+            training_seconds=('training_seconds', 'mean'),
+        ).reset_index()
+        print(summary.to_string(index=False))
+        
+        return summary
+    
     def load_model(self, run_id: str):
-        """Load model from MLflow."""
+        """Load model from MLflow, through the local artifact cache when enabled."""
+        if self.artifacts is not None:
+            model = mlflow.sklearn.load_model(self.artifacts.path(run_id, "model"))
+            scaler = mlflow.sklearn.load_model(self.artifacts.path(run_id, "scaler"))
+            return model, scaler
+        
         model_uri = f"runs:/{run_id}/model"
         model = mlflow.sklearn.load_model(model_uri)
         
@@ -113,8 +228,8 @@ class ModelEvaluator:
             print(f"📊 ROC curve saved to roc_curve.png (AUC={auc:.3f})")
     
     def register_best_model(self, model_name: str = "predictive_maintenance_model"):
-        """Register best model to MLflow Model Registry."""
-        best_model = self.compare_models()
+        """Register the best finished model of all time to MLflow Model Registry."""
+        best_model = self.compare_models(since_days=None)
         
         if not best_model:
             print("No models to register")
@@ -138,6 +253,7 @@ if __name__ == '__main__':
     
     # Compare all models
     best_model = evaluator.compare_models()
+    evaluator.compare_training_modes()
     
     # Register best model
     if best_model:
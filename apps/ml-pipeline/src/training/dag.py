@@ -0,0 +1,224 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import joblib
+import pandas as pd
+
+
+def _digest(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class Stage:
+    """
+    One step of a StageGraph: `fn(*dependency outputs)` produces the stage output.
+    `code` lists the functions/modules whose source defines the output; it is
+    part of the checkpoint key, so editing them invalidates the checkpoint.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        deps: Sequence[str] = (),
+        checkpoint: bool = True,
+        code: Iterable = (),
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.checkpoint = checkpoint
+        self.code_hash = _digest(*(inspect.getsource(obj) for obj in (fn, *code)))
+
+
+class CheckpointStore:
+    """
+    Content-addressed stage outputs under `directory`: `<stage>-<key>.parquet`
+    for DataFrames, `<stage>-<key>.joblib` for anything else. Files are written
+    to a temporary name and renamed, so a checkpoint either exists whole or not at all.
+
+    `_run.json` records the source key and fingerprint of the current run. A run
+    that did not complete is resumed by the next one started within
+    `resume_within` seconds with the same fingerprint, apart from the keys in
+    `resume_ignores` (e.g. a data watermark that moves on between attempts): it
+    reuses that source key, so every checkpoint the failed run wrote is still valid.
+    """
+
+    def __init__(self, directory: str, resume_within: float = 6 * 3600, resume_ignores: Sequence[str] = ()):
+        self.directory = directory
+        self.resume_within = resume_within
+        self.resume_ignores = frozenset(resume_ignores)
+        self.resumed = False
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, '_run.json')
+
+    def _manifest(self) -> Optional[Dict]:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def begin(self, fingerprint: Callable[[], Dict]) -> str:
+        """
+        Source key for this run: the unfinished previous run's if it had the same
+        fingerprint (up to `resume_ignores`), otherwise a hash of `fingerprint()`.
+        """
+        # As stored in the manifest, so both sides compare as JSON values
+        current = json.loads(json.dumps(fingerprint(), sort_keys=True, default=str))
+        manifest = self._manifest()
+        if (manifest is not None and manifest['status'] != 'completed'
+                and time.time() - manifest['started'] < self.resume_within
+                and self._same_inputs(manifest.get('fingerprint'), current)):
+            self.resumed = True
+            return manifest['source_key']
+        self.resumed = False
+        source_key = _digest(json.dumps(current, sort_keys=True))
+        self._write_manifest({'source_key': source_key, 'fingerprint': current,
+                              'status': 'running', 'started': time.time()})
+        return source_key
+
+    def _same_inputs(self, previous: Optional[Dict], current: Dict) -> bool:
+        if previous is None:
+            return False  # manifest written before fingerprints were recorded
+        keys = (set(previous) | set(current)) - self.resume_ignores
+        return all(previous.get(key) == current.get(key) for key in keys)
+
+    def finish(self, keys: Dict[str, str]):
+        """Mark the run completed and delete checkpoints superseded by `keys`."""
+        manifest = self._manifest() or {}
+        self._write_manifest(dict(manifest, status='completed', finished=time.time()))
+        for name, key in keys.items():
+            for path in glob.glob(os.path.join(self.directory, f'{name}-*')):
+                if not os.path.basename(path).startswith(f'{name}-{key}.'):
+                    os.unlink(path)
+
+    def find(self, name: str, key: str) -> Optional[str]:
+        for ext in ('parquet', 'joblib'):
+            path = os.path.join(self.directory, f'{name}-{key}.{ext}')
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load(self, path: str):
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path)
+        return joblib.load(path)
+
+    def save(self, name: str, key: str, value):
+        ext = 'parquet' if isinstance(value, pd.DataFrame) else 'joblib'
+        path = os.path.join(self.directory, f'{name}-{key}.{ext}')
+        tmp_path = path + '.tmp'
+        if ext == 'parquet':
+            value.to_parquet(tmp_path, index=False)
+        else:
+            joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+
+
+class StageGraph:
+    """
+    Runs stages as a DAG on up to `max_workers` threads: a stage starts as soon
+    as its dependencies are available, so independent stages run concurrently.
+
+    With a CheckpointStore, a stage's key is a hash of its name, code and the
+    keys of its dependencies, rooted at the run's source key. Stages with a
+    checkpoint under their key are loaded instead of run, and stages nobody
+    downstream needs anymore are not touched at all. When a stage fails, the
+    stages already running finish (and checkpoint) before the error is raised.
+    """
+
+    def __init__(self, stages: List[Stage], store: Optional[CheckpointStore] = None, max_workers: int = 2):
+        self.stages = {stage.name: stage for stage in stages}
+        self.store = store
+        self.max_workers = max_workers
+        self.stats: Dict[str, Dict[str, object]] = {}
+
+    def keys(self, source_key: str) -> Dict[str, str]:
+        keys: Dict[str, str] = {}
+        for stage in self.stages.values():  # stages are given in dependency order
+            keys[stage.name] = _digest(stage.name, stage.code_hash, source_key,
+                                       *(keys[dep] for dep in stage.deps))
+        return keys
+
+    def run(self, fingerprint: Callable[[], Dict] = dict) -> Dict[str, object]:
+        """Run every stage (or load its checkpoint) and return the outputs by stage name."""
+        source_key = self.store.begin(fingerprint) if self.store is not None else ''
+        keys = self.keys(source_key)
+
+        # Walk back from the leaves: load what is checkpointed, run what is not
+        checkpoints: Dict[str, str] = {}
+        needed = set()
+        for stage in reversed(list(self.stages.values())):
+            dependents = [other for other in self.stages.values() if stage.name in other.deps]
+            if dependents and not any(other.name in needed for other in dependents):
+                continue
+            path = self.store.find(stage.name, keys[stage.name]) if self.store is not None and stage.checkpoint else None
+            if path is not None:
+                checkpoints[stage.name] = path
+            else:
+                needed.add(stage.name)
+
+        for name in self.stages:
+            if name not in needed and name not in checkpoints:
+                self.stats[name] = {'status': 'not needed'}
+
+        outputs: Dict[str, object] = {}
+        for name, path in checkpoints.items():
+            started = time.perf_counter()
+            outputs[name] = self.store.load(path)
+            self.stats[name] = {'status': 'checkpoint', 'seconds': round(time.perf_counter() - started, 3)}
+
+        pending = [name for name in self.stages if name in needed]
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as executor:
+            while pending or running:
+                if error is None:
+                    for name in [name for name in pending if all(dep in outputs for dep in self.stages[name].deps)]:
+                        pending.remove(name)
+                        running[executor.submit(self._run_stage, name, keys[name], outputs)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except BaseException as e:
+                        self.stats[name] = {'status': 'failed', 'error': repr(e)}
+                        error = error or e
+        if error is not None:
+            raise error
+
+        if self.store is not None:
+            self.store.finish(keys)
+        return outputs
+
+    def _run_stage(self, name: str, key: str, outputs: Dict[str, object]):
+        stage = self.stages[name]
+        started = time.perf_counter()
+        value = stage.fn(*(outputs[dep] for dep in stage.deps))
+        if self.store is not None and stage.checkpoint:
+            self.store.save(name, key, value)
+        self.stats[name] = {'status': 'ran', 'seconds': round(time.perf_counter() - started, 3)}
+        return value
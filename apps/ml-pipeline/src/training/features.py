@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Raw metrics that get rolling/derivative features, in output column order
+METRICS = ['temperature', 'vibration', 'spindle_speed', 'power_consumption']
+
+
+def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rolling, derivative and interaction features for a long fleet frame with a
+    `machine_id` column and one row per (time, machine_id).
+
+    Every feature is computed for all machines in one groupby pass: windows
+    and diffs restart at each machine and follow the rows' existing order
+    within a machine. Output (values, column order, index) is identical to the
+    former per-machine masked loop.
+    """
+    features = df.copy()
+    metrics = [col for col in METRICS if col in df.columns]
+
+    if metrics and len(df):
+        # Work positionally so the result aligns regardless of the caller's index
+        values = df[metrics].reset_index(drop=True)
+        keys = df['machine_id'].reset_index(drop=True)
+        grouped = values.groupby(keys, sort=False, observed=True)
+
+        def per_row(frame: pd.DataFrame) -> pd.DataFrame:
+            # groupby().rolling() prepends the group key; rows with a NaN machine_id are
+            # left out like before and come back as NaN (filled with 0 below)
+            if frame.index.nlevels > 1:
+                frame = frame.droplevel(0)
+            return frame.reindex(values.index)
+
+        rolling_5 = grouped.rolling(window=5, min_periods=1)
+        rolling_30 = grouped.rolling(window=30, min_periods=1)
+        # pct_change pads gaps within each machine before dividing by the previous row
+        padded = grouped.ffill()
+        stats = {
+            'mean_5m': per_row(rolling_5.mean()),
+            'std_5m': per_row(rolling_5.std()).fillna(0),
+            'max_5m': per_row(rolling_5.max()),
+            'min_5m': per_row(rolling_5.min()),
+            'mean_30m': per_row(rolling_30.mean()),
+            'std_30m': per_row(rolling_30.std()).fillna(0),
+            'diff': per_row(grouped.diff()).fillna(0),
+            'pct_change': (padded / padded.groupby(keys, sort=False, observed=True).shift(1) - 1).fillna(0),
+        }
+        # Rows outside any group (NaN machine_id) stay NaN until the final fillna
+        outside = keys.isna().to_numpy()
+
+        new_columns = {}
+        for col in metrics:
+            for name, frame in stats.items():
+                # float32 input (chunked ingestion) keeps float32 features
+                column = frame[col].to_numpy(dtype=values[col].dtype, copy=True)
+                column[outside] = np.nan
+                new_columns[f'{col}_{name}'] = column
+        features = pd.concat(
+            [features, pd.DataFrame(new_columns, index=df.index)],
+            axis=1,
+        )
+
+    # Interaction features
+    if 'temperature' in features.columns and 'vibration' in features.columns:
+        features['temp_vibration_interaction'] = features['temperature'] * features['vibration']
+
+    if 'spindle_speed' in features.columns and 'power_consumption' in features.columns:
+        features['efficiency'] = features['power_consumption'] / (features['spindle_speed'] + 1)
+
+    # Categorical machine ids (chunked ingestion) cannot take 0 as a fill value
+    return features.fillna({col: 0 for col in features.columns
+                            if not isinstance(features[col].dtype, pd.CategoricalDtype)})
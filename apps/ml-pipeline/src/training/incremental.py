@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import mlflow
+import mlflow.sklearn
+import numpy as np
+import pandas as pd
+from mlflow.tracking import MlflowClient
+from sklearn.ensemble import IsolationForest
+
+# Per-tree state kept by sklearn forests, in tree order
+_PER_TREE_ATTRIBUTES = ('estimators_', 'estimators_features_', '_seeds',
+                        '_average_path_length_per_tree', '_decision_path_lengths')
+
+
+class PreviousRun:
+    """The model, scaler and training metadata of an earlier MLflow run."""
+
+    def __init__(self, run_id: str, model, scaler, params: Dict[str, str], metrics: Dict[str, float]):
+        self.run_id = run_id
+        self.model = model
+        self.scaler = scaler
+        self.params = params
+        self.metrics = metrics
+
+    def _timestamp(self, name: str) -> Optional[datetime]:
+        value = self.params.get(name)
+        return datetime.fromisoformat(value) if value else None
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Newest telemetry timestamp the model has been trained on."""
+        return self._timestamp('data_watermark')
+
+    @property
+    def last_full_retrain(self) -> Optional[datetime]:
+        return self._timestamp('last_full_retrain')
+
+
+def latest_run(
+    algorithm: str,
+    experiment_name: str = "predictive_maintenance",
+    registered_model: Optional[str] = None,
+) -> Optional[PreviousRun]:
+    """
+    Most recent finished run of `algorithm`. When `registered_model` has a version
+    trained with that algorithm, its run is used instead.
+    """
+    client = MlflowClient()
+    run = None
+    if registered_model:
+        versions = client.search_model_versions(f"name='{registered_model}'")
+        for version in sorted(versions, key=lambda v: int(v.version), reverse=True):
+            candidate = client.get_run(version.run_id)
+            if candidate.data.params.get('algorithm') == algorithm:
+                run = candidate
+                break
+
+    if run is None:
+        experiment = mlflow.get_experiment_by_name(experiment_name)
+        if experiment is None:
+            return None
+        runs = client.search_runs(
+            [experiment.experiment_id],
+            filter_string=f"params.algorithm = '{algorithm}' and attributes.status = 'FINISHED'",
+            order_by=['attributes.start_time DESC'],
+            max_results=1,
+        )
+        if not runs:
+            return None
+        run = runs[0]
+
+    run_id = run.info.run_id
+    return PreviousRun(
+        run_id,
+        mlflow.sklearn.load_model(f"runs:/{run_id}/model"),
+        mlflow.sklearn.load_model(f"runs:/{run_id}/scaler"),
+        dict(run.data.params),
+        dict(run.data.metrics),
+    )
+
+
+def slide_forest(model, X: np.ndarray, y=None, n_new: int = 1):
+    """
+    Sliding-window update of a fitted sklearn forest, in place: fit `n_new` trees
+    on (X, y) with warm_start, then drop as many of the oldest trees so the
+    forest keeps its size. IsolationForest's decision offset is recomputed on X.
+    """
+    n_trees = len(model.estimators_)
+    model.set_params(warm_start=True, n_estimators=n_trees + n_new)
+    if y is None:
+        model.fit(X)
+    else:
+        model.fit(X, y)
+
+    drop = len(model.estimators_) - n_trees
+    for attribute in _PER_TREE_ATTRIBUTES:
+        if hasattr(model, attribute):
+            setattr(model, attribute, getattr(model, attribute)[drop:])
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+
+    if isinstance(model, IsolationForest) and model.contamination != 'auto':
+        # fit() set the offset with the retired trees still in the ensemble
+        model.offset_ = np.percentile(model.score_samples(X), 100.0 * model.contamination)
+    return model
+
+
+class IncrementalPolicy:
+    """
+    Decides between an incremental update and a full retrain.
+
+    Full retrains happen when there is no usable previous run, every
+    `full_retrain_days`, when the feature set changed, or when the previous
+    model's quality on the new data has degraded beyond the given tolerances.
+    Otherwise each run replaces n_estimators * new_days / window_days trees.
+    """
+
+    def __init__(
+        self,
+        full_retrain_days: float = 7.0,
+        window_days: float = 30.0,
+        max_anomaly_rate_drift: float = 0.05,
+        max_f1_drop: float = 0.05,
+    ):
+        self.full_retrain_days = full_retrain_days
+        self.window_days = window_days
+        self.max_anomaly_rate_drift = max_anomaly_rate_drift
+        self.max_f1_drop = max_f1_drop
+
+    def full_retrain_reason(self, previous: Optional[PreviousRun], columns: List[str]) -> Optional[str]:
+        """Reason a full retrain is required before looking at model quality, or None."""
+        if previous is None:
+            return "no previous model"
+        if previous.watermark is None or previous.last_full_retrain is None:
+            return "previous run has no data watermark"
+        now = datetime.now(timezone.utc)
+        if now - previous.last_full_retrain >= timedelta(days=self.full_retrain_days):
+            return f"last full retrain over {self.full_retrain_days:g} days ago"
+        if now - previous.watermark >= timedelta(days=self.window_days):
+            return "previous model is older than the training window"
+        expected = getattr(previous.scaler, 'feature_names_in_', None)
+        if expected is None or list(expected) != list(columns):
+            return "feature set changed"
+        return None
+
+    def n_new_trees(self, model, previous: PreviousRun, newest: datetime) -> int:
+        new_days = max((newest - previous.watermark).total_seconds() / 86400.0, 0.0)
+        n_trees = len(model.estimators_)
+        return min(n_trees, max(1, round(n_trees * new_days / self.window_days)))
+
+    def anomaly_rate_degraded(self, rate: float, contamination: float) -> bool:
+        return abs(rate - contamination) > self.max_anomaly_rate_drift
+
+    def f1_degraded(self, f1: float, previous: PreviousRun) -> bool:
+        baseline = previous.metrics.get('f1_score')
+        return baseline is not None and baseline - f1 > self.max_f1_drop
+
+
+def data_watermark(times: pd.Series) -> datetime:
+    """Newest timestamp of a training frame's `time` column (datetimes or int64 epoch ns)."""
+    return pd.to_datetime(times, utc=True).max().to_pydatetime()
@@ -0,0 +1,185 @@
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """Restart peak RSS tracking so repeated runs in one process report their own peak (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def fill_gaps(frame: pd.DataFrame, metrics: List[str]):
+    """In place: forward-fill each metric column in row order, then 0, keeping float32."""
+    for metric in metrics:
+        frame[metric] = frame[metric].ffill().fillna(0).to_numpy(dtype=np.float32)
+
+
+# Keys of telemetry_fingerprint, all of which move on as new telemetry arrives
+TELEMETRY_FINGERPRINT_KEYS = ('watermark', 'rows', 'machines', 'metrics')
+
+
+def telemetry_fingerprint(conn, days: int = 30) -> Dict[str, object]:
+    """Watermark and volume of the telemetry a training run would read."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT max(time), count(*), count(DISTINCT machine_id), count(DISTINCT metric_name)
+            FROM machine_telemetry
+            WHERE time > NOW() - INTERVAL '%s days'
+        """, (days,))
+        watermark, rows, machines, metrics = cursor.fetchone()
+    finally:
+        cursor.close()
+    return {
+        'watermark': watermark.isoformat() if watermark is not None else None,
+        'rows': rows,
+        'machines': machines,
+        'metrics': metrics,
+    }
+
+
+class ChunkedTelemetryReader:
+    """
+    Low-memory loader for the wide training frame.
+
+    Streams long-format rows through a server-side cursor `chunk_rows` at a time
+    and pivots each chunk straight into compact columns: int64 epoch-nanosecond
+    `time`, categorical `machine_id` and one float32 column per metric. Only the
+    columnar pieces are kept, so the full long-format frame never exists. Rows
+    sharing the chunk's last timestamp are carried into the next chunk, so a
+    (time, machine_id) row is never split across chunks.
+
+    Row order, duplicate averaging and fill semantics follow the pandas path
+    (pivot_table sorted by time then machine_id, ffill, then 0).
+    """
+
+    def __init__(self, chunk_rows: int = 200_000):
+        self.chunk_rows = chunk_rows
+        self.stats: Dict[str, float] = {}
+
+    def read(self, conn, days: int = 30, since: Optional[datetime] = None, fill: bool = True) -> pd.DataFrame:
+        """
+        Read the last `days` of telemetry, or everything from `since` on when given.
+        With fill=False metric gaps stay NaN (for callers that fill after merging).
+        """
+        reset_peak_rss()
+        started = time.perf_counter()
+
+        machines: Dict[str, int] = {}  # machine_id -> category code, in order of appearance
+        times: List[np.ndarray] = []
+        codes: List[np.ndarray] = []
+        values: Dict[str, List[np.ndarray]] = {}  # metric -> per-chunk float32 columns
+        lengths: List[int] = []
+        n_rows = n_chunks = 0
+
+        cursor = conn.cursor(name='training_data_stream')
+        cursor.itersize = self.chunk_rows
+        try:
+            cursor.execute("""
+                SELECT
+                    time,
+                    machine_id,
+                    metric_name,
+                    value
+                FROM machine_telemetry
+                WHERE (%s::timestamptz IS NULL AND time > NOW() - INTERVAL '%s days')
+                   OR time >= %s::timestamptz
+                ORDER BY time ASC
+            """, (since, days, since))
+
+            carry: List[tuple] = []
+            while True:
+                rows = cursor.fetchmany(self.chunk_rows)
+                n_rows += len(rows)
+                if rows:
+                    rows = carry + rows
+                    # Hold back the last timestamp; more of its rows may be in the next chunk
+                    boundary = rows[-1][0]
+                    split = len(rows)
+                    while split > 0 and rows[split - 1][0] == boundary:
+                        split -= 1
+                    rows, carry = rows[:split], rows[split:]
+                else:
+                    rows, carry = carry, []
+                if rows:
+                    n_chunks += 1
+                    self._pivot_chunk(rows, machines, times, codes, values, lengths)
+                elif not carry:
+                    break
+        finally:
+            cursor.close()
+
+        if not lengths:
+            self.stats = {'rows': 0, 'chunks': 0, 'seconds': round(time.perf_counter() - started, 3),
+                          'peak_rss_mb': round(peak_rss_mb(), 1)}
+            return pd.DataFrame()
+
+        frame = pd.DataFrame({
+            'time': np.concatenate(times),
+            'machine_id': pd.Categorical.from_codes(np.concatenate(codes), categories=list(machines)),
+        })
+        times.clear()
+        codes.clear()
+        metrics = sorted(values)
+        for metric in metrics:
+            # Metrics first seen in a later chunk are NaN for the earlier ones
+            parts = [part if part is not None else np.full(length, np.nan, dtype=np.float32)
+                     for part, length in zip(values.pop(metric), lengths)]
+            frame[metric] = np.concatenate(parts)
+        if fill:
+            fill_gaps(frame, metrics)
+
+        self.stats = {
+            'rows': n_rows,
+            'chunks': n_chunks,
+            'samples': len(frame),
+            'machines': len(machines),
+            'metrics': frame.shape[1] - 2,
+            'frame_mb': round(float(frame.memory_usage(deep=True).sum()) / (1024 * 1024), 1),
+            'seconds': round(time.perf_counter() - started, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        return frame
+
+    @staticmethod
+    def _pivot_chunk(rows, machines, times, codes, values, lengths):
+        chunk = pd.DataFrame(rows, columns=['time', 'machine_id', 'metric_name', 'value'])
+        chunk['value'] = chunk['value'].astype(np.float32)
+        wide = chunk.pivot_table(index=['time', 'machine_id'], columns='metric_name',
+                                 values='value', aggfunc='mean')
+        del chunk
+
+        chunk_times = wide.index.get_level_values('time')
+        if chunk_times.tz is None:
+            chunk_times = chunk_times.tz_localize('UTC')
+        times.append(chunk_times.tz_convert('UTC').asi8.copy())
+
+        chunk_machines = wide.index.get_level_values('machine_id')
+        for machine_id in chunk_machines.unique():
+            machines.setdefault(machine_id, len(machines))
+        codes.append(pd.Index(list(machines)).get_indexer(chunk_machines).astype(np.int32))
+
+        for metric in wide.columns:
+            if metric not in values:
+                values[metric] = [None] * len(lengths)
+            values[metric].append(wide[metric].to_numpy(dtype=np.float32))
+        for metric, parts in values.items():
+            if len(parts) == len(lengths):
+                parts.append(None)
+        lengths.append(len(wide))
@@ -0,0 +1,191 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+# Bundle format shared with the ai-service ModelStore
+MODEL_SET_FORMAT = 1
+CURRENT_FILE = 'CURRENT'
+
+# Per-process view of the shared arrays, opened once by _init_worker
+_worker_data: Dict[str, object] = {}
+
+
+def machine_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The ai-service engine's per-machine features, in the same column order:
+    raw metrics, 5-sample mean/std/max per metric, then one diff per metric.
+    benchmarks/parity_ai_service.py fails if the two diverge.
+    """
+    features = df.copy()
+    for col in df.columns:
+        rolling = df[col].rolling(window=5, min_periods=1)
+        features[f'{col}_mean_5m'] = rolling.mean()
+        features[f'{col}_std_5m'] = rolling.std().fillna(0)
+        features[f'{col}_max_5m'] = rolling.max()
+    for col in df.columns:
+        features[f'{col}_diff'] = df[col].diff().fillna(0)
+    return features.fillna(0)
+
+
+def drift_reference(X: np.ndarray, columns: List[str], n_bins: int = 10) -> Dict[str, object]:
+    """
+    Training distribution of every feature as a `n_bins` quantile histogram, the
+    reference the ai-service's drift monitors compare scored rows against.
+    Must match drift_reference in the ai-service's drift.py, which
+    benchmarks/parity_ai_service.py checks.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    edges = np.quantile(X, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+    expected = np.empty((X.shape[1], n_bins))
+    for i in range(X.shape[1]):
+        bins = np.searchsorted(edges[i], X[:, i], side='right')
+        expected[i] = np.bincount(bins, minlength=n_bins) / len(X)
+    return {'columns': list(columns), 'edges': edges, 'expected': expected}
+
+
+def _init_worker(data_dir: str):
+    _worker_data['values'] = np.load(os.path.join(data_dir, 'values.npy'), mmap_mode='r')
+    with open(os.path.join(data_dir, 'metrics.json')) as f:
+        _worker_data['metrics'] = json.load(f)
+
+
+def _train_machine(machine_id: str, start: int, stop: int, contamination: float, min_rows: int):
+    """
+    Process-pool task: fit one machine's scaler and IsolationForest on rows
+    [start, stop) of the shared memory-mapped value matrix.
+    Returns (machine_id, model, scaler, drift reference, n_rows); all but the
+    row count are None when the machine has fewer than `min_rows` samples.
+    """
+    rows = np.asarray(_worker_data['values'][start:stop], dtype=np.float64)
+    if len(rows) < min_rows:
+        return machine_id, None, None, None, len(rows)
+
+    # Like the ai-service's per-machine pivot: only the metrics this machine reported
+    df = pd.DataFrame(rows, columns=_worker_data['metrics'])
+    df = df.loc[:, df.notna().any()].ffill().fillna(0)
+
+    features = machine_features(df)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(features)
+    model = IsolationForest(contamination=contamination, random_state=42, n_estimators=100)
+    model.fit(X_scaled)
+    return machine_id, model, scaler, drift_reference(features.values, list(features.columns)), len(rows)
+
+
+def train_machine_models(
+    frame: pd.DataFrame,
+    contamination: float = 0.1,
+    n_workers: Optional[int] = None,
+    min_rows: int = 100,
+) -> Tuple[Dict[str, Tuple[IsolationForest, StandardScaler, Dict[str, object]]], Dict[str, object]]:
+    """
+    Train one IsolationForest per machine over the whole fleet in a process pool.
+
+    `frame` is the unfilled training frame (time, categorical machine_id, float32
+    metrics with NaN gaps) sorted by time. Rows are regrouped by machine into one
+    contiguous float32 matrix that is saved once and memory-mapped by every
+    worker, so a task only carries (machine_id, start, stop) instead of a
+    pickled frame. Gaps are filled per machine, so no value leaks between them.
+
+    Returns ({machine_id: (model, scaler, drift reference)}, stats).
+    """
+    started = time.perf_counter()
+    metrics = [col for col in frame.columns if col not in ('time', 'machine_id')]
+    machine_ids = frame['machine_id'].astype('category')
+    codes = machine_ids.cat.codes.to_numpy()
+    order = np.argsort(codes, kind='stable')  # stable: each machine keeps its time order
+    bounds = np.searchsorted(codes[order], np.arange(len(machine_ids.cat.categories) + 1))
+    n_workers = n_workers or os.cpu_count() or 1
+
+    models: Dict[str, Tuple[IsolationForest, StandardScaler, Dict[str, object]]] = {}
+    skipped: List[str] = []
+    work_dir = tempfile.mkdtemp(prefix='machine_models_')
+    try:
+        np.save(os.path.join(work_dir, 'values.npy'),
+                np.ascontiguousarray(frame[metrics].to_numpy(dtype=np.float32)[order]))
+        with open(os.path.join(work_dir, 'metrics.json'), 'w') as f:
+            json.dump(metrics, f)
+        del order
+
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(work_dir,),
+        ) as executor:
+            futures = [
+                executor.submit(_train_machine, str(machine_id), int(start), int(stop), contamination, min_rows)
+                for machine_id, start, stop in zip(machine_ids.cat.categories, bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            for future in as_completed(futures):
+                machine_id, model, scaler, reference, _ = future.result()
+                if model is None:
+                    skipped.append(machine_id)
+                else:
+                    models[machine_id] = (model, scaler, reference)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = {
+        'machines': len(models),
+        'skipped': sorted(skipped),
+        'samples': len(frame),
+        'workers': n_workers,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    return models, stats
+
+
+def publish_model_set(
+    models: Dict[str, Tuple[IsolationForest, StandardScaler, Dict[str, object]]],
+    directory: str,
+    keep: int = 3,
+) -> str:
+    """
+    Write the models as one versioned bundle, `model-set-<version>.joblib`, and
+    point `CURRENT` at it. The bundle is uncompressed, so the ai-service loads it
+    in one read without decompressing. `CURRENT` is replaced last and atomically, so readers
+    see either the previous set or the new one. Only the newest `keep` bundles are kept.
+
+    Returns the bundle path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    trained_at = datetime.now(timezone.utc)
+    version = trained_at.strftime('%Y%m%dT%H%M%S%fZ')
+    filename = f'model-set-{version}.joblib'
+    path = os.path.join(directory, filename)
+
+    tmp_path = path + '.tmp'
+    joblib.dump({
+        'format': MODEL_SET_FORMAT,
+        'version': version,
+        'trained_at': trained_at.isoformat(),
+        'models': {machine_id: {'model': model, 'scaler': scaler, 'reference': reference}
+                   for machine_id, (model, scaler, reference) in models.items()},
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+    current_tmp = os.path.join(directory, CURRENT_FILE + '.tmp')
+    with open(current_tmp, 'w') as f:
+        json.dump({'version': version, 'file': filename, 'machines': len(models),
+                   'trained_at': trained_at.isoformat()}, f)
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    bundles = sorted(name for name in os.listdir(directory)
+                     if name.startswith('model-set-') and name.endswith('.joblib'))
+    for name in bundles[:-keep]:
+        os.unlink(os.path.join(directory, name))
+    return path
@@ -4,14 +4,41 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import precision_score, recall_score, f1_score
 import psycopg2
-from datetime import datetime, timedelta
-import optuna
-from typing import Dict, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
 import joblib
 import os
+import threading
+import time
+from contextlib import contextmanager
+import training.features
+import training.incremental
+import training.ingestion
+import training.snapshot
+import training.sql_features
+import training.tuning
+from training.dag import CheckpointStore, Stage, StageGraph
+from training.features import engineer_features
+from training.incremental import IncrementalPolicy, PreviousRun, data_watermark, latest_run, slide_forest
+from training.ingestion import TELEMETRY_FINGERPRINT_KEYS, ChunkedTelemetryReader, peak_rss_mb, telemetry_fingerprint
+from training.machine_models import publish_model_set, train_machine_models
+from training.snapshot import TelemetrySnapshotCache
+from training.sql_features import SqlFeatureReader, create_continuous_aggregate, refresh_continuous_aggregate
+from training.tuning import TUNED_PARAMS, tune_random_forest
+
+# History used by the fleet-wide models; the snapshot cache always keeps at least this much
+TRAINING_WINDOW_DAYS = 30
+
+# Registered model holding the per-machine model sets served by the ai-service
+MACHINE_MODELS_REGISTRY_NAME = "machine_anomaly_models"
+
+# Serializes MLflow runs of concurrently trained models (see MLPipeline._mlflow_run)
+_MLFLOW_LOCK = threading.Lock()
+
+class InsufficientData(Exception):
+    pass
 
 class MLPipeline:
     """
@@ -19,16 +46,83 @@ class MLPipeline:
     Supports hyperparameter tuning with Optuna.
     """
     
-    def __init__(self, db_config: Dict[str, str], mlflow_uri: str = "http://localhost:5000"):
+    def __init__(
+        self,
+        db_config: Dict[str, str],
+        mlflow_uri: str = "http://localhost:5000",
+        pool=None,
+        chunk_rows: Optional[int] = 200_000,
+        snapshot_dir: Optional[str] = None,
+        tuning_trials: int = 20,
+        tuning_timeout: Optional[float] = None,
+        tuning_workers: Optional[int] = None,
+        incremental: bool = True,
+        full_retrain_days: float = 7.0,
+        checkpoint_dir: Optional[str] = None,
+        stage_workers: int = 2,
+        feature_backend: str = 'pandas',
+        feature_bucket: Optional[str] = None,
+    ):
+        if feature_backend not in ('pandas', 'sql'):
+            raise ValueError(f"Unknown feature backend {feature_backend!r}")
         self.db_config = db_config
+        # Optional shared connection pool (e.g. the ai-service ConnectionPool):
+        # anything with getconn() whose connections return to the pool on close()
+        self.pool = pool
+        # Stream training data in typed chunks; None loads it in one pandas frame
+        self.chunk_rows = chunk_rows
+        # Local Parquet snapshot: only days past its watermark are fetched from the database
+        self.snapshot = TelemetrySnapshotCache(snapshot_dir, chunk_rows=chunk_rows or 200_000) if snapshot_dir else None
+        self.ingestion_stats: Dict[str, float] = {}
+        # Optuna search budget: trial cap, wall-clock seconds per worker, worker processes
+        self.tuning_trials = tuning_trials
+        self.tuning_timeout = tuning_timeout
+        self.tuning_workers = tuning_workers
+        # Update the previous models with new data only; full retrain every full_retrain_days
+        self.incremental = IncrementalPolicy(full_retrain_days=full_retrain_days) if incremental else None
+        # Stage outputs are checkpointed here, so a failed run resumes where it stopped, unless
+        # its settings (incremental, feature relation) changed; newer telemetry does not prevent it
+        self.checkpoints = (CheckpointStore(checkpoint_dir, resume_ignores=TELEMETRY_FINGERPRINT_KEYS)
+                            if checkpoint_dir else None)
+        self.stage_workers = stage_workers
+        # 'sql' computes the fleet feature matrix in TimescaleDB (training.sql_features) instead of
+        # fetching raw telemetry; with a bucket such as '1 minute' it reads a continuous aggregate
+        self.feature_backend = feature_backend
+        self.feature_bucket = feature_bucket
         mlflow.set_tracking_uri(mlflow_uri)
         mlflow.set_experiment("predictive_maintenance")
         
     def get_connection(self):
+        if self.pool is not None:
+            return self.pool.getconn()
         return psycopg2.connect(**self.db_config)
     
-    def fetch_training_data(self, days: int = 30) -> pd.DataFrame:
-        """Fetch historical telemetry data for training."""
+    def fetch_training_data(self, days: int = TRAINING_WINDOW_DAYS, fill: bool = True) -> pd.DataFrame:
+        """
+        Fetch historical telemetry data for training.
+        With chunk_rows set, rows are streamed through a server-side cursor into
+        int64 `time`, categorical `machine_id` and float32 metric columns.
+        With a snapshot directory, the snapshot is refreshed and read instead.
+        With fill=False metric gaps are left as NaN.
+        """
+        if self.snapshot is not None:
+            conn = self.get_connection()
+            try:
+                self.ingestion_stats = self.snapshot.refresh(conn, days=max(days, TRAINING_WINDOW_DAYS))
+            finally:
+                conn.close()
+            return self.snapshot.read(days=days, fill=fill)
+        
+        if self.chunk_rows:
+            reader = ChunkedTelemetryReader(chunk_rows=self.chunk_rows)
+            conn = self.get_connection()
+            try:
+                df = reader.read(conn, days=days, fill=fill)
+            finally:
+                conn.close()
+            self.ingestion_stats = reader.stats
+            return df
+        
         conn = self.get_connection()
         try:
             query = """
@@ -50,46 +144,16 @@ class MLPipeline:
                     columns='metric_name', 
                     values='value'
                 ).reset_index()
-                df_pivot = df_pivot.fillna(method='ffill').fillna(0)
+                if fill:
+                    df_pivot = df_pivot.fillna(method='ffill').fillna(0)
                 return df_pivot
             return pd.DataFrame()
         finally:
             conn.close()
     
     def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create advanced features from raw telemetry."""
-        features = df.copy()
-        
-        # Group by machine
-        for machine_id in df['machine_id'].unique():
-            mask = df['machine_id'] == machine_id
-            machine_df = df[mask].copy()
-            
-            # Rolling statistics
-            for col in ['temperature', 'vibration', 'spindle_speed', 'power_consumption']:
-                if col in machine_df.columns:
-                    # 5-minute rolling
-                    features.loc[mask, f'{col}_mean_5m'] = machine_df[col].rolling(window=5, min_periods=1).mean()
-                    features.loc[mask, f'{col}_std_5m'] = machine_df[col].rolling(window=5, min_periods=1).std().fillna(0)
-                    features.loc[mask, f'{col}_max_5m'] = machine_df[col].rolling(window=5, min_periods=1).max()
-                    features.loc[mask, f'{col}_min_5m'] = machine_df[col].rolling(window=5, min_periods=1).min()
-                    
-                    # 30-minute rolling
-                    features.loc[mask, f'{col}_mean_30m'] = machine_df[col].rolling(window=30, min_periods=1).mean()
-                    features.loc[mask, f'{col}_std_30m'] = machine_df[col].rolling(window=30, min_periods=1).std().fillna(0)
-                    
-                    # Rate of change
-                    features.loc[mask, f'{col}_diff'] = machine_df[col].diff().fillna(0)
-                    features.loc[mask, f'{col}_pct_change'] = machine_df[col].pct_change().fillna(0)
-        
-        # Interaction features
-        if 'temperature' in features.columns and 'vibration' in features.columns:
-            features['temp_vibration_interaction'] = features['temperature'] * features['vibration']
-        
-        if 'spindle_speed' in features.columns and 'power_consumption' in features.columns:
-            features['efficiency'] = features['power_consumption'] / (features['spindle_speed'] + 1)
-        
-        return features.fillna(0)
+        """Create advanced features from raw telemetry (see training.features)."""
+        return engineer_features(df)
     
     def create_labels(self, df: pd.DataFrame) -> pd.Series:
         """Create failure labels based on thresholds."""
@@ -101,38 +165,47 @@ class MLPipeline:
         )
         return failures.astype(int)
     
-    def train_isolation_forest(self, X: pd.DataFrame, contamination: float = 0.1) -> Tuple[IsolationForest, StandardScaler]:
+    def train_isolation_forest(
+        self,
+        X: pd.DataFrame,
+        contamination: float = 0.1,
+        watermark: Optional[datetime] = None,
+    ) -> Tuple[IsolationForest, StandardScaler]:
         """Train Isolation Forest model."""
-        with mlflow.start_run(run_name="isolation_forest"):
+        started = time.perf_counter()
+        # Scale features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        
+        # Train model
+        model = IsolationForest(
+            contamination=contamination,
+            random_state=42,
+            n_estimators=100,
+            max_samples='auto',
+            n_jobs=-1
+        )
+        model.fit(X_scaled)
+        
+        # Evaluate
+        predictions = model.predict(X_scaled)
+        anomaly_scores = model.score_samples(X_scaled)
+        n_anomalies = (predictions == -1).sum()
+        training_seconds = time.perf_counter() - started
+        
+        with self._mlflow_run("isolation_forest"):
             # Log parameters
             mlflow.log_param("algorithm", "IsolationForest")
             mlflow.log_param("contamination", contamination)
             mlflow.log_param("n_estimators", 100)
             mlflow.log_param("n_features", X.shape[1])
-            
-            # Scale features
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-            
-            # Train model
-            model = IsolationForest(
-                contamination=contamination,
-                random_state=42,
-                n_estimators=100,
-                max_samples='auto',
-                n_jobs=-1
-            )
-            model.fit(X_scaled)
-            
-            # Evaluate
-            predictions = model.predict(X_scaled)
-            anomaly_scores = model.score_samples(X_scaled)
+            self._log_training_mode("full", watermark)
             
             # Log metrics
-            n_anomalies = (predictions == -1).sum()
             mlflow.log_metric("n_anomalies", n_anomalies)
             mlflow.log_metric("anomaly_rate", n_anomalies / len(predictions))
             mlflow.log_metric("mean_anomaly_score", anomaly_scores.mean())
+            mlflow.log_metric("training_seconds", training_seconds)
             
             # Log model
             mlflow.sklearn.log_model(model, "model")
@@ -142,64 +215,56 @@ class MLPipeline:
             
             return model, scaler
     
-    def train_random_forest(self, X: pd.DataFrame, y: pd.Series) -> Tuple[RandomForestClassifier, StandardScaler]:
+    def train_random_forest(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        watermark: Optional[datetime] = None,
+    ) -> Tuple[RandomForestClassifier, StandardScaler]:
         """Train Random Forest classifier with Optuna hyperparameter tuning."""
+        started = time.perf_counter()
+        # Hyperparameter tuning: shared split, parallel workers, median pruning
+        best_params, search = tune_random_forest(
+            X, y,
+            n_trials=self.tuning_trials,
+            timeout=self.tuning_timeout,
+            n_workers=self.tuning_workers,
+        )
+        print(f"   Optuna: {search['complete']} complete, {search['pruned']} pruned "
+              f"in {search['seconds']}s on {search['workers']} workers")
+        if search['best_f1'] is None:
+            print("   Optuna: no trial completed within the timeout, using the default parameters")
         
-        def objective(trial):
-            params = {
-                'n_estimators': trial.suggest_int('n_estimators', 50, 300),
-                'max_depth': trial.suggest_int('max_depth', 3, 20),
-                'min_samples_split': trial.suggest_int('min_samples_split', 2, 20),
-                'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 10),
-                'max_features': trial.suggest_categorical('max_features', ['sqrt', 'log2']),
-            }
-            
-            # Split data
-            X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Scale
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_val_scaled = scaler.transform(X_val)
-            
-            # Train
-            model = RandomForestClassifier(**params, random_state=42, n_jobs=-1)
-            model.fit(X_train_scaled, y_train)
-            
-            # Evaluate
-            y_pred = model.predict(X_val_scaled)
-            f1 = f1_score(y_val, y_pred)
-            
-            return f1
+        # Train final model with best params
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
-        # Hyperparameter tuning
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=20, show_progress_bar=True)
+        model = RandomForestClassifier(**best_params, random_state=42, n_jobs=-1)
+        model.fit(X_scaled, y)
         
-        best_params = study.best_params
+        # Evaluate
+        y_pred = model.predict(X_scaled)
+        precision = precision_score(y, y_pred)
+        recall = recall_score(y, y_pred)
+        f1 = f1_score(y, y_pred)
+        training_seconds = time.perf_counter() - started
         
-        with mlflow.start_run(run_name="random_forest"):
+        with self._mlflow_run("random_forest"):
             # Log best parameters
             mlflow.log_params(best_params)
             mlflow.log_param("algorithm", "RandomForest")
-            
-            # Train final model with best params
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-            
-            model = RandomForestClassifier(**best_params, random_state=42, n_jobs=-1)
-            model.fit(X_scaled, y)
-            
-            # Evaluate
-            y_pred = model.predict(X_scaled)
-            precision = precision_score(y, y_pred)
-            recall = recall_score(y, y_pred)
-            f1 = f1_score(y, y_pred)
+            self._log_training_mode("full", watermark)
+            mlflow.log_metric("tuning_trials", search['trials'])
+            mlflow.log_metric("tuning_pruned_trials", search['pruned'])
+            mlflow.log_metric("tuning_seconds", search['seconds'])
+            if search['best_f1'] is not None:
+                mlflow.log_metric("tuning_best_val_f1", search['best_f1'])
             
             # Log metrics
             mlflow.log_metric("precision", precision)
             mlflow.log_metric("recall", recall)
             mlflow.log_metric("f1_score", f1)
+            mlflow.log_metric("training_seconds", training_seconds)
             
             # Feature importance
             feature_importance = pd.DataFrame({
@@ -217,45 +282,360 @@ class MLPipeline:
             
             return model, scaler
     
-    def run_pipeline(self):
-        """Execute full training pipeline."""
-        print("🚀 Starting ML Pipeline...")
+    @contextmanager
+    def _mlflow_run(self, run_name: str):
+        """
+        MLflow run for one training stage. MLflow's fluent API keeps a single
+        active run per process, so concurrent stages fit first and log one at a time.
+        """
+        with _MLFLOW_LOCK, mlflow.start_run(run_name=run_name) as run:
+            yield run
+    
+    def _log_training_mode(self, mode: str, watermark: Optional[datetime], previous: Optional[PreviousRun] = None):
+        """Tag a run as a full or incremental training and record what incremental updates build on."""
+        mlflow.log_param("training_mode", mode)
+        if watermark is not None:
+            mlflow.log_param("data_watermark", watermark.isoformat())
+        if previous is None:
+            mlflow.log_param("last_full_retrain", datetime.now(timezone.utc).isoformat())
+        else:
+            mlflow.log_param("base_run_id", previous.run_id)
+            mlflow.log_param("last_full_retrain", previous.params['last_full_retrain'])
+    
+    def _previous_run(self, algorithm: str, columns, registered_model: Optional[str] = None) -> Optional[PreviousRun]:
+        """Previous run to update incrementally, or None when a full retrain is due."""
+        if self.incremental is None:
+            return None
+        try:
+            previous = latest_run(algorithm, registered_model=registered_model)
+        except Exception as e:
+            print(f"   Full retrain: previous {algorithm} run could not be loaded ({e})")
+            return None
+        reason = self.incremental.full_retrain_reason(previous, list(columns))
+        if reason:
+            print(f"   Full retrain: {reason}")
+            return None
+        return previous
+    
+    def update_isolation_forest(
+        self,
+        previous: PreviousRun,
+        X: pd.DataFrame,
+        times: pd.Series,
+        watermark: datetime,
+    ) -> Optional[Tuple[IsolationForest, StandardScaler]]:
+        """
+        Incremental Isolation Forest update: trees fitted on the rows newer than
+        the previous run's data watermark replace its oldest trees. The previous
+        scaler is kept as-is until the next full retrain.
+        Returns None when the previous model's anomaly rate on the new rows
+        drifted, so the caller falls back to a full retrain.
+        """
+        started = time.perf_counter()
+        model, scaler = previous.model, previous.scaler
+        new_rows = (times > previous.watermark).to_numpy()
+        if not new_rows.any():
+            print("✅ Isolation Forest up to date: no rows newer than the previous model")
+            return model, scaler
+        
+        X_new = scaler.transform(X[new_rows])
+        pre_update_rate = float((model.predict(X_new) == -1).mean())
+        if self.incremental.anomaly_rate_degraded(pre_update_rate, model.contamination):
+            print(f"   Full retrain: anomaly rate on new data drifted to {pre_update_rate:.1%}")
+            return None
+        
+        n_new = self.incremental.n_new_trees(model, previous, watermark)
+        slide_forest(model, X_new, n_new=n_new)
+        
+        # Evaluate on the new rows
+        predictions = model.predict(X_new)
+        anomaly_scores = model.score_samples(X_new)
+        n_anomalies = (predictions == -1).sum()
+        training_seconds = time.perf_counter() - started
+        
+        with self._mlflow_run("isolation_forest"):
+            mlflow.log_param("algorithm", "IsolationForest")
+            mlflow.log_param("contamination", model.contamination)
+            mlflow.log_param("n_estimators", len(model.estimators_))
+            mlflow.log_param("n_features", X.shape[1])
+            self._log_training_mode("incremental", watermark, previous)
+            
+            mlflow.log_metric("n_anomalies", n_anomalies)
+            mlflow.log_metric("anomaly_rate", n_anomalies / len(predictions))
+            mlflow.log_metric("mean_anomaly_score", anomaly_scores.mean())
+            mlflow.log_metric("pre_update_anomaly_rate", pre_update_rate)
+            mlflow.log_metric("n_new_trees", n_new)
+            mlflow.log_metric("n_retired_trees", n_new)
+            mlflow.log_metric("rows_trained", len(X_new))
+            mlflow.log_metric("training_seconds", training_seconds)
+            
+            mlflow.sklearn.log_model(model, "model")
+            mlflow.sklearn.log_model(scaler, "scaler")
+            
+            print(f"✅ Isolation Forest updated: {n_new} trees replaced with {len(X_new)} new rows, "
+                  f"{n_anomalies} anomalies detected")
+            
+            return model, scaler
+    
+    def update_random_forest(
+        self,
+        previous: PreviousRun,
+        X: pd.DataFrame,
+        y: pd.Series,
+        times: pd.Series,
+        watermark: datetime,
+    ) -> Optional[Tuple[RandomForestClassifier, StandardScaler]]:
+        """
+        Incremental Random Forest update with the previous run's tuned
+        hyperparameters: trees fitted on the new rows replace its oldest trees.
+        Returns None when the new rows lack a class or the previous model's F1
+        on them dropped, so the caller falls back to a full (tuned) retrain.
+        """
+        started = time.perf_counter()
+        model, scaler = previous.model, previous.scaler
+        new_rows = (times > previous.watermark).to_numpy()
+        if not new_rows.any():
+            print("✅ Random Forest up to date: no rows newer than the previous model")
+            return model, scaler
+        
+        X_new = scaler.transform(X[new_rows])
+        y_new = y[new_rows].to_numpy()
+        if not np.isin(model.classes_, y_new).all():
+            # warm_start cannot add trees when a class is missing from the new data
+            print("   Full retrain: new data does not contain every class")
+            return None
+        pre_update_f1 = f1_score(y_new, model.predict(X_new))
+        if self.incremental.f1_degraded(pre_update_f1, previous):
+            print(f"   Full retrain: F1 on new data dropped to {pre_update_f1:.3f}")
+            return None
+        
+        n_new = self.incremental.n_new_trees(model, previous, watermark)
+        slide_forest(model, X_new, y_new, n_new=n_new)
+        
+        # Evaluate on the new rows
+        y_pred = model.predict(X_new)
+        precision = precision_score(y_new, y_pred)
+        recall = recall_score(y_new, y_pred)
+        f1 = f1_score(y_new, y_pred)
+        training_seconds = time.perf_counter() - started
+        
+        with self._mlflow_run("random_forest"):
+            mlflow.log_params({name: previous.params[name] for name in TUNED_PARAMS if name in previous.params})
+            mlflow.log_param("algorithm", "RandomForest")
+            self._log_training_mode("incremental", watermark, previous)
+            
+            mlflow.log_metric("precision", precision)
+            mlflow.log_metric("recall", recall)
+            mlflow.log_metric("f1_score", f1)
+            mlflow.log_metric("pre_update_f1_score", pre_update_f1)
+            mlflow.log_metric("n_new_trees", n_new)
+            mlflow.log_metric("n_retired_trees", n_new)
+            mlflow.log_metric("rows_trained", len(X_new))
+            mlflow.log_metric("training_seconds", training_seconds)
+            
+            feature_importance = pd.DataFrame({
+                'feature': X.columns,
+                'importance': model.feature_importances_
+            }).sort_values('importance', ascending=False)
+            mlflow.log_text(feature_importance.to_string(), "feature_importance.txt")
+            
+            mlflow.sklearn.log_model(model, "model")
+            mlflow.sklearn.log_model(scaler, "scaler")
+            
+            print(f"✅ Random Forest updated: {n_new} trees replaced with {len(X_new)} new rows, "
+                  f"F1={f1:.3f}, Precision={precision:.3f}, Recall={recall:.3f}")
+            
+            return model, scaler
+    
+    def train_machine_models(
+        self,
+        model_set_dir: str,
+        days: int = 7,
+        contamination: float = 0.1,
+        n_workers: Optional[int] = None,
+        registered_model: Optional[str] = MACHINE_MODELS_REGISTRY_NAME,
+    ) -> Optional[str]:
+        """
+        Train the ai-service's per-machine Isolation Forests for the whole fleet in
+        parallel and publish them as one versioned model set (see training.machine_models).
+        The bundle is also logged as the run's `model_set` artifact and registered
+        as a new version of `registered_model`, which the ai-service watches.
+        Returns the bundle path, or None when there is nothing to publish.
+        """
+        print(f"🏭 Training per-machine models on {days} days...")
+        df = self.fetch_training_data(days=days, fill=False)
+        if df.empty:
+            print("❌ No telemetry for per-machine models")
+            return None
+        
+        models, stats = train_machine_models(df, contamination=contamination, n_workers=n_workers)
+        del df
+        if not models:
+            print(f"❌ No machine has enough data ({len(stats['skipped'])} skipped)")
+            return None
+        
+        with self._mlflow_run("machine_models") as run:
+            mlflow.log_param("algorithm", "IsolationForestPerMachine")
+            mlflow.log_param("contamination", contamination)
+            mlflow.log_param("window_days", days)
+            mlflow.log_metric("machines", stats['machines'])
+            mlflow.log_metric("machines_skipped", len(stats['skipped']))
+            mlflow.log_metric("samples", stats['samples'])
+            mlflow.log_metric("training_workers", stats['workers'])
+            mlflow.log_metric("training_seconds", stats['seconds'])
+            
+            path = publish_model_set(models, model_set_dir)
+            mlflow.log_param("model_set", os.path.basename(path))
+            mlflow.log_artifact(path, artifact_path="model_set")
         
-        # 1. Fetch data
+        print(f"✅ {stats['machines']} machine models trained in {stats['seconds']}s on {stats['workers']} workers "
+              f"({len(stats['skipped'])} skipped), published {path}")
+        if registered_model:
+            version = mlflow.register_model(f"runs:/{run.info.run_id}/model_set", registered_model)
+            print(f"✅ Model set registered: {registered_model} (version {version.version})")
+        return path
+    
+    def _fetch_stage(self) -> pd.DataFrame:
         print("📊 Fetching training data...")
-        df = self.fetch_training_data(days=30)
+        df = self.fetch_training_data(days=TRAINING_WINDOW_DAYS)
         
         if df.empty or len(df) < 1000:
-            print("❌ Insufficient data for training (need at least 1000 samples)")
-            return
+            raise InsufficientData("need at least 1000 samples")
         
         print(f"✅ Loaded {len(df)} samples")
+        stats = self.ingestion_stats
+        if 'mode' in stats:
+            print(f"   snapshot {stats['mode']} refresh: {stats['rows_fetched']} rows fetched, "
+                  f"{len(stats['days_written'])} days written, {len(stats['days_pruned'])} pruned, "
+                  f"{stats['days_cached']} cached, {stats['seconds']}s, peak RSS {stats['peak_rss_mb']} MB")
+        elif stats:
+            print(f"   {stats['rows']} rows in {stats['chunks']} chunks, {stats['frame_mb']} MB frame, "
+                  f"{stats['seconds']}s, peak RSS {stats['peak_rss_mb']} MB")
+        return df
+    
+    @property
+    def feature_relation(self) -> str:
+        """Relation the sql feature backend reads: the hypertable, or its continuous aggregate."""
+        if self.feature_bucket:
+            return 'machine_telemetry_' + self.feature_bucket.strip().replace(' ', '_')
+        return 'machine_telemetry'
+    
+    def _sql_features_stage(self) -> pd.DataFrame:
+        print(f"📊 Computing training features in the database from {self.feature_relation}...")
+        reader = SqlFeatureReader(relation=self.feature_relation)
+        conn = self.get_connection()
+        try:
+            if self.feature_bucket:
+                create_continuous_aggregate(conn, self.feature_relation, self.feature_bucket,
+                                            refresh_days=TRAINING_WINDOW_DAYS)
+                refresh_continuous_aggregate(conn, self.feature_relation, days=TRAINING_WINDOW_DAYS)
+            features_df = reader.read(conn, days=TRAINING_WINDOW_DAYS)
+        finally:
+            conn.close()
+        self.ingestion_stats = stats = reader.stats
+        
+        if features_df.empty or len(features_df) < 1000:
+            raise InsufficientData("need at least 1000 samples")
         
-        # 2. Engineer features
+        print(f"✅ Loaded {len(features_df)} samples with {features_df.shape[1] - 2} features")
+        print(f"   {stats['chunks']} chunks, {stats['frame_mb']} MB frame, "
+              f"{stats['seconds']}s, peak RSS {stats['peak_rss_mb']} MB")
+        return features_df
+    
+    def _features_stage(self, df: pd.DataFrame) -> pd.DataFrame:
         print("🔧 Engineering features...")
         features_df = self.engineer_features(df)
-        
-        # Drop non-feature columns
-        X = features_df.drop(['time', 'machine_id'], axis=1, errors='ignore')
-        
-        print(f"✅ Created {X.shape[1]} features")
-        
-        # 3. Create labels
+        print(f"✅ Created {features_df.shape[1] - 2} features")
+        return features_df
+    
+    def _labels_stage(self, features_df: pd.DataFrame) -> pd.Series:
         y = self.create_labels(features_df)
         print(f"✅ Created labels: {y.sum()} failures ({y.sum()/len(y)*100:.1f}%)")
-        
-        # 4. Train Isolation Forest (unsupervised)
+        return y
+    
+    @staticmethod
+    def _training_inputs(features_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, datetime]:
+        """Feature matrix, row timestamps and data watermark of the engineered frame."""
+        # Drop non-feature columns
+        X = features_df.drop(['time', 'machine_id'], axis=1, errors='ignore')
+        # Incremental updates train on the rows past the previous models' watermark
+        times = pd.to_datetime(features_df['time'], utc=True)
+        return X, times, data_watermark(features_df['time'])
+    
+    def _isolation_forest_stage(self, features_df: pd.DataFrame) -> Tuple[IsolationForest, StandardScaler]:
         print("\n🤖 Training Isolation Forest...")
-        iso_model, iso_scaler = self.train_isolation_forest(X)
-        
-        # 5. Train Random Forest (supervised)
-        if y.sum() > 10:  # Need at least 10 failure samples
-            print("\n🤖 Training Random Forest...")
-            rf_model, rf_scaler = self.train_random_forest(X, y)
-        else:
+        X, times, watermark = self._training_inputs(features_df)
+        previous = self._previous_run("IsolationForest", X.columns)
+        updated = self.update_isolation_forest(previous, X, times, watermark) if previous else None
+        return updated or self.train_isolation_forest(X, watermark=watermark)
+    
+    def _random_forest_stage(
+        self,
+        features_df: pd.DataFrame,
+        y: pd.Series,
+    ) -> Optional[Tuple[RandomForestClassifier, StandardScaler]]:
+        if y.sum() <= 10:  # Need at least 10 failure samples
             print("⚠️  Insufficient failure samples for supervised learning")
+            return None
+        print("\n🤖 Training Random Forest...")
+        X, times, watermark = self._training_inputs(features_df)
+        previous = self._previous_run("RandomForest", X.columns, registered_model="predictive_maintenance_model")
+        updated = self.update_random_forest(previous, X, y, times, watermark) if previous else None
+        return updated or self.train_random_forest(X, y, watermark=watermark)
+    
+    def stage_graph(self) -> StageGraph:
+        """
+        The pipeline as a DAG: fetch → features → labels, then both models.
+        The two model stages only share inputs, so they train concurrently.
+        With the sql feature backend, one database stage replaces fetch and features.
+        """
+        if self.feature_backend == 'sql':
+            inputs = [Stage('features', self._sql_features_stage, code=(training.sql_features, training.features))]
+        else:
+            inputs = [
+                Stage('fetch', self._fetch_stage,
+                      code=(MLPipeline.fetch_training_data, training.ingestion, training.snapshot)),
+                Stage('features', self._features_stage, deps=('fetch',), code=(training.features,)),
+            ]
+        return StageGraph([
+            *inputs,
+            Stage('labels', self._labels_stage, deps=('features',), code=(MLPipeline.create_labels,)),
+            Stage('isolation_forest', self._isolation_forest_stage, deps=('features',),
+                  code=(MLPipeline.train_isolation_forest, MLPipeline.update_isolation_forest, training.incremental)),
+            Stage('random_forest', self._random_forest_stage, deps=('features', 'labels'),
+                  code=(MLPipeline.train_random_forest, MLPipeline.update_random_forest,
+                        training.tuning, training.incremental)),
+        ], store=self.checkpoints, max_workers=self.stage_workers)
+    
+    def _source_fingerprint(self) -> Dict[str, object]:
+        """Identity of the input data, the root of every checkpoint key."""
+        conn = self.get_connection()
+        try:
+            fingerprint = telemetry_fingerprint(conn, days=TRAINING_WINDOW_DAYS)
+        finally:
+            conn.close()
+        fingerprint['incremental'] = self.incremental is not None
+        if self.feature_backend == 'sql':
+            fingerprint['feature_relation'] = self.feature_relation
+        return fingerprint
+    
+    def run_pipeline(self):
+        """Execute full training pipeline as a DAG of checkpointed stages (see stage_graph)."""
+        print("🚀 Starting ML Pipeline...")
         
-        print("\n✅ Pipeline complete!")
+        graph = self.stage_graph()
+        try:
+            graph.run(self._source_fingerprint)
+        except InsufficientData as e:
+            print(f"❌ Insufficient data for training ({e})")
+            return
+        finally:
+            if self.checkpoints is not None and self.checkpoints.resumed:
+                print("♻️  Resumed the previous unfinished run")
+            for name, stats in graph.stats.items():
+                print(f"   stage {name}: {stats['status']}" + (f" in {stats['seconds']}s" if 'seconds' in stats else ""))
+        
+        print(f"\n✅ Pipeline complete! (peak RSS {peak_rss_mb():.1f} MB)")
         print(f"📊 View results: http://localhost:5000")
 
 if __name__ == '__main__':
@@ -267,5 +647,15 @@ if __name__ == '__main__':
         'database': os.getenv('POSTGRES_DB', 'pocket_ops_telemetry')
     }
     
-    pipeline = MLPipeline(db_config)
+    pipeline = MLPipeline(
+        db_config,
+        snapshot_dir=os.getenv('TELEMETRY_SNAPSHOT_DIR', 'telemetry_snapshot') or None,
+        checkpoint_dir=os.getenv('PIPELINE_CHECKPOINT_DIR', 'pipeline_checkpoints') or None,
+        feature_backend=os.getenv('FEATURE_BACKEND', 'pandas'),
+        feature_bucket=os.getenv('FEATURE_BUCKET') or None,
+    )
     pipeline.run_pipeline()
+    
+    model_set_dir = os.getenv('MODEL_SET_DIR', 'model_sets')
+    if model_set_dir:
+        pipeline.train_machine_models(model_set_dir)
@@ -0,0 +1,172 @@
+import fcntl
+import hashlib
+import inspect
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from training import features, machine_models
+from training.pipeline import MLPipeline
+
+
+def feature_config_hash(settings: Dict[str, object]) -> str:
+    """
+    Hash of everything besides the data that shapes a training run: the feature
+    and label code and the given settings (windows, tuning budget, ...).
+    """
+    digest = hashlib.sha256()
+    for source in (inspect.getsource(features), inspect.getsource(machine_models),
+                   inspect.getsource(MLPipeline.create_labels)):
+        digest.update(source.encode('utf-8'))
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class RunLog:
+    """Append-only JSON-lines record of every scheduled run and its decision."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, record: Dict[str, object]):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    def last_completed(self) -> Optional[Dict[str, object]]:
+        """Most recent run that trained successfully; its fingerprint is the baseline."""
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn write from a killed process
+            if record.get('status') == 'completed':
+                return record
+        return None
+
+
+def decide(fingerprint: Dict[str, object], last: Optional[Dict[str, object]]) -> Tuple[str, str]:
+    """
+    ('skip' | 'incremental' | 'full', reason) for a run with `fingerprint`,
+    given the last completed run.
+    """
+    if last is None:
+        return 'full', 'no previous completed run'
+    previous = last['fingerprint']
+    if fingerprint['config_hash'] != previous['config_hash']:
+        return 'full', 'feature or label config changed'
+    if fingerprint['watermark'] is None:
+        return 'skip', 'no telemetry in the training window'
+    if (fingerprint['watermark'] == previous['watermark']
+            and fingerprint['machines'] == previous['machines']
+            and fingerprint['metrics'] == previous['metrics']
+            and fingerprint['rows'] <= previous['rows']):
+        # Only old rows aged out of the window since the last run
+        return 'skip', f"no new telemetry since {previous['watermark']}"
+    return 'incremental', f"telemetry advanced from {previous['watermark']} to {fingerprint['watermark']}"
+
+
+class TrainingJobRunner:
+    """
+    Runs the training job on a background thread, one at a time.
+
+    trigger() returns immediately, so the schedule loop keeps ticking while a
+    job runs. An exclusive flock on `lock_path` keeps a second scheduler process
+    (or a manual run) from overlapping. Before training, the inputs are
+    fingerprinted and compared with the last completed run to decide whether to
+    skip, update incrementally or retrain in full. Every trigger is recorded in
+    the run log with its decision, reason and duration.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Callable[[], Dict[str, object]],
+        job: Callable[[str], None],
+        run_log: RunLog,
+        lock_path: str,
+    ):
+        self.fingerprint = fingerprint
+        self.job = job
+        self.run_log = run_log
+        self.lock_path = lock_path
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def trigger(self, trigger: str = 'schedule') -> bool:
+        """Start a run unless one is in progress in this process. Returns whether it started."""
+        if self.running:
+            self._record(trigger, 'skip', 'previous job still running', started=time.monotonic())
+            return False
+        self._thread = threading.Thread(target=self._run, args=(trigger,), name='training-job', daemon=True)
+        self._thread.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, trigger: str):
+        started = time.monotonic()
+        with open(self.lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._record(trigger, 'skip', f'{self.lock_path} is held by another process', started)
+                return
+            try:
+                self._run_locked(trigger, started)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _run_locked(self, trigger: str, started: float):
+        try:
+            fingerprint = self.fingerprint()
+        except Exception as e:
+            self._record(trigger, 'skip', 'fingerprint failed', started, status='failed', error=repr(e))
+            return
+
+        decision, reason = decide(fingerprint, self.run_log.last_completed())
+        print(f"📋 Training decision: {decision} ({reason})")
+        if decision == 'skip':
+            self._record(trigger, decision, reason, started, fingerprint=fingerprint)
+            return
+
+        try:
+            self.job(decision)
+        except Exception as e:
+            print(f"\n❌ Training job failed: {e}")
+            self._record(trigger, decision, reason, started, fingerprint=fingerprint, status='failed', error=repr(e))
+            return
+        self._record(trigger, decision, reason, started, fingerprint=fingerprint, status='completed')
+
+    def _record(
+        self,
+        trigger: str,
+        decision: str,
+        reason: str,
+        started: float,
+        fingerprint: Optional[Dict[str, object]] = None,
+        status: str = 'skipped',
+        error: Optional[str] = None,
+    ):
+        duration = round(time.monotonic() - started, 3)
+        self.run_log.append({
+            'at': datetime.now(timezone.utc).isoformat(),
+            'trigger': trigger,
+            'decision': decision,
+            'reason': reason,
+            'status': status,
+            'error': error,
+            'duration_s': duration,
+            'fingerprint': fingerprint,
+        })
+        print(f"📋 Run {status}: {decision} in {duration}s")
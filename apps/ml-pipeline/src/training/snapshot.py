@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from training.ingestion import ChunkedTelemetryReader, fill_gaps, peak_rss_mb
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('day', pa.string()), ('machine_id', pa.string())]),
+    flavor='hive',
+)
+
+
+class TelemetrySnapshotCache:
+    """
+    Local Parquet snapshot of pivoted telemetry, partitioned as
+    `day=YYYY-MM-DD/machine_id=<id>/` under `directory`.
+
+    refresh() only fetches from the start of the day holding the stored
+    watermark (newest cached timestamp), rewriting those day partitions so rows
+    that arrived late within the day are picked up, and deletes day partitions
+    that fell out of the window. read() prunes partitions by day and machine and
+    reads only the requested columns. Gaps are stored as NaN and filled after
+    reading, so results match a direct fetch of the same window.
+    """
+
+    def __init__(self, directory: str, chunk_rows: int = 200_000):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.stats: Dict[str, object] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _watermark_path(self) -> str:
+        return os.path.join(self.directory, '_watermark.json')
+
+    def watermark(self) -> Optional[datetime]:
+        try:
+            with open(self._watermark_path) as f:
+                return datetime.fromisoformat(json.load(f)['watermark'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _set_watermark(self, watermark: datetime):
+        tmp_path = self._watermark_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'watermark': watermark.isoformat()}, f)
+        os.replace(tmp_path, self._watermark_path)  # written last: a failed refresh is simply redone
+
+    def days(self) -> List[str]:
+        return sorted(name[len('day='):] for name in os.listdir(self.directory) if name.startswith('day='))
+
+    def refresh(self, conn, days: int = 30) -> Dict[str, object]:
+        """Bring the snapshot up to date with the database for the last `days`."""
+        started = time.perf_counter()
+        window_start = datetime.now(timezone.utc) - timedelta(days=days)
+        watermark = self.watermark()
+
+        if watermark is None or watermark < window_start:
+            since = None  # cold start (or stale snapshot): fetch the whole window
+            for day in self.days():
+                shutil.rmtree(os.path.join(self.directory, f'day={day}'))
+        else:
+            since = watermark.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        reader = ChunkedTelemetryReader(chunk_rows=self.chunk_rows)
+        delta = reader.read(conn, days=days, since=since, fill=False)
+
+        written_days: List[str] = []
+        if not delta.empty:
+            times = pd.to_datetime(delta['time'], utc=True)
+            delta['day'] = times.dt.strftime('%Y-%m-%d')
+            delta['machine_id'] = delta['machine_id'].astype(str)
+            written_days = sorted(delta['day'].unique())
+            ds.write_dataset(
+                pa.Table.from_pandas(delta, preserve_index=False),
+                self.directory,
+                format='parquet',
+                partitioning=PARTITIONING,
+                basename_template='part-{i}.parquet',
+                # Rewrite the partitions being refreshed, leave older days untouched
+                existing_data_behavior='delete_matching',
+            )
+            self._set_watermark(times.max().to_pydatetime())
+
+        cutoff_day = window_start.strftime('%Y-%m-%d')
+        pruned = [day for day in self.days() if day < cutoff_day]
+        for day in pruned:
+            shutil.rmtree(os.path.join(self.directory, f'day={day}'))
+
+        self.stats = {
+            'mode': 'full' if since is None else 'delta',
+            'fetched_from': since.isoformat() if since is not None else None,
+            'rows_fetched': reader.stats.get('rows', 0),
+            'samples_written': len(delta),
+            'days_written': written_days,
+            'days_pruned': pruned,
+            'days_cached': len(self.days()),
+            'seconds': round(time.perf_counter() - started, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        return self.stats
+
+    def read(
+        self,
+        days: int = 30,
+        columns: Optional[List[str]] = None,
+        machines: Optional[List[str]] = None,
+        fill: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Load the last `days` as the training frame (time, machine_id, metrics...).
+        `columns` limits the metric columns read; `machines` limits the partitions.
+        With fill=False metric gaps stay NaN.
+        """
+        if not self.days():
+            return pd.DataFrame()
+        window_start = datetime.now(timezone.utc) - timedelta(days=days)
+
+        dataset = ds.dataset(self.directory, format='parquet', partitioning=PARTITIONING)
+        # Metrics that first appeared in later partitions are missing from older files
+        schema = pa.unify_schemas([fragment.physical_schema for fragment in dataset.get_fragments()]
+                                  + [PARTITIONING.schema])
+        dataset = ds.dataset(self.directory, format='parquet', partitioning=PARTITIONING, schema=schema)
+
+        metrics = sorted(name for name in schema.names if name not in ('time', 'day', 'machine_id'))
+        if columns is not None:
+            metrics = [metric for metric in metrics if metric in columns]
+
+        expression = ((ds.field('day') >= window_start.strftime('%Y-%m-%d'))
+                      & (ds.field('time') > pd.Timestamp(window_start).value))
+        if machines is not None:
+            expression &= ds.field('machine_id').isin(machines)
+
+        table = dataset.to_table(columns=['time', 'machine_id', *metrics], filter=expression)
+        if table.num_rows == 0:
+            return pd.DataFrame()
+
+        frame = table.to_pandas()
+        del table
+        # Same row order as a direct fetch: by time, then machine_id
+        order = np.lexsort((frame['machine_id'].to_numpy(dtype=str), frame['time'].to_numpy()))
+        frame = frame.take(order).reset_index(drop=True)
+        frame['machine_id'] = frame['machine_id'].astype('category')
+        if fill:
+            fill_gaps(frame, metrics)
+        return frame
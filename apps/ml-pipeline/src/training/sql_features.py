@@ -0,0 +1,257 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+from training.features import METRICS
+from training.ingestion import peak_rss_mb, reset_peak_rss
+
+# Window features of training.features.engineer_features, in its column order
+_WINDOW_FEATURES = (
+    ('mean_5m', 'AVG({m}) OVER w5'),
+    ('std_5m', 'COALESCE(STDDEV_SAMP({m}) OVER w5, 0)'),
+    ('max_5m', 'MAX({m}) OVER w5'),
+    ('min_5m', 'MIN({m}) OVER w5'),
+    ('mean_30m', 'AVG({m}) OVER w30'),
+    ('std_30m', 'COALESCE(STDDEV_SAMP({m}) OVER w30, 0)'),
+    ('diff', 'COALESCE({m} - {prev}, 0)'),
+    ('pct_change', 'COALESCE({ratio} - 1, 0)'),
+)
+
+
+def _divide(numerator: str, denominator: str) -> str:
+    """SQL division with numpy semantics: x/0 is ±Infinity, 0/0 is NULL (NaN, filled with 0 by the caller)."""
+    return (f"CASE WHEN {denominator} <> 0 THEN {numerator} / {denominator} "
+            f"WHEN {denominator} = 0 AND {numerator} > 0 THEN 'Infinity'::float8 "
+            f"WHEN {denominator} = 0 AND {numerator} < 0 THEN '-Infinity'::float8 END")
+
+
+class SqlFeatureReader:
+    """
+    Computes the training feature matrix inside TimescaleDB with window
+    functions: the server pivots, fills and windows the telemetry and streams
+    back only the final features, so the long-format rows never reach Python.
+
+    The result matches fetch_training_data() (chunked) + engineer_features():
+    rows ordered by time then machine_id, duplicate readings averaged, every
+    metric forward-filled in row order across machines then 0, rolling windows
+    of 5 and 30 rows and diffs restarting at each machine. Columns are int64
+    epoch-nanosecond `time`, categorical `machine_id` and float32 values.
+
+    `relation` is any table or view with time, machine_id, metric_name and
+    value columns; create_continuous_aggregate() makes a time_bucket rollup
+    that can be read instead of the raw hypertable. Windows are then counted
+    in buckets, so those features differ from the raw-row ones.
+    """
+
+    def __init__(self, relation: str = 'machine_telemetry', chunk_rows: int = 50_000):
+        self.relation = relation
+        self.chunk_rows = chunk_rows
+        self.stats: Dict[str, float] = {}
+
+    def metrics(self, conn, days: int) -> List[str]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql.SQL("""
+                SELECT DISTINCT metric_name
+                FROM {relation}
+                WHERE time > NOW() - INTERVAL '%s days'
+            """).format(relation=sql.Identifier(self.relation)), (days,))
+            return sorted(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def columns(self, metrics: List[str]) -> List[str]:
+        """Feature columns after time and machine_id, as engineer_features orders them."""
+        columns = list(metrics)
+        columns += [f'{col}_{name}' for col in METRICS if col in metrics for name, _ in _WINDOW_FEATURES]
+        if 'temperature' in metrics and 'vibration' in metrics:
+            columns.append('temp_vibration_interaction')
+        if 'spindle_speed' in metrics and 'power_consumption' in metrics:
+            columns.append('efficiency')
+        return columns
+
+    def read(self, conn, days: int = 30) -> pd.DataFrame:
+        reset_peak_rss()
+        started = time.perf_counter()
+        metrics = self.metrics(conn, days)
+        if not metrics:
+            self.stats = {'rows': 0, 'chunks': 0, 'seconds': round(time.perf_counter() - started, 3),
+                          'peak_rss_mb': round(peak_rss_mb(), 1)}
+            return pd.DataFrame()
+        columns = self.columns(metrics)
+
+        times: List[np.ndarray] = []
+        machine_ids: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        n_chunks = 0
+        cursor = conn.cursor(name='training_features_stream')
+        cursor.itersize = self.chunk_rows
+        try:
+            cursor.execute(self._query(metrics), (*metrics, days))
+            while True:
+                rows = cursor.fetchmany(self.chunk_rows)
+                if not rows:
+                    break
+                n_chunks += 1
+                chunk = np.array(rows, dtype=object)
+                times.append(chunk[:, 0].astype(np.int64))
+                machine_ids.append(chunk[:, 1])
+                values.append(chunk[:, 2:].astype(np.float32))
+        finally:
+            cursor.close()
+
+        if not times:
+            self.stats = {'rows': 0, 'chunks': 0, 'seconds': round(time.perf_counter() - started, 3),
+                          'peak_rss_mb': round(peak_rss_mb(), 1)}
+            return pd.DataFrame()
+
+        matrix = np.concatenate(values)
+        values.clear()
+        frame = pd.DataFrame({
+            # Postgres timestamps are microseconds
+            'time': np.concatenate(times) * 1000,
+            'machine_id': pd.Categorical(np.concatenate(machine_ids)),
+        })
+        frame = pd.concat([frame, pd.DataFrame(matrix, columns=columns)], axis=1)
+
+        self.stats = {
+            'rows': len(frame),
+            'chunks': n_chunks,
+            'samples': len(frame),
+            'machines': len(frame['machine_id'].cat.categories),
+            'metrics': len(metrics),
+            'frame_mb': round(float(frame.memory_usage(deep=True).sum()) / (1024 * 1024), 1),
+            'seconds': round(time.perf_counter() - started, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+        return frame
+
+    def _query(self, metrics: List[str]) -> sql.Composed:
+        ident = {metric: sql.Identifier(metric) for metric in metrics}
+        groups = {metric: sql.Identifier(f'{metric}__grp') for metric in metrics}
+        previous = {metric: sql.Identifier(f'{metric}__prev') for metric in metrics}
+        featured = [metric for metric in METRICS if metric in metrics]
+
+        # float4 like the chunked reader, so features are computed on the same values
+        pivot = sql.SQL(', ').join(
+            sql.SQL('(AVG(value) FILTER (WHERE metric_name = %s))::float4 AS {}').format(ident[m]) for m in metrics)
+        counts = sql.SQL(', ').join(
+            sql.SQL('COUNT({}) OVER fleet AS {}').format(ident[m], groups[m]) for m in metrics)
+        # Gaps take the last reading before them in (time, machine_id) order, whichever machine
+        # it came from (FIRST_VALUE of the run it started); leading gaps 0
+        fill = sql.SQL(', ').join(
+            sql.SQL('COALESCE(FIRST_VALUE({m}) OVER (PARTITION BY {g} ORDER BY time, machine_id COLLATE "C"), 0)'
+                    '::float8 AS {m}').format(m=ident[m], g=groups[m])
+            for m in metrics)
+        lags = sql.SQL('').join(
+            sql.SQL(', LAG({}) OVER machine AS {}').format(ident[m], previous[m]) for m in featured)
+
+        features = []
+        for metric in featured:
+            for name, expression in _WINDOW_FEATURES:
+                expression = expression.replace('{ratio}', _divide('{m}', '{prev}'))
+                features.append(sql.SQL(expression + ' AS {alias}').format(
+                    m=ident[metric], prev=previous[metric], alias=sql.Identifier(f'{metric}_{name}')))
+        if 'temperature' in metrics and 'vibration' in metrics:
+            features.append(sql.SQL('{t} * {v} AS temp_vibration_interaction').format(
+                t=ident['temperature'], v=ident['vibration']))
+        if 'spindle_speed' in metrics and 'power_consumption' in metrics:
+            features.append(sql.SQL('COALESCE(' + _divide('{p}', '({s} + 1)') + ', 0) AS efficiency').format(
+                p=ident['power_consumption'], s=ident['spindle_speed']))
+
+        return sql.SQL("""
+            WITH pivoted AS (
+                SELECT time, machine_id, {pivot}
+                FROM {relation}
+                WHERE time > NOW() - INTERVAL '%s days'
+                GROUP BY time, machine_id
+            ),
+            grouped AS (
+                SELECT *, {counts}
+                FROM pivoted
+                WINDOW fleet AS (ORDER BY time, machine_id COLLATE "C")
+            ),
+            filled AS (
+                SELECT time, machine_id, {fill}
+                FROM grouped
+            ),
+            lagged AS (
+                SELECT *{lags}
+                FROM filled
+                WINDOW machine AS (PARTITION BY machine_id ORDER BY time)
+            )
+            SELECT (EXTRACT(EPOCH FROM time) * 1000000)::int8, machine_id, {raw}{features}
+            FROM lagged
+            WINDOW machine AS (PARTITION BY machine_id ORDER BY time),
+                   w5 AS (machine ROWS BETWEEN 4 PRECEDING AND CURRENT ROW),
+                   w30 AS (machine ROWS BETWEEN 29 PRECEDING AND CURRENT ROW)
+            ORDER BY time, machine_id COLLATE "C"
+        """).format(
+            pivot=pivot,
+            relation=sql.Identifier(self.relation),
+            counts=counts,
+            fill=fill,
+            lags=lags,
+            raw=sql.SQL(', ').join(ident[m] for m in metrics),
+            features=sql.SQL('').join(sql.SQL(', ') + feature for feature in features),
+        )
+
+
+def create_continuous_aggregate(
+    conn,
+    view: str = 'machine_telemetry_1m',
+    bucket: str = '1 minute',
+    refresh_days: int = 30,
+):
+    """
+    Create (if missing) a time_bucket continuous aggregate of machine_telemetry
+    in the same long format, plus a policy that keeps the last `refresh_days`
+    refreshed. Reads include the not yet materialized recent buckets.
+    SqlFeatureReader(relation=view) then reads bucket averages.
+    """
+    with _autocommit(conn) as cursor:
+        cursor.execute(sql.SQL("""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT
+                time_bucket(INTERVAL {bucket}, time) AS time,
+                machine_id,
+                metric_name,
+                AVG(value) AS value
+            FROM machine_telemetry
+            GROUP BY 1, machine_id, metric_name
+            WITH NO DATA
+        """).format(view=sql.Identifier(view), bucket=sql.Literal(bucket)))
+        cursor.execute("""
+            SELECT add_continuous_aggregate_policy(
+                %s::regclass,
+                start_offset => %s::interval,
+                end_offset => %s::interval,
+                schedule_interval => %s::interval,
+                if_not_exists => true
+            )
+        """, (view, f'{refresh_days} days', bucket, bucket))
+
+
+def refresh_continuous_aggregate(conn, view: str, days: int = 30):
+    """Materialize the last `days` of `view` now; only invalidated buckets are recomputed."""
+    with _autocommit(conn) as cursor:
+        cursor.execute("CALL refresh_continuous_aggregate(%s::regclass, NOW() - %s::interval, NULL)",
+                       (view, f'{days} days'))
+
+
+@contextmanager
+def _autocommit(conn):
+    # Continuous aggregates are created and refreshed outside a transaction
+    previous = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        conn.autocommit = previous
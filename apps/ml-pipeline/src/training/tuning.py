@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import optuna
+from optuna.storages import JournalStorage
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from optuna.storages.journal import JournalFileBackend
+except ImportError:  # optuna < 4.0, where it is not deprecated yet
+    from optuna.storages import JournalFileStorage as JournalFileBackend
+
+TUNED_PARAMS = ('n_estimators', 'max_depth', 'min_samples_split', 'min_samples_leaf', 'max_features')
+# RandomForestClassifier's own defaults, used when no trial finished within the timeout
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': None, 'min_samples_split': 2,
+                  'min_samples_leaf': 1, 'max_features': 'sqrt'}
+
+
+def _suggest_params(trial: optuna.Trial) -> Dict:
+    return {
+        'n_estimators': trial.suggest_int('n_estimators', 50, 300),
+        'max_depth': trial.suggest_int('max_depth', 3, 20),
+        'min_samples_split': trial.suggest_int('min_samples_split', 2, 20),
+        'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 10),
+        'max_features': trial.suggest_categorical('max_features', ['sqrt', 'log2']),
+    }
+
+
+def _objective(trial: optuna.Trial, data: Dict[str, np.ndarray], rung_sizes: Sequence[int], n_jobs: int) -> float:
+    """
+    Validation F1 of one parameter set, fitted on growing training subsamples.
+    Each rung is reported to the pruner; the last rung is the full training split.
+    """
+    params = _suggest_params(trial)
+    f1 = 0.0
+    for rung, size in enumerate(rung_sizes):
+        last = rung == len(rung_sizes) - 1
+        # Subsamples come from one fixed shuffle so every trial sees the same rows per rung
+        rows = slice(None) if last else data['order'][:size]
+        model = RandomForestClassifier(**params, random_state=42, n_jobs=n_jobs)
+        model.fit(data['X_train'][rows], data['y_train'][rows])
+        f1 = f1_score(data['y_val'], model.predict(data['X_val']))
+        trial.report(f1, size)
+        if not last and trial.should_prune():
+            raise optuna.TrialPruned()
+    return f1
+
+
+def _run_worker(
+    storage_path: str,
+    study_name: str,
+    data_dir: str,
+    n_trials: int,
+    timeout: Optional[float],
+    rung_sizes: Sequence[int],
+    n_jobs: int,
+    seed: int,
+):
+    """Process-pool entry point: attach to the shared study and run trials until the budget is spent."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    data = {name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+            for name in ('X_train', 'y_train', 'X_val', 'y_val', 'order')}
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=_storage(storage_path),
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=_pruner(),
+    )
+    study.optimize(
+        lambda trial: _objective(trial, data, rung_sizes, n_jobs),
+        n_trials=n_trials,
+        timeout=timeout,
+        # n_trials is a per-process cap; this stops every worker once the study total is reached
+        callbacks=[MaxTrialsCallback(n_trials, states=None)],
+    )
+
+
+def _storage(storage: str):
+    # RDB URLs (sqlite:///..., postgresql://...) are used as-is; anything else is a journal file
+    if '://' in storage:
+        return storage
+    return JournalStorage(JournalFileBackend(storage))
+
+
+def _pruner() -> optuna.pruners.BasePruner:
+    # Successive halving (reduction factor 2) pruned 7 of 8 trials, leaving one model to pick.
+    # The median rule only stops trials below the middle of those before them at a rung.
+    return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0)
+
+
+def tune_random_forest(
+    X,
+    y,
+    n_trials: int = 20,
+    timeout: Optional[float] = None,
+    n_workers: Optional[int] = None,
+    n_rungs: int = 3,
+    storage: Optional[str] = None,
+    seed: int = 42,
+) -> Tuple[Dict, Dict]:
+    """
+    Parallel, pruned Optuna search for RandomForestClassifier hyperparameters.
+
+    The train/validation split and the scaler are computed once and shared with
+    the worker processes as memory-mapped arrays. `n_workers` processes run
+    trials against one study in shared storage (a journal file, or an RDB URL
+    passed as `storage`). Each trial trains on 1/2^(n_rungs-1), ..., 1/2, then
+    all of the training rows. After the first 5 trials, a trial whose F1 at a
+    rung is below the median of earlier trials there is pruned. `n_trials` caps the study and `timeout` (seconds) bounds the
+    wall-clock time of each worker. If no trial completes in that time, the
+    forest's DEFAULT_PARAMS are returned and `best_f1` is None.
+
+    Returns (best_params, search stats).
+    """
+    started = time.perf_counter()
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_val_scaled = scaler.transform(X_val)
+
+    n_train = len(X_train_scaled)
+    rung_sizes = sorted({max(n_train >> rung, 1) for rung in range(n_rungs)})
+    n_workers = n_workers or max(1, min(os.cpu_count() or 1, n_trials))
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+
+    work_dir = tempfile.mkdtemp(prefix='rf_tuning_')
+    try:
+        arrays = {
+            'X_train': np.ascontiguousarray(X_train_scaled, dtype=np.float64),
+            'y_train': np.asarray(y_train),
+            'X_val': np.ascontiguousarray(X_val_scaled, dtype=np.float64),
+            'y_val': np.asarray(y_val),
+            'order': np.random.default_rng(seed).permutation(n_train),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(work_dir, f'{name}.npy'), array)
+        del arrays
+
+        storage_path = storage or os.path.join(work_dir, 'study.journal')
+        study = optuna.create_study(
+            study_name=f'random_forest_{int(time.time())}_{uuid.uuid4().hex[:8]}',
+            storage=_storage(storage_path),
+            direction='maximize',
+            pruner=_pruner(),
+        )
+
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [
+                executor.submit(_run_worker, storage_path, study.study_name, work_dir,
+                                n_trials, timeout, rung_sizes, n_jobs, seed + worker)
+                for worker in range(n_workers)
+            ]
+            for future in futures:
+                future.result()
+
+        trials = study.get_trials(deepcopy=False)
+        complete = sum(trial.state == TrialState.COMPLETE for trial in trials)
+        stats = {
+            'trials': len(trials),
+            'complete': complete,
+            'pruned': sum(trial.state == TrialState.PRUNED for trial in trials),
+            'workers': n_workers,
+            'rung_sizes': rung_sizes,
+            # best_value/best_params raise when no trial completed
+            'best_f1': study.best_value if complete else None,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        return (study.best_params if complete else dict(DEFAULT_PARAMS)), stats
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -93,6 +93,9 @@ mqttClient.on('message', async (topic, message) => {
             );
         }
 
+        // Wake the ai-service anomaly stream (LISTEN machine_telemetry)
+        await pool.query('SELECT pg_notify($1, $2)', ['machine_telemetry', machineId]);
+
         // Broadcast to WebSocket clients
         broadcast({
             type: 'telemetry',